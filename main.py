@@ -3,23 +3,44 @@
 #   Interactive CLI for Spotify streaming history analysis.
 #   Edit the two paths below, then run: python main.py
 
+import argparse
 import os
+import threading
+from concurrent.futures import Future
 import spotify_scraper
+import spotify_accounts
 import spotify_analysis
+import spotify_colisten
+import spotify_compare
+import spotify_daily
+import spotify_pivot
+import spotify_podcasts
 import spotify_playlists
 import spotify_library
+import spotify_lifecycle
+import spotify_localtime
+import spotify_profile
+import spotify_quality
+import spotify_server
+import spotify_shared
+import spotify_store
+import spotify_wrapped
 
 # ── Configure your data paths here ────────────────────────────────────────────
 
 # Directory containing your streaming history JSON files.
 # Supports both Extended Streaming History (endsong_*.json) and
 # basic Account Data history (StreamingHistory*.json) — auto-detected on load.
+# May also be the my_spotify_data.zip archive itself, or a list of several
+# (dated) zips / directories to combine.
 STREAMING_HISTORY_DIR = "~/OneDrive/Backup/company_data_exports/Spotify/2026_02_17_spotify/Spotify Extended Streaming History/"
 
-# Full path to Playlist1.json from Spotify's "Account Data" export.
+# Full path to Playlist1.json from Spotify's "Account Data" export
+# (or to the export's zip archive).
 PLAYLIST_FILE = "~/OneDrive/Backup/company_data_exports/Spotify/2026_02_17_spotify/Spotify Account Data/Playlist1.json"
 
-# Full path to YourLibrary.json from Spotify's "Account Data" export.
+# Full path to YourLibrary.json from Spotify's "Account Data" export
+# (or to the export's zip archive).
 LIBRARY_FILE = "~/OneDrive/Backup/company_data_exports/Spotify/2026_02_17_spotify/Spotify Account Data/YourLibrary.json"
 
 # Older Playlist1.json used as the "before" snapshot for playlist diff (option 25).
@@ -30,6 +51,35 @@ OLD_PLAYLIST_FILE = "~/OneDrive/Backup/company_data_exports/Spotify/2023_06_21_s
 # Uses IANA timezone names: https://en.wikipedia.org/wiki/List_of_tz_database_time_zones
 TIMEZONE = "America/Chicago"
 
+# How each event's local time is chosen for hour / weekday / day / year charts:
+#   "fixed"    — every event in TIMEZONE
+#   "country"  — the timezone of the country it was streamed from (conn_country);
+#                COUNTRY_ZONES overrides a country, e.g. {"US": "America/Los_Angeles"}
+#   "schedule" — LOCAL_TIME_SCHEDULE date ranges (inclusive, comma separated),
+#                e.g. "2024-06-01:2024-06-14=Asia/Tokyo, 2024-12-20:2025-01-03=Europe/Berlin"
+# Unknown countries and dates outside the schedule use TIMEZONE.
+LOCAL_TIME = "fixed"
+COUNTRY_ZONES = {}
+LOCAL_TIME_SCHEDULE = ""
+
+# What to do with rows flagged by the data-quality check at load time:
+#   ""       — report only
+#   "drop"   — remove flagged rows (duplicates, bad timestamps, zero /
+#              implausible ms_played, rows without metadata; podcasts kept)
+#   "repair" — remove duplicates and bad timestamps, clip ms_played
+DATA_FIX = ""
+
+# Directory for derived data that is expensive to rebuild (co-listening
+# matrices, track lifecycle index, daily series, ...). Files are keyed by a fingerprint of the loaded history.
+# Leave empty to keep everything in memory only.
+CACHE_DIR = "~/.cache/spotify_scraper"
+
+# Optional SQLite store (e.g. "~/.cache/spotify_scraper/spotify.db"). Build it
+# with `python main.py --build-db`; once it exists the menu opens it instead
+# of re-reading the export, and the standard analyses run as SQL queries.
+# Rebuild after a new export or a TIMEZONE / LOCAL_TIME change. Leave empty to disable.
+SQLITE_DB = ""
+
 # ─────────────────────────────────────────────────────────────────────────────
 
 MENU = """
@@ -62,12 +112,26 @@ MENU = """
   20   Export playlist to CSV
   21   Playlist stats summary
   22   Playlist diff (added / dropped since old export)
+  30   Streaming stats for every playlist
 
   ── Your Library (Liked Songs) ──────────────────────
   23   Library stats (total liked, top artists)
   24   Browse liked songs
   25   Liked songs you actually listen to most
 
+  ── Played Together ─────────────────────────────────
+  26   Songs most often played right after a song
+  27   Artists most often played right after an artist
+
+  ── Reports ─────────────────────────────────────────
+  28   Wrapped for every year (writes report bundle)
+  29   Custom breakdown (e.g. hours by platform by year)
+  31   Data quality report
+  32   Compare two periods (e.g. 2024 vs 2023, or date ranges)
+  33   Track lifecycle (forgotten favourites, rediscoveries, new vs all-time)
+  34   Daily trends (rolling averages, listening streaks, calendar)
+  35   Podcasts (top shows, hours per show, completion rate)
+
   ── Other ───────────────────────────────────────────
    0   Run all streaming history analyses
    q   Quit
@@ -86,37 +150,96 @@ def _prompt_int(prompt, default):
         return default
 
 
-def _require_playlists(playlists):
+# Menu options that read the streaming history.
+_HISTORY_OPTIONS = {str(i) for i in range(0, 18)} | {"25", "26", "27", "28", "29", "30", "31", "32", "33", "34", "35"}
+
+# History options that need the events as a DataFrame (the rest also run on
+# a SQLite store, or only read the podcast episode table).
+_FRAME_OPTIONS = _HISTORY_OPTIONS - {str(i) for i in range(0, 18)} - {"35"}
+
+
+def _still_loading(data, name, label):
+    """Print a notice and return True while `name` is loading in the background."""
+    state = data.state(name)
+    if state == "loading":
+        print(f"\n  {label} still loading ({data.progress_text(name)}) — try again in a moment.")
+        return True
+    if state == "failed":
+        print(f"\n  {label} failed to load: {data.error(name)}")
+        return True
+    return False
+
+
+def _require_history(data):
+    """Print the loading status and return False until streaming history is ready."""
+    return not _still_loading(data, "history", "Streaming history")
+
+
+def _require_playlists(data):
     """Print a helpful message and return False if playlists not loaded."""
-    if playlists is None:
+    if _still_loading(data, "playlists", "Playlists"):
+        return False
+    if data.value("playlists") is None:
         print("\n  Playlist file not loaded.")
         print("  Set PLAYLIST_FILE in main.py to the path of your Playlist1.json.")
         return False
     return True
 
 
-def _require_old_playlists(old_playlists):
-    if old_playlists is None:
+def _require_old_playlists(data):
+    if _still_loading(data, "old_playlists", "Old playlists"):
+        return False
+    if data.value("old_playlists") is None:
         print("\n  Old playlist file not loaded.")
         print("  Set OLD_PLAYLIST_FILE in main.py to the path of your older Playlist1.json.")
         return False
     return True
 
 
-def _require_library(library):
+def _require_library(data):
     """Print a helpful message and return False if library not loaded."""
-    if library is None:
+    if _still_loading(data, "library", "Library"):
+        return False
+    if data.value("library") is None:
         print("\n  Library file not loaded.")
         print("  Set LIBRARY_FILE in main.py to the path of your YourLibrary.json.")
         return False
     return True
 
 
-def run_menu(sp_dt, playlists, library, old_playlists):
+def run_menu(data):
+    """
+    Interactive menu. `data` is a _BackgroundLoader; options become usable
+    as soon as the data they need has finished loading.
+    """
+    colisten = {}   # "track" / "artist" → CoListenMatrix, built on first use
+    pivot = None    # PivotEngine, built on first use (caches dimension codes)
+    by_year = None  # PeriodComparison over every year, built on first use
+    lifecycle = None  # LifecycleIndex, loaded from CACHE_DIR or built on first use
+    daily = None      # DailySeries, loaded from CACHE_DIR or built on first use
+    summary_shown = False
+
     while True:
+        data.print_notes()
+        if not summary_shown and data.state("history") == "ready":
+            spotify_analysis.listening_summary(data.value("history"))
+            summary_shown = True
         print(MENU)
+        print(data.status_line())
         choice = input("  Enter choice: ").strip().lower()
 
+        sp_dt         = data.value("history")
+        episodes      = data.value("episodes")
+        playlists     = data.value("playlists")
+        library       = data.value("library")
+        old_playlists = data.value("old_playlists")
+
+        if choice in _HISTORY_OPTIONS and not _require_history(data):
+            continue
+        if choice in _FRAME_OPTIONS and isinstance(sp_dt, spotify_store.SQLiteStore):
+            print("\n  Reading streaming events from the SQLite store...")
+            sp_dt = sp_dt.frame()
+
         # ── streaming history ─────────────────────────────────────────────────
         if choice == "1":
             n = _prompt_int("Number of top songs", 20)
@@ -177,47 +300,127 @@ def run_menu(sp_dt, playlists, library, old_playlists):
 
         # ── playlists ─────────────────────────────────────────────────────────
         elif choice == "18":
-            if _require_playlists(playlists):
+            if _require_playlists(data):
                 spotify_playlists.list_playlists(playlists)
 
         elif choice == "19":
-            if _require_playlists(playlists):
+            if _require_playlists(data):
                 spotify_playlists.list_playlists(playlists)
                 name = input("  Enter playlist name or number: ").strip()
                 spotify_playlists.show_playlist(playlists, name)
 
         elif choice == "20":
-            if _require_playlists(playlists):
+            if _require_playlists(data):
                 spotify_playlists.list_playlists(playlists)
                 name = input("  Enter playlist name or number: ").strip()
                 out  = input("  Output file [default: playlist_export.csv]: ").strip()
                 spotify_playlists.export_playlist(playlists, name, out or "playlist_export.csv")
 
         elif choice == "21":
-            if _require_playlists(playlists):
+            if _require_playlists(data):
                 spotify_playlists.playlist_stats(playlists)
 
         elif choice == "22":
-            if _require_playlists(playlists) and _require_old_playlists(old_playlists):
+            if _require_playlists(data) and _require_old_playlists(data):
                 spotify_playlists.list_playlists(playlists)
                 name = input("  Enter playlist name or number: ").strip()
                 spotify_playlists.playlist_diff(old_playlists, playlists, name)
 
+        elif choice == "30":
+            if _require_playlists(data):
+                spotify_playlists.playlist_play_stats(playlists, sp_dt)
+
         # ── library ───────────────────────────────────────────────────────────
         elif choice == "23":
-            if _require_library(library):
+            if _require_library(data):
                 spotify_library.library_stats(library)
 
         elif choice == "24":
-            if _require_library(library):
+            if _require_library(data):
                 artist = input("  Filter by artist (leave blank for all): ").strip()
                 spotify_library.browse_library(library, artist or None)
 
         elif choice == "25":
-            if _require_library(library):
+            if _require_library(data):
                 n = _prompt_int("Number of top liked songs to show", 20)
                 spotify_library.liked_vs_streamed(library, sp_dt, n)
 
+        # ── played together ───────────────────────────────────────────────────
+        elif choice in ("26", "27"):
+            by = "track" if choice == "26" else "artist"
+            if by not in colisten:
+                print(f"\n  Building {by} co-listening matrix...")
+                colisten[by] = spotify_colisten.load_or_build(sp_dt, CACHE_DIR, by=by)
+            name = input(f"  Enter {by} name: ").strip()
+            n = _prompt_int("Number of results", 20)
+            spotify_colisten.played_after(colisten[by], name, n)
+
+        # ── reports ───────────────────────────────────────────────────────────
+        elif choice == "28":
+            n = _prompt_int("Number of top songs / artists per year", 10)
+            out = input("  Output folder [default: wrapped_report]: ").strip()
+            result = spotify_wrapped.wrapped_report(sp_dt, n)
+            spotify_wrapped.write_wrapped(result, out or "wrapped_report")
+
+        elif choice == "29":
+            if pivot is None:
+                pivot = spotify_pivot.PivotEngine(sp_dt)
+            print(f"\n  Dimensions: {', '.join(pivot.available())}")
+            print(f"  Measures  : {', '.join(spotify_pivot.MEASURES)}")
+            rows    = input("  Rows dimension [default: year]: ").strip() or "year"
+            cols    = input("  Columns dimension (blank for none): ").strip() or None
+            measure = input("  Measure [default: plays]: ").strip() or "plays"
+            try:
+                spotify_pivot.pivot_chart(pivot, rows, cols, measure)
+            except (KeyError, ValueError) as e:
+                print(f"  {e.args[0]}")
+
+        elif choice == "31":
+            spotify_quality.quality_report(spotify_scraper.join_episodes(sp_dt, episodes))
+
+        elif choice == "32":
+            if by_year is None:
+                by_year = spotify_compare.PeriodComparison.build(
+                    sp_dt, spotify_compare.year_periods(sp_dt))
+            years = by_year.labels
+            print(f"\n  Years: {', '.join(map(str, years))}")
+            print("  A period is a year (2024) or a date range (2024-06-01:2024-08-31).")
+            base  = input(f"  Base period [default {years[-2] if len(years) > 1 else years[0]}]: ").strip()
+            other = input(f"  Compare with [default {years[-1]}]: ").strip()
+            base  = base or str(years[-2] if len(years) > 1 else years[0])
+            other = other or str(years[-1])
+            n = _prompt_int("Number of top songs / artists", 10)
+            try:
+                periods, (base, other) = spotify_compare.parse_periods(sp_dt, [base, other])
+                engine = (by_year if isinstance(base, int)
+                          else spotify_compare.PeriodComparison.build(sp_dt, periods))
+                spotify_compare.compare_periods(engine, base, other, n)
+            except (KeyError, ValueError) as e:
+                print(f"  {e.args[0]}")
+
+        elif choice == "33":
+            if lifecycle is None:
+                print("\n  Building track lifecycle index...")
+                lifecycle = spotify_lifecycle.load_or_build(sp_dt, CACHE_DIR)
+            n = _prompt_int("Number of tracks per list", 15)
+            spotify_lifecycle.lifecycle_report(lifecycle, n)
+
+        elif choice == "34":
+            if daily is None:
+                print("\n  Building daily series...")
+                daily = spotify_daily.load_or_build(sp_dt, CACHE_DIR)
+            n = _prompt_int("Number of streaks to list", 10)
+            spotify_daily.streaks_report(daily, n)
+            spotify_daily.rolling_chart(daily)
+            years = daily.years()
+            if years:
+                year = _prompt_int(f"Calendar year ({years[0]}–{years[-1]})", years[-1])
+                spotify_daily.calendar_chart(daily, year)
+
+        elif choice == "35":
+            n = _prompt_int("Number of top shows", 15)
+            spotify_podcasts.podcast_report(episodes, n)
+
         # ── other ─────────────────────────────────────────────────────────────
         elif choice == "0":
             n = _prompt_int("Number of top items for ranked charts", 20)
@@ -247,36 +450,266 @@ def run_menu(sp_dt, playlists, library, old_playlists):
             print("  Unknown option. Enter a number from the menu, or q to quit.")
 
 
-if __name__ == "__main__":
+def _load_history(progress=None, log=print):
+    """
+    Load and clean the configured history; returns (music, podcast episodes).
+    The data-quality report and load messages go through `log`.
+    """
+    sp_dt = spotify_scraper.extract_data(STREAMING_HISTORY_DIR, progress=progress, log=log)
+    sp_dt = spotify_scraper.clean_data(sp_dt, fix=DATA_FIX or None, log=log)
+    spotify_localtime.apply(sp_dt, _local_time_policy())
+    return spotify_scraper.split_episodes(sp_dt, log=log)
+
+
+def _local_time_policy():
+    return spotify_localtime.LocalTimePolicy(
+        LOCAL_TIME, TIMEZONE, countries=COUNTRY_ZONES,
+        schedule=spotify_localtime.parse_schedule(LOCAL_TIME_SCHEDULE))
+
+
+def _open_store(log=print):
+    store = spotify_store.SQLiteStore(SQLITE_DB)
+    if store.timezone != TIMEZONE:
+        log(f"  Warning: SQLite store uses timezone {store.timezone}, not {TIMEZONE}; "
+              f"rebuild it with --build-db.")
+    if (store.meta.get("local_time", "fixed") == "fixed") != (LOCAL_TIME == "fixed"):
+        log(f"  Warning: SQLite store was built with a different LOCAL_TIME setting; "
+              f"rebuild it with --build-db.")
+    return store, store.episodes()
+
+
+def build_db():
+    """Load everything from the configured export paths and write the SQLite store."""
+    sp_dt, episodes, playlists, library, _ = load_data()
+    spotify_store.build_store(SQLITE_DB, sp_dt, playlists, library, episodes)
+
+
+def _optional_path(setting, name):
+    """Expanded path for an optional file setting, or "" if unset / missing."""
+    path = os.path.expanduser(setting) if setting else ""
+    if path and not os.path.exists(path):
+        print(f"  Warning: {name} path not found: {path}")
+        return ""
+    return path
+
+
+def load_data():
+    """
+    Load streaming history, playlists, library and old playlists from the
+    paths configured above. Optional files that are missing come back as None.
+    Returns (sp_dt, episodes, playlists, library, old_playlists), where
+    sp_dt holds the music events and episodes the podcast episode events.
+    """
     print("\nLoading streaming history...")
-    sp_dt = spotify_scraper.extract_data(STREAMING_HISTORY_DIR)
-    sp_dt = spotify_scraper.clean_data(sp_dt)
-    sp_dt["datetime"] = sp_dt["datetime"].dt.tz_convert(TIMEZONE)
-    print(f"  Loaded {len(sp_dt):,} streaming events (times shown in {TIMEZONE}).\n")
-    spotify_analysis.listening_summary(sp_dt)
+    sp_dt, episodes = _load_history()
+    shown = TIMEZONE if LOCAL_TIME == "fixed" else f"local time by {LOCAL_TIME}, else {TIMEZONE}"
+    print(f"  Loaded {len(sp_dt):,} streaming events and {len(episodes):,} podcast episode events "
+          f"(times shown in {shown}).\n")
 
     playlists = None
-    _playlist_path = os.path.expanduser(PLAYLIST_FILE) if PLAYLIST_FILE else ""
-    if _playlist_path and os.path.exists(_playlist_path):
+    _playlist_path = _optional_path(PLAYLIST_FILE, "PLAYLIST_FILE")
+    if _playlist_path:
         print("Loading playlists...")
         playlists = spotify_playlists.load_playlists(_playlist_path)
-    elif _playlist_path:
-        print(f"  Warning: PLAYLIST_FILE path not found: {_playlist_path}")
 
     library = None
-    _library_path = os.path.expanduser(LIBRARY_FILE) if LIBRARY_FILE else ""
-    if _library_path and os.path.exists(_library_path):
+    _library_path = _optional_path(LIBRARY_FILE, "LIBRARY_FILE")
+    if _library_path:
         print("Loading library...")
         library = spotify_library.load_library(_library_path)
-    elif _library_path:
-        print(f"  Warning: LIBRARY_FILE path not found: {_library_path}")
 
     old_playlists = None
-    _old_playlist_path = os.path.expanduser(OLD_PLAYLIST_FILE) if OLD_PLAYLIST_FILE else ""
-    if _old_playlist_path and os.path.exists(_old_playlist_path):
+    _old_playlist_path = _optional_path(OLD_PLAYLIST_FILE, "OLD_PLAYLIST_FILE")
+    if _old_playlist_path:
         print("Loading old playlists (for diff)...")
         old_playlists = spotify_playlists.load_playlists(_old_playlist_path)
-    elif _old_playlist_path:
-        print(f"  Warning: OLD_PLAYLIST_FILE path not found: {_old_playlist_path}")
 
-    run_menu(sp_dt, playlists, library, old_playlists)
+    return sp_dt, episodes, playlists, library, old_playlists
+
+
+class _BackgroundLoader:
+    """
+    Runs the data loaders in background threads so the menu can be shown
+    immediately. Playlists and library are small and usually finish first;
+    their options work while the streaming history is still loading.
+    The threads are daemons, so quitting never waits for a load in progress.
+    """
+
+    _LABELS = {"history": "History", "playlists": "Playlists",
+               "library": "Library", "old_playlists": "Old playlists"}
+
+    def __init__(self):
+        self._futures  = {}
+        self._progress = {}
+        self._parts    = {}   # name → element of a tuple result (see submit)
+        self._notes    = {}   # name → messages logged while loading (see print_notes)
+
+    def submit(self, name, func, *args, with_progress=False, with_log=False):
+        """
+        Run func(*args) in the background. `name` may be a tuple of names when
+        func returns a tuple; each element is then available under its name.
+        With `with_log`, func also gets a log= callback whose messages are kept
+        for print_notes(), so nothing is printed from the loader threads.
+        """
+        names = name if isinstance(name, tuple) else (name,)
+        kwargs = {}
+        if with_progress:
+            def progress(done, total):
+                self._progress[names[0]] = (done, total)
+            args = args + (progress,)
+        if with_log:
+            kwargs["log"] = self._notes.setdefault(names[0], []).append
+        future = Future()
+        threading.Thread(target=_run_loader, args=(future, func, args, kwargs),
+                         name=f"loader-{names[0]}", daemon=True).start()
+        for i, part in enumerate(names):
+            self._futures[part] = future
+            if len(names) > 1:
+                self._parts[part] = i
+
+    def state(self, name):
+        """"missing" (not configured), "loading", "failed" or "ready"."""
+        future = self._futures.get(name)
+        if future is None:
+            return "missing"
+        if not future.done():
+            return "loading"
+        return "failed" if future.exception() else "ready"
+
+    def value(self, name):
+        """The loaded data, or None if not ready (or not configured)."""
+        if self.state(name) != "ready":
+            return None
+        result = self._futures[name].result()
+        return result[self._parts[name]] if name in self._parts else result
+
+    def error(self, name):
+        return self._futures[name].exception()
+
+    def print_notes(self):
+        """Print (from the calling thread) the messages of loaders that have finished."""
+        for name, notes in self._notes.items():
+            if self.state(name) != "loading":
+                while notes:
+                    print(notes.pop(0))
+
+    def progress_text(self, name):
+        done, total = self._progress.get(name, (0, 0))
+        if total and done < total:
+            return f"{done}/{total} files"
+        return "reading files" if not total else "cleaning"
+
+    def status_line(self):
+        parts = []
+        for name, label in self._LABELS.items():
+            state = self.state(name)
+            if state == "missing":
+                continue
+            if state == "loading":
+                state = f"loading {self.progress_text(name)}" if name == "history" else "loading"
+            parts.append(f"{label}: {state}")
+        return "  " + "   ".join(parts) + "\n"
+
+
+def _run_loader(future, func, args, kwargs):
+    """Body of one loader thread: run func and store its result in `future`."""
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+def start_background_load():
+    """Start all configured loaders in background threads; returns the loader."""
+    data = _BackgroundLoader()
+    if SQLITE_DB and os.path.exists(os.path.expanduser(SQLITE_DB)):
+        data.submit(("history", "episodes"), _open_store, with_log=True)
+    else:
+        data.submit(("history", "episodes"), _load_history, with_progress=True, with_log=True)
+
+    for name, setting, setting_name, loader in (
+            ("playlists", PLAYLIST_FILE, "PLAYLIST_FILE", spotify_playlists.load_playlists),
+            ("library", LIBRARY_FILE, "LIBRARY_FILE", spotify_library.load_library),
+            ("old_playlists", OLD_PLAYLIST_FILE, "OLD_PLAYLIST_FILE", spotify_playlists.load_playlists)):
+        path = _optional_path(setting, setting_name)
+        if path:
+            data.submit(name, loader, path, with_log=True)
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spotify streaming history analysis")
+    parser.add_argument("--serve", action="store_true",
+                        help="load the data once and run a local HTTP/JSON query server "
+                             "instead of the interactive menu")
+    parser.add_argument("--port", type=int, default=spotify_server.DEFAULT_PORT,
+                        help=f"port for --serve (default {spotify_server.DEFAULT_PORT})")
+    parser.add_argument("--accounts", nargs="+", metavar="PATH",
+                        help="multi-account mode: analyse several exports (directories, zips "
+                             "or saved .npz shards), one process per account, and print "
+                             "per-account and combined views")
+    parser.add_argument("--save-shards", metavar="DIR",
+                        help="with --accounts, also write each account's shard to DIR "
+                             "for merging later / elsewhere")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "OTHER"),
+                        help="compare two periods (years or START:END date ranges) of the "
+                             "configured history, or two accounts with --accounts")
+    parser.add_argument("--report", metavar="DIR",
+                        help="load the configured history, run every analysis in parallel "
+                             "worker processes over one shared-memory copy and write the "
+                             "results as CSV files to DIR, then exit")
+    parser.add_argument("--build-db", action="store_true",
+                        help="load the configured exports and write them to the SQLite "
+                             "store at SQLITE_DB, then exit")
+    parser.add_argument("--profile", action="store_true",
+                        help="record wall/CPU time and peak memory per load and analysis "
+                             "stage; print a summary and write a trace file on exit")
+    parser.add_argument("--profile-trace", default=spotify_profile.DEFAULT_TRACE_FILE,
+                        help=f"trace file for --profile (default {spotify_profile.DEFAULT_TRACE_FILE})")
+    args = parser.parse_args()
+
+    if args.profile:
+        spotify_profile.enable()
+
+    try:
+        if args.build_db:
+            if not SQLITE_DB:
+                parser.error("--build-db needs SQLITE_DB set in main.py")
+            build_db()
+        elif args.accounts:
+            shards = spotify_accounts.build_shards(args.accounts, _local_time_policy(),
+                                                   fix=DATA_FIX or None)
+            if args.save_shards:
+                spotify_accounts.save_shards(shards, args.save_shards)
+            if args.compare:
+                engine = spotify_compare.PeriodComparison.from_shards(shards)
+                try:
+                    spotify_compare.compare_periods(engine, *args.compare)
+                except (KeyError, ValueError) as e:
+                    print(f"  {e.args[0]}")
+            else:
+                spotify_accounts.multi_account_report(shards)
+        elif args.compare:
+            sp_dt, _ = _load_history()
+            try:
+                periods, labels = spotify_compare.parse_periods(sp_dt, args.compare)
+                spotify_compare.compare_periods(
+                    spotify_compare.PeriodComparison.build(sp_dt, periods), *labels)
+            except (KeyError, ValueError) as e:
+                print(f"  {e.args[0]}")
+        elif args.report:
+            sp_dt, _ = _load_history()
+            spotify_shared.analysis_report(sp_dt, args.report)
+        elif args.serve:
+            sp_dt, _, playlists, library, _ = load_data()
+            spotify_server.serve(sp_dt, playlists, library, port=args.port)
+        else:
+            run_menu(start_background_load())
+    finally:
+        if args.profile:
+            spotify_profile.print_summary()
+            spotify_profile.write_trace(args.profile_trace)
@@ -0,0 +1,253 @@
+# spotify_accounts.py
+#   Multi-account analysis: one shard per account export, merged afterwards.
+#
+#   Each account's export is loaded in its own worker process and reduced to
+#   a Shard of partial aggregates that merge exactly by addition:
+#     tracks   plays and ms per (track, artist) — the distinct-track set and
+#              the source for every top-N (artists are derived from it)
+#     hourly   7 × 24 plays grid (weekday × hour, in `timezone`)
+#     yearly   plays and ms per year
+#     totals   events, plays, ms, first / last play
+#   Top-N lists are only cut when a view is produced, so merging shards
+#   never loses items that are small in one account but large overall.
+#
+#   Shards can be saved to .npz and merged on another machine:
+#     python main.py --accounts alice/ bob.zip --save-shards shards/
+#     python main.py --accounts shards/alice.npz shards/bob.npz
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import spotify_localtime
+import spotify_profile
+import spotify_scraper
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
+
+COMBINED = "All accounts"
+
+_WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday",
+             "Friday", "Saturday", "Sunday"]
+
+
+class Shard:
+    """Mergeable partial aggregates for one account (or several, once merged)."""
+
+    def __init__(self, account, tracks, hourly, yearly, totals):
+        self.account = account
+        self.tracks  = tracks     # DataFrame (track, artist) → plays, ms_played
+        self.hourly  = hourly     # int64 array (7, 24)
+        self.yearly  = yearly     # DataFrame year → plays, ms_played
+        self.totals  = totals     # dict: events, plays, ms_played, first, last
+
+    @classmethod
+    @spotify_profile.profiled("shard_build")
+    def from_frame(cls, sp_df, account):
+        """Reduce a cleaned streaming history frame to a shard."""
+        times = sp_df["datetime"]
+        wall = spotify_localtime.wall_clock(sp_df)
+        counts = sp_df[["Count", "ms_played"]].rename(columns={"Count": "plays"})
+
+        tracks = (counts.groupby([sp_df[TRACK_COL].rename("track"),
+                                  sp_df[ARTIST_COL].rename("artist")])
+                        .sum())
+
+        valid = times.notna().to_numpy()
+        cell = (wall.dt.dayofweek.to_numpy()[valid] * 24
+                + wall.dt.hour.to_numpy()[valid]).astype(np.int64)
+        plays = sp_df["Count"].to_numpy()[valid]
+        hourly = np.bincount(cell, weights=plays, minlength=7 * 24).astype(np.int64).reshape(7, 24)
+
+        yearly = counts.groupby(wall.dt.year.rename("year")).sum()
+        yearly.index = yearly.index.astype(int)
+
+        totals = {"events":    len(sp_df),
+                  "plays":     int(sp_df["Count"].sum()),
+                  "ms_played": int(sp_df["ms_played"].sum()),
+                  "first":     times.min(),
+                  "last":      times.max()}
+        return cls(account, tracks, hourly, yearly, totals)
+
+    @classmethod
+    def merge(cls, shards, account=COMBINED):
+        """Combine shards into one (exact: every aggregate is a sum, min or max)."""
+        shards = list(shards)
+        tracks = pd.concat([s.tracks for s in shards]).groupby(level=["track", "artist"]).sum()
+        yearly = pd.concat([s.yearly for s in shards]).groupby(level="year").sum()
+        totals = {"events":    sum(s.totals["events"] for s in shards),
+                  "plays":     sum(s.totals["plays"] for s in shards),
+                  "ms_played": sum(s.totals["ms_played"] for s in shards),
+                  "first":     min(s.totals["first"] for s in shards),
+                  "last":      max(s.totals["last"] for s in shards)}
+        return cls(account, tracks, sum(s.hourly for s in shards), yearly, totals)
+
+    def artists(self):
+        """DataFrame artist → plays, ms_played."""
+        return self.tracks.groupby(level="artist").sum()
+
+    def save(self, path):
+        """Write the shard to a compressed .npz file."""
+        track = self.tracks.index.get_level_values("track").to_numpy(dtype=str)
+        artist = self.tracks.index.get_level_values("artist").to_numpy(dtype=str)
+        np.savez_compressed(path, account=self.account,
+                            track=track, artist=artist,
+                            track_plays=self.tracks["plays"].to_numpy(np.int64),
+                            track_ms=self.tracks["ms_played"].to_numpy(np.int64),
+                            hourly=self.hourly, timezone=str(self.totals["first"].tz),
+                            year=self.yearly.index.to_numpy(np.int64),
+                            year_plays=self.yearly["plays"].to_numpy(np.int64),
+                            year_ms=self.yearly["ms_played"].to_numpy(np.int64),
+                            totals=np.array([self.totals["events"], self.totals["plays"],
+                                             self.totals["ms_played"],
+                                             self.totals["first"].value, self.totals["last"].value],
+                                            dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """Read a shard written by save()."""
+        with np.load(path) as f:
+            index = pd.MultiIndex.from_arrays([f["track"].astype(object), f["artist"].astype(object)],
+                                              names=["track", "artist"])
+            tracks = pd.DataFrame({"plays": f["track_plays"], "ms_played": f["track_ms"]}, index=index)
+            yearly = pd.DataFrame({"plays": f["year_plays"], "ms_played": f["year_ms"]},
+                                  index=pd.Index(f["year"], name="year"))
+            events, plays, ms, first, last = (int(v) for v in f["totals"])
+            tz = str(f["timezone"])
+            totals = {"events": events, "plays": plays, "ms_played": ms,
+                      "first": pd.Timestamp(first, tz="UTC").tz_convert(tz),
+                      "last":  pd.Timestamp(last, tz="UTC").tz_convert(tz)}
+            return cls(str(f["account"]), tracks, f["hourly"], yearly, totals)
+
+
+@spotify_profile.profiled()
+def build_shards(sources, timezone="UTC", workers=None, fix=None):
+    """
+    Build one shard per account, in parallel (one process per account).
+    `sources` is a list of export directories / zips / saved .npz shards;
+    the account name is the file or folder name, prefixed with the parent
+    folder where two sources share a name (e.g. 2023/my_spotify_data.zip
+    and 2024/my_spotify_data.zip). `timezone` is a zone name or a
+    spotify_localtime.LocalTimePolicy. Returns {account: Shard}.
+    Raises ValueError if two sources still map to the same account.
+    """
+    if not isinstance(timezone, spotify_localtime.LocalTimePolicy):
+        timezone = spotify_localtime.LocalTimePolicy("fixed", timezone)
+    jobs = list(zip(_account_names(sources), (os.path.expanduser(s) for s in sources)))
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_build_shard, jobs,
+                                   [timezone] * len(jobs), [fix] * len(jobs)))
+    else:
+        shards = [_build_shard(job, timezone, fix) for job in jobs]
+    return {shard.account: shard for shard in shards}
+
+
+def save_shards(shards, output_dir):
+    """Write every shard to `output_dir`/<account>.npz."""
+    os.makedirs(output_dir, exist_ok=True)
+    for account, shard in shards.items():
+        shard.save(os.path.join(output_dir, f"{account}.npz"))
+    print(f"  {len(shards)} shard(s) written to '{output_dir}/'")
+
+
+def accounts_summary_data(shards):
+    """DataFrame: one row per account plus the combined row — plays, hours, unique tracks / artists, range."""
+    views = list(shards.values()) + [Shard.merge(shards.values())]
+    return pd.DataFrame([{"account":        s.account,
+                          "plays":          s.totals["plays"],
+                          "hours":          s.totals["ms_played"] * MS_TO_HOURS,
+                          "unique_tracks":  len(s.tracks),
+                          "unique_artists": s.tracks.index.get_level_values("artist").nunique(),
+                          "first":          s.totals["first"].date(),
+                          "last":           s.totals["last"].date()}
+                         for s in views])
+
+
+def top_by_account_data(shards, key="artist", num=20, measure="plays"):
+    """
+    Top `num` items (`key` "artist" or "track") over all accounts, with one
+    `measure` column per account plus "total".
+    """
+    def table(shard):
+        return shard.artists() if key == "artist" else shard.tracks
+
+    combined = table(Shard.merge(shards.values()))[measure]
+    top = combined.sort_values(ascending=False, kind="stable").head(num)
+    result = pd.DataFrame({account: table(shard)[measure].reindex(top.index, fill_value=0)
+                           for account, shard in shards.items()})
+    result["total"] = top
+    return result
+
+
+@spotify_profile.profiled()
+def multi_account_report(shards, num=15):
+    """Print per-account and combined summaries and top artists; chart yearly hours and the combined heatmap."""
+    summary = accounts_summary_data(shards)
+    print(f"\n  {'Account':<24} {'Plays':>10} {'Hours':>9} {'Tracks':>8} {'Artists':>8}  Range")
+    print("  " + "─" * 84)
+    for row in summary.itertuples(index=False):
+        print(f"  {row.account[:22]:<24} {row.plays:>10,} {row.hours:>9,.1f} "
+              f"{row.unique_tracks:>8,} {row.unique_artists:>8,}  {row.first} → {row.last}")
+
+    top = top_by_account_data(shards, "artist", num)
+    print(f"\n  Top {num} artists across accounts (plays):")
+    print(top.to_string())
+
+    combined = Shard.merge(shards.values())
+    with spotify_profile.stage("render"):
+        hours = pd.DataFrame({account: shard.yearly["ms_played"] * MS_TO_HOURS
+                              for account, shard in shards.items()}).fillna(0).sort_index()
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(18, 5),
+                                       gridspec_kw={"width_ratios": [1, 2]})
+        hours.plot.bar(stacked=True, ax=ax1, colormap="Greens", edgecolor="white")
+        ax1.set(title="Hours Listened per Year by Account", xlabel="Year", ylabel="Hours")
+        sns.heatmap(pd.DataFrame(combined.hourly, index=_WEEKDAYS), cmap="Greens", ax=ax2,
+                    linewidths=0.3, cbar_kws={"label": "Songs Played"})
+        ax2.set(title="All Accounts: Day of Week vs. Hour of Day", xlabel="Hour of Day (0–23)")
+        plt.tight_layout()
+    plt.show()
+    return summary
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _account_name(source):
+    name = os.path.basename(os.path.normpath(os.path.expanduser(source)))
+    return os.path.splitext(name)[0] if name.lower().endswith((".zip", ".npz")) else name
+
+
+def _account_names(sources):
+    """Account name per source (see build_shards); raises ValueError on a clash."""
+    base = [_account_name(s) for s in sources]
+    names = list(base)
+    for i, source in enumerate(sources):
+        if base.count(base[i]) > 1:
+            parent = os.path.dirname(os.path.normpath(os.path.expanduser(source)))
+            names[i] = f"{os.path.basename(parent)}-{base[i]}"
+    clashes = sorted({name for name in names if names.count(name) > 1})
+    if clashes:
+        raise ValueError(f"Several sources map to account {', '.join(map(repr, clashes))}; "
+                         f"rename or move them so each account has its own name.")
+    return names
+
+
+def _build_shard(job, policy, fix):
+    """Worker: load one account's export (or saved shard) and reduce it to a Shard."""
+    account, source = job
+    if source.lower().endswith(".npz"):
+        shard = Shard.load(source)
+        shard.account = account
+        return shard
+
+    # One process per account already; read this account's files serially.
+    sp_df = spotify_scraper.extract_data(source, workers=1)
+    sp_df = spotify_scraper.clean_data(sp_df, fix=fix)
+    spotify_localtime.apply(sp_df, policy)
+    music, _ = spotify_scraper.split_episodes(sp_df)
+    return Shard.from_frame(music, account)
@@ -1,7 +1,14 @@
 
 # spotify_analysis.py
 #   Visualization and analysis functions for Spotify Extended Streaming History.
-#   All functions accept the cleaned DataFrame produced by spotify_scraper.clean_data().
+#   All functions accept the cleaned DataFrame produced by spotify_scraper.clean_data(),
+#   normally the music table from spotify_scraper.split_episodes() (podcast
+#   episodes are analysed separately in spotify_podcasts.py).
+#
+#   Each chart function has a matching *_data() function that only computes
+#   the numbers behind it (used by spotify_server and other non-chart callers).
+#   Any function here also accepts a spotify_store.SQLiteStore in place of the
+#   DataFrame; the *_data() step then runs as SQL against the store.
 #
 #   'type' parameter used throughout:
 #       "Count"     - number of times played
@@ -13,12 +20,14 @@ import matplotlib.ticker as mticker
 import numpy as np
 import seaborn as sns
 
+import spotify_daily
+import spotify_localtime
+import spotify_profile
+import spotify_store
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
 
-# ── Helpers ───────────────────────────────────────────────────────────────────
 
-ARTIST_COL = "master_metadata_album_artist_name"
-TRACK_COL  = "master_metadata_track_name"
-MS_TO_HOURS = 2.77e-7   # multiply ms_played by this to get hours
+# ── Helpers ───────────────────────────────────────────────────────────────────
 
 _GREEN_PALETTE = "Greens_r"
 
@@ -30,16 +39,37 @@ def _bar_chart(ax, labels, values, title, xlabel, ylabel, color="mediumseagreen"
     plt.tight_layout()
 
 
+def _largest(grouped, num=None, column=None):
+    """
+    Sort per-name totals largest first, ties by name (the order the SQL store
+    uses, so pushdown returns identical results), then keep the first `num`.
+    """
+    if isinstance(grouped.index.dtype, pd.CategoricalDtype):
+        # Categories are in first-seen order; sort by the names themselves.
+        grouped = grouped.set_axis(grouped.index.astype(grouped.index.categories.dtype))
+    grouped = grouped.sort_index()
+    if column is None:
+        grouped = grouped.sort_values(ascending=False, kind="stable")
+    else:
+        grouped = grouped.sort_values(by=column, ascending=False, kind="stable")
+    return grouped if num is None else grouped.head(num)
+
+
 ##############################################################################
 ####      ARTIST / SONG ANALYSIS                                          ####
 ##############################################################################
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def top_songs_data(sp_df, num=20, type="Count"):
+    """Top `num` songs by play count or total playtime, largest first (ties by name)."""
+    return _largest(sp_df.groupby(TRACK_COL)[[type]].sum(), num, type)
+
+
+@spotify_profile.profiled()
 def top_songs(sp_df, num=20, type="Count"):
     """Bar chart of the top `num` songs by play count or total playtime."""
-    grouped = (sp_df.groupby(TRACK_COL)[[type]]
-                    .sum()
-                    .sort_values(by=type, ascending=False)
-                    .head(num))
+    grouped = top_songs_data(sp_df, num, type)
 
     if type == "ms_played":
         values = grouped[type] * MS_TO_HOURS
@@ -53,18 +83,24 @@ def top_songs(sp_df, num=20, type="Count"):
     print(f"\nTop {min(num, 20)} songs ({type}):")
     print(grouped.head(20).to_string())
 
-    fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
-    _bar_chart(ax, grouped.index, values, title, "Song", ylabel)
-    plt.subplots_adjust(bottom=0.55)
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
+        _bar_chart(ax, grouped.index, values, title, "Song", ylabel)
+        plt.subplots_adjust(bottom=0.55)
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def top_artists_data(sp_df, num=20, type="Count"):
+    """Top `num` artists by play count or total playtime, largest first (ties by name)."""
+    return _largest(sp_df.groupby(ARTIST_COL)[[type]].sum(), num, type)
+
+
+@spotify_profile.profiled()
 def top_artists(sp_df, num=20, type="Count"):
     """Bar chart of the top `num` artists by play count or total playtime."""
-    grouped = (sp_df.groupby(ARTIST_COL)[[type]]
-                    .sum()
-                    .sort_values(by=type, ascending=False)
-                    .head(num))
+    grouped = top_artists_data(sp_df, num, type)
 
     if type == "ms_played":
         values = grouped[type] * MS_TO_HOURS
@@ -75,16 +111,27 @@ def top_artists(sp_df, num=20, type="Count"):
         ylabel = "Play Count"
         title  = f"Top {num} Artists by Play Count"
 
-    fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
-    _bar_chart(ax, grouped.index, values, title, "Artist", ylabel)
-    plt.subplots_adjust(bottom=0.45)
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
+        _bar_chart(ax, grouped.index, values, title, "Artist", ylabel)
+        plt.subplots_adjust(bottom=0.45)
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def uniq_artist_data(sp_df):
+    """Number of distinct artists and total artist plays."""
+    return {"unique": int(sp_df[ARTIST_COL].nunique()),
+            "total":  int(sp_df[ARTIST_COL].count())}
+
+
+@spotify_profile.profiled()
 def uniq_artist(sp_df):
     """Pie chart showing the ratio of unique vs. repeated artist plays."""
-    unique_artists = sp_df[ARTIST_COL].nunique()
-    total_artists  = sp_df[ARTIST_COL].count()
+    counts = uniq_artist_data(sp_df)
+    unique_artists = counts["unique"]
+    total_artists  = counts["total"]
 
     unique_pct = unique_artists / total_artists * 100
     print(f"\nUnique artist percentage: {unique_pct:.1f}%")
@@ -92,32 +139,38 @@ def uniq_artist(sp_df):
     sizes  = [unique_artists, total_artists - unique_artists]
     labels = ["Unique Artists", "Repeated Artists"]
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    ax.pie(sizes, labels=labels, autopct="%1.1f%%",
-           explode=[0.05, 0.05], startangle=180, shadow=True,
-           colors=["mediumseagreen", "lightgray"])
-    ax.set_title("Unique vs. Repeated Artist Plays")
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(8, 6))
+        ax.pie(sizes, labels=labels, autopct="%1.1f%%",
+               explode=[0.05, 0.05], startangle=180, shadow=True,
+               colors=["mediumseagreen", "lightgray"])
+        ax.set_title("Unique vs. Repeated Artist Plays")
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def uniq_song_from_artist_data(sp_df, num=20, type="Count"):
+    """Series: number of unique tracks for each of the top-N artists."""
+    top = top_artists_data(sp_df, num, type).index
+    subset = sp_df[sp_df[ARTIST_COL].isin(top)]
+    return (subset.groupby(ARTIST_COL)[TRACK_COL]
+                  .nunique()
+                  .reindex(top)
+                  .rename("unique_songs"))
+
+
+@spotify_profile.profiled()
 def uniq_song_from_artist(sp_df, num=20, type="Count"):
     """Bar chart: number of unique tracks per top-N artists."""
-    top_artists = (sp_df.groupby(ARTIST_COL)[[type]]
-                        .sum()
-                        .sort_values(by=type, ascending=False)
-                        .head(num)
-                        .index.tolist())
-
-    num_unique = []
-    for artist in top_artists:
-        songs = sp_df[sp_df[ARTIST_COL] == artist]
-        num_unique.append(songs[TRACK_COL].nunique())
-
-    fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
-    _bar_chart(ax, top_artists, num_unique,
-               f"Unique Songs from Top {num} Artists", "Artist",
-               "Unique Songs", color="mediumseagreen")
-    plt.subplots_adjust(bottom=0.45)
+    num_unique = uniq_song_from_artist_data(sp_df, num, type)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(max(14, num // 2), 6))
+        _bar_chart(ax, num_unique.index.tolist(), num_unique.values,
+                   f"Unique Songs from Top {num} Artists", "Artist",
+                   "Unique Songs", color="mediumseagreen")
+        plt.subplots_adjust(bottom=0.45)
     plt.show()
 
 
@@ -125,42 +178,67 @@ def uniq_song_from_artist(sp_df, num=20, type="Count"):
 ####      TIME-OF-DAY / WEEKLY PATTERNS                                   ####
 ##############################################################################
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def daytime_usage_data(sp_df):
+    """Series: songs played in each hour of the day (0–23)."""
+    return (spotify_localtime.wall_clock(sp_df).dt.hour
+                             .value_counts()
+                             .reindex(range(24), fill_value=0)
+                             .rename_axis("hour")
+                             .rename("Count"))
+
+
+@spotify_profile.profiled()
 def daytime_usage(sp_df):
     """Histogram of listening activity by hour of day (0–23)."""
-    df = sp_df.copy()
-    df["hour"] = df["datetime"].dt.hour
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    sns.histplot(df["hour"], bins=24, kde=True, color="mediumseagreen", ax=ax)
-    ax.set_xticks(range(0, 24))
-    ax.set(title="Listening Activity Throughout the Day",
-           xlabel="Hour of Day (24-hour clock)",
-           ylabel="Songs Played")
-    plt.tight_layout()
+    hourly = daytime_usage_data(sp_df)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        sns.histplot(x=hourly.index, weights=hourly.values, bins=24, kde=True,
+                     color="mediumseagreen", ax=ax)
+        ax.set_xticks(range(0, 24))
+        ax.set(title="Listening Activity Throughout the Day",
+               xlabel="Hour of Day (24-hour clock)",
+               ylabel="Songs Played")
+        plt.tight_layout()
     plt.show()
 
 
-def listening_heatmap(sp_df):
-    """Seaborn heatmap: songs played by day-of-week (rows) × hour (columns)."""
-    df = sp_df.copy()
-    df["hour"]        = df["datetime"].dt.hour
-    df["day_of_week"] = df["datetime"].dt.day_name()
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def listening_heatmap_data(sp_df):
+    """DataFrame: songs played by day-of-week (rows, Monday first) × hour (columns)."""
+    with spotify_profile.stage("hour"):
+        hour = spotify_localtime.wall_clock(sp_df).dt.hour
+    with spotify_profile.stage("day_name"):
+        day_name = spotify_localtime.wall_clock(sp_df).dt.day_name()
+    df = pd.DataFrame({"hour": hour, "day_of_week": day_name, "Count": sp_df["Count"]})
 
     day_order = ["Monday", "Tuesday", "Wednesday", "Thursday",
                  "Friday", "Saturday", "Sunday"]
 
-    pivot = (df.groupby(["day_of_week", "hour"])["Count"]
-               .sum()
-               .unstack(fill_value=0)
-               .reindex(day_order))
-
-    fig, ax = plt.subplots(figsize=(16, 5))
-    sns.heatmap(pivot, cmap="Greens", ax=ax, linewidths=0.3,
-                cbar_kws={"label": "Songs Played"})
-    ax.set(title="Listening Activity: Day of Week vs. Hour of Day",
-           xlabel="Hour of Day (0–23)",
-           ylabel="")
-    plt.tight_layout()
+    with spotify_profile.stage("groupby"):
+        return (df.groupby(["day_of_week", "hour"])["Count"]
+                  .sum()
+                  .unstack(fill_value=0)
+                  .reindex(day_order))
+
+
+@spotify_profile.profiled()
+def listening_heatmap(sp_df):
+    """Seaborn heatmap: songs played by day-of-week (rows) × hour (columns)."""
+    pivot = listening_heatmap_data(sp_df)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(16, 5))
+        sns.heatmap(pivot, cmap="Greens", ax=ax, linewidths=0.3,
+                    cbar_kws={"label": "Songs Played"})
+        ax.set(title="Listening Activity: Day of Week vs. Hour of Day",
+               xlabel="Hour of Day (0–23)",
+               ylabel="")
+        plt.tight_layout()
     plt.show()
 
 
@@ -168,81 +246,122 @@ def listening_heatmap(sp_df):
 ####      YEAR / LONG-TERM TRENDS                                         ####
 ##############################################################################
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def year_usage_data(sp_df):
+    """Series: songs played in each calendar month (1–12), all years combined."""
+    return (spotify_localtime.wall_clock(sp_df).dt.month
+                             .value_counts()
+                             .reindex(range(1, 13), fill_value=0)
+                             .rename_axis("month")
+                             .rename("Count"))
+
+
+@spotify_profile.profiled()
 def year_usage(sp_df):
     """Horizontal count plot: songs played per calendar month (1–12)."""
-    df = sp_df.copy()
-    df["month"] = pd.DatetimeIndex(df["datetime"]).month
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    sns.countplot(y=df["month"], ax=ax, color="mediumseagreen",
-                  order=range(1, 13))
-    ax.set(title="Average Spotify Usage Across a Year",
-           xlabel="Songs Played", ylabel="Month (1–12)")
-    plt.tight_layout()
+    monthly = year_usage_data(sp_df)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        sns.barplot(x=monthly.values, y=monthly.index, orient="h", ax=ax,
+                    color="mediumseagreen", order=range(1, 13))
+        ax.set(title="Average Spotify Usage Across a Year",
+               xlabel="Songs Played", ylabel="Month (1–12)")
+        plt.tight_layout()
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def yearly_comparison_data(sp_df):
+    """DataFrame with one row per year: plays and hours listened."""
+    yearly = (sp_df.groupby(spotify_localtime.wall_clock(sp_df).dt.year.rename("year"))
+                   .agg(plays=("Count", "sum"),
+                        hours=("ms_played", "sum"))
+                   .reset_index())
+    yearly["hours"] = yearly["hours"] * MS_TO_HOURS
+    return yearly
+
+
+@spotify_profile.profiled()
 def yearly_comparison(sp_df):
     """Side-by-side bar charts: songs played and hours listened per year."""
-    df = sp_df.copy()
-    df["year"] = df["datetime"].dt.year
-
-    yearly = (df.groupby("year")
-                .agg(plays=("Count", "sum"),
-                     hours=("ms_played", lambda x: x.sum() * MS_TO_HOURS))
-                .reset_index())
+    yearly = yearly_comparison_data(sp_df)
 
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    with spotify_profile.stage("render"):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
 
-    ax1.bar(yearly["year"].astype(str), yearly["plays"], color="mediumseagreen")
-    ax1.set(title="Songs Played per Year", xlabel="Year", ylabel="Play Count")
+        ax1.bar(yearly["year"].astype(str), yearly["plays"], color="mediumseagreen")
+        ax1.set(title="Songs Played per Year", xlabel="Year", ylabel="Play Count")
 
-    ax2.bar(yearly["year"].astype(str), yearly["hours"], color="seagreen")
-    ax2.set(title="Hours Listened per Year", xlabel="Year", ylabel="Hours")
+        ax2.bar(yearly["year"].astype(str), yearly["hours"], color="seagreen")
+        ax2.set(title="Hours Listened per Year", xlabel="Year", ylabel="Hours")
 
-    plt.tight_layout()
+        plt.tight_layout()
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def max_song_day_data(sp_df):
+    """DataFrame indexed by date: songs played per day, busiest day first (ties by date)."""
+    # Integer day ordinals instead of .dt.date: no Python date object per play.
+    times = spotify_localtime.wall_clock(sp_df)
+    valid = times.notna().to_numpy()
+    days = spotify_daily.day_ordinals(times)[valid]
+    counts = pd.Series(sp_df["Count"].to_numpy()[valid]).groupby(days).sum()
+    dates = counts.index.to_numpy(dtype=np.int64).astype("datetime64[D]").astype(object)
+    return (pd.DataFrame({"Count": counts.to_numpy()}, index=pd.Index(dates, name="date"))
+              .sort_values(by="Count", ascending=False, kind="stable"))
+
+
+@spotify_profile.profiled()
 def max_song_day(sp_df):
     """Scatter plot of songs played per day, with mean line."""
-    df = sp_df.copy()
-    df["date"] = df["datetime"].dt.date
-
-    daily = (df.groupby("date")[["Count"]]
-               .sum()
-               .sort_values(by="Count", ascending=False))
+    daily = max_song_day_data(sp_df)
 
     print("\nDays with most songs played:")
     print(daily.head(5).to_string())
 
-    fig, ax = plt.subplots(figsize=(15, 6))
-    ax.scatter(daily.index, daily["Count"], color="mediumseagreen",
-               s=10, alpha=0.6)
-    ax.axhline(daily["Count"].mean(), linestyle="--", color="red",
-               label=f"Mean: {daily['Count'].mean():.1f}")
-    ax.set(title="Songs Played per Day Over Time",
-           xlabel="Date", ylabel="Songs Played")
-    ax.legend()
-    plt.tight_layout()
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(15, 6))
+        ax.scatter(daily.index, daily["Count"], color="mediumseagreen",
+                   s=10, alpha=0.6)
+        ax.axhline(daily["Count"].mean(), linestyle="--", color="red",
+                   label=f"Mean: {daily['Count'].mean():.1f}")
+        ax.set(title="Songs Played per Day Over Time",
+               xlabel="Date", ylabel="Songs Played")
+        ax.legend()
+        plt.tight_layout()
     plt.show()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def cumulative_listening_data(sp_df):
+    """DataFrame of datetime and running total of hours listened, one row per play in time order."""
+    df = sp_df[["datetime", "ms_played"]].sort_values("datetime", kind="stable", ignore_index=True)
+    return pd.DataFrame({"datetime":         df["datetime"],
+                         "cumulative_hours": df["ms_played"].cumsum() * MS_TO_HOURS})
+
+
+@spotify_profile.profiled()
 def cumulative_listening(sp_df):
     """Line chart of cumulative hours listened over the entire dataset."""
-    df = sp_df.sort_values("datetime").copy()
-    df["cumulative_hours"] = df["ms_played"].cumsum() * MS_TO_HOURS
-
-    fig, ax = plt.subplots(figsize=(15, 6))
-    ax.plot(df["datetime"], df["cumulative_hours"],
-            color="mediumseagreen", linewidth=1)
-    ax.fill_between(df["datetime"], df["cumulative_hours"],
-                    alpha=0.25, color="mediumseagreen")
-    ax.set(title="Cumulative Listening Time Over All Time",
-           xlabel="Date", ylabel="Total Hours Listened")
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(
-        lambda x, _: f"{int(x):,} h"))
-    plt.tight_layout()
+    df = cumulative_listening_data(sp_df)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(15, 6))
+        ax.plot(df["datetime"], df["cumulative_hours"],
+                color="mediumseagreen", linewidth=1)
+        ax.fill_between(df["datetime"], df["cumulative_hours"],
+                        alpha=0.25, color="mediumseagreen")
+        ax.set(title="Cumulative Listening Time Over All Time",
+               xlabel="Date", ylabel="Total Hours Listened")
+        ax.yaxis.set_major_formatter(mticker.FuncFormatter(
+            lambda x, _: f"{int(x):,} h"))
+        plt.tight_layout()
     plt.show()
 
 
@@ -250,6 +369,24 @@ def cumulative_listening(sp_df):
 ####      BEHAVIOR ANALYSIS                                               ####
 ##############################################################################
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def skip_analysis_data(sp_df, skip_threshold_ms=30_000, num=15):
+    """
+    Skip counts (plays where ms_played < threshold) and the `num` most
+    frequently skipped songs.
+    Returns dict with keys "played", "skipped" and "top_skipped" (Series).
+    """
+    skipped = sp_df["ms_played"] < skip_threshold_ms
+
+    top_skipped = _largest(sp_df[skipped].groupby(TRACK_COL)["Count"].sum(), num)
+
+    return {"played":      int((~skipped).sum()),
+            "skipped":     int(skipped.sum()),
+            "top_skipped": top_skipped}
+
+
+@spotify_profile.profiled()
 def skip_analysis(sp_df, skip_threshold_ms=30_000):
     """
     Two-panel figure:
@@ -258,39 +395,35 @@ def skip_analysis(sp_df, skip_threshold_ms=30_000):
 
     Default threshold is 30 seconds (30,000 ms).
     """
-    df = sp_df.copy()
-    df["skipped"] = df["ms_played"] < skip_threshold_ms
+    result = skip_analysis_data(sp_df, skip_threshold_ms)
 
-    skipped_count = int(df["skipped"].sum())
-    played_count  = int((~df["skipped"]).sum())
+    skipped_count = result["skipped"]
+    played_count  = result["played"]
     total         = skipped_count + played_count
 
     print(f"\nSkip analysis (threshold: {skip_threshold_ms // 1000}s):")
     print(f"  Played : {played_count:,}  ({played_count / total * 100:.1f}%)")
     print(f"  Skipped: {skipped_count:,}  ({skipped_count / total * 100:.1f}%)")
 
-    top_skipped = (df[df["skipped"]]
-                   .groupby(TRACK_COL)["Count"]
-                   .sum()
-                   .sort_values(ascending=False)
-                   .head(15))
+    top_skipped = result["top_skipped"]
 
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    with spotify_profile.stage("render"):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
 
-    ax1.pie([played_count, skipped_count],
-            labels=["Played", f"Skipped (< {skip_threshold_ms // 1000}s)"],
-            autopct="%1.1f%%",
-            colors=["mediumseagreen", "lightcoral"],
-            explode=[0.05, 0.05], startangle=90, shadow=True)
-    ax1.set_title("Skip Rate")
+        ax1.pie([played_count, skipped_count],
+                labels=["Played", f"Skipped (< {skip_threshold_ms // 1000}s)"],
+                autopct="%1.1f%%",
+                colors=["mediumseagreen", "lightcoral"],
+                explode=[0.05, 0.05], startangle=90, shadow=True)
+        ax1.set_title("Skip Rate")
 
-    ax2.barh(top_skipped.index[::-1], top_skipped.values[::-1],
-             color="lightcoral")
-    ax2.set(title="Most Frequently Skipped Songs",
-            xlabel="Skip Count", ylabel="")
-    ax2.tick_params(axis="y", labelsize=8)
+        ax2.barh(top_skipped.index[::-1], top_skipped.values[::-1],
+                 color="lightcoral")
+        ax2.set(title="Most Frequently Skipped Songs",
+                xlabel="Skip Count", ylabel="")
+        ax2.tick_params(axis="y", labelsize=8)
 
-    plt.tight_layout()
+        plt.tight_layout()
     plt.show()
 
 
@@ -298,15 +431,34 @@ def skip_analysis(sp_df, skip_threshold_ms=30_000):
 ####      SUMMARY & ADDITIONAL VIEWS  (stolen from Spotify_Wrapped.ipynb) ####
 ##############################################################################
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def listening_summary_data(sp_df):
+    """Dict of headline stats for the loaded dataset."""
+    first_date = sp_df["datetime"].min()
+    last_date  = sp_df["datetime"].max()
+    days_span  = max((last_date - first_date).days, 1)
+    return {"first_date":     first_date,
+            "last_date":      last_date,
+            "days_span":      days_span,
+            "total_streams":  len(sp_df),
+            "total_hours":    float(sp_df["ms_played"].sum() * MS_TO_HOURS),
+            "avg_per_day":    len(sp_df) / days_span,
+            "unique_artists": int(sp_df[ARTIST_COL].nunique()),
+            "unique_tracks":  int(sp_df[TRACK_COL].nunique())}
+
+
+@spotify_profile.profiled()
 def listening_summary(sp_df):
     """Print a one-screen stats dashboard for the loaded dataset."""
-    total_hours   = sp_df["ms_played"].sum() * MS_TO_HOURS
-    first_date    = sp_df["datetime"].min()
-    last_date     = sp_df["datetime"].max()
-    days_span     = max((last_date - first_date).days, 1)
-    avg_per_day   = len(sp_df) / days_span
-    unique_artists = sp_df[ARTIST_COL].nunique()
-    unique_tracks  = sp_df[TRACK_COL].nunique()
+    stats = listening_summary_data(sp_df)
+    total_hours    = stats["total_hours"]
+    first_date     = stats["first_date"]
+    last_date      = stats["last_date"]
+    days_span      = stats["days_span"]
+    avg_per_day    = stats["avg_per_day"]
+    unique_artists = stats["unique_artists"]
+    unique_tracks  = stats["unique_tracks"]
 
     print()
     print("  ╔══════════════════════════════════════════════╗")
@@ -314,7 +466,7 @@ def listening_summary(sp_df):
     print("  ╠══════════════════════════════════════════════╣")
     print(f"  ║  Date range    {str(first_date.date())!s:>10} → {str(last_date.date())!s:<10}  ║")
     print(f"  ║  Span          {days_span:>10,} days                  ║")
-    print(f"  ║  Total streams {len(sp_df):>10,}                      ║")
+    print(f"  ║  Total streams {stats['total_streams']:>10,}                      ║")
     print(f"  ║  Total hours   {total_hours:>10,.1f} h                  ║")
     print(f"  ║  Avg songs/day {avg_per_day:>10.1f}                      ║")
     print(f"  ║  Unique artists{unique_artists:>10,}                      ║")
@@ -323,64 +475,96 @@ def listening_summary(sp_df):
     print()
 
 
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def uniq_song_data(sp_df):
+    """Number of distinct songs and total song plays."""
+    return {"unique": int(sp_df[TRACK_COL].nunique()),
+            "total":  int(sp_df[TRACK_COL].count())}
+
+
+@spotify_profile.profiled()
 def uniq_song_pie(sp_df):
     """Pie chart: unique vs. repeated song plays (mirrors uniq_artist for tracks)."""
-    unique_songs = sp_df[TRACK_COL].nunique()
-    total_songs  = sp_df[TRACK_COL].count()
+    counts = uniq_song_data(sp_df)
+    unique_songs = counts["unique"]
+    total_songs  = counts["total"]
 
     print(f"\n  Unique song percentage: {unique_songs / total_songs * 100:.1f}%")
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    ax.pie([unique_songs, total_songs - unique_songs],
-           labels=["Unique Songs", "Repeated Songs"],
-           autopct="%1.1f%%",
-           explode=[0.05, 0.05], startangle=180, shadow=True,
-           colors=["mediumseagreen", "lightgray"])
-    ax.set_title("Unique vs. Repeated Song Plays")
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(8, 6))
+        ax.pie([unique_songs, total_songs - unique_songs],
+               labels=["Unique Songs", "Repeated Songs"],
+               autopct="%1.1f%%",
+               explode=[0.05, 0.05], startangle=180, shadow=True,
+               colors=["mediumseagreen", "lightgray"])
+        ax.set_title("Unique vs. Repeated Song Plays")
     plt.show()
 
 
-def day_of_week(sp_df):
-    """Bar chart of songs played by day of week (Monday → Sunday)."""
-    df = sp_df.copy()
-    df["day_name"] = df["datetime"].dt.day_name()
-
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def day_of_week_data(sp_df):
+    """Series: songs played on each day of the week (Monday → Sunday)."""
     day_order = ["Monday", "Tuesday", "Wednesday", "Thursday",
                  "Friday", "Saturday", "Sunday"]
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.countplot(x=df["day_name"], order=day_order,
-                  color="mediumseagreen", ax=ax)
-    ax.set(title="Songs Played by Day of Week",
-           xlabel="", ylabel="Songs Played")
-    plt.tight_layout()
+    return (spotify_localtime.wall_clock(sp_df).dt.day_name()
+                             .value_counts()
+                             .reindex(day_order, fill_value=0)
+                             .rename_axis("day_name")
+                             .rename("Count"))
+
+
+@spotify_profile.profiled()
+def day_of_week(sp_df):
+    """Bar chart of songs played by day of week (Monday → Sunday)."""
+    daily = day_of_week_data(sp_df)
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        sns.barplot(x=daily.index, y=daily.values, order=daily.index,
+                    color="mediumseagreen", ax=ax)
+        ax.set(title="Songs Played by Day of Week",
+               xlabel="", ylabel="Songs Played")
+        plt.tight_layout()
     plt.show()
 
 
-def weekday_vs_weekend(sp_df):
-    """Side-by-side bar charts comparing weekday vs. weekend listening."""
-    df = sp_df.copy()
-    df["is_weekend"] = df["datetime"].dt.day_name().isin(["Saturday", "Sunday"])
+@spotify_profile.profiled()
+@spotify_store.pushdown
+def weekday_vs_weekend_data(sp_df):
+    """DataFrame with Weekday / Weekend rows: play count and percentage."""
+    is_weekend = (spotify_localtime.wall_clock(sp_df).dt.dayofweek >= 5).rename("is_weekend")
 
-    summary = (df.groupby("is_weekend")["Count"]
-                 .sum()
-                 .reset_index())
+    summary = (sp_df.groupby(is_weekend)["Count"]
+                    .sum()
+                    .reset_index())
     summary["label"] = summary["is_weekend"].map({False: "Weekday", True: "Weekend"})
     summary["pct"]   = summary["Count"] / summary["Count"].sum() * 100
+    return summary
+
+
+@spotify_profile.profiled()
+def weekday_vs_weekend(sp_df):
+    """Side-by-side bar charts comparing weekday vs. weekend listening."""
+    summary = weekday_vs_weekend_data(sp_df)
 
     for _, row in summary.iterrows():
         print(f"  {row['label']}: {int(row['Count']):,}  ({row['pct']:.1f}%)")
 
     colors = ["steelblue", "mediumseagreen"]
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+    with spotify_profile.stage("render"):
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
 
-    ax1.bar(summary["label"], summary["Count"], color=colors)
-    ax1.set(title="Weekday vs. Weekend (Count)", ylabel="Songs Played")
+        ax1.bar(summary["label"], summary["Count"], color=colors)
+        ax1.set(title="Weekday vs. Weekend (Count)", ylabel="Songs Played")
 
-    ax2.bar(summary["label"], summary["pct"], color=colors)
-    ax2.set(title="Weekday vs. Weekend (%)", ylabel="Percentage")
-    ax2.yaxis.set_major_formatter(
-        mticker.FuncFormatter(lambda x, _: f"{x:.0f}%"))
+        ax2.bar(summary["label"], summary["pct"], color=colors)
+        ax2.set(title="Weekday vs. Weekend (%)", ylabel="Percentage")
+        ax2.yaxis.set_major_formatter(
+            mticker.FuncFormatter(lambda x, _: f"{x:.0f}%"))
 
-    plt.tight_layout()
+        plt.tight_layout()
     plt.show()
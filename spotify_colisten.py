@@ -0,0 +1,244 @@
+# spotify_colisten.py
+#   "Played together" analysis: which tracks (or artists) are played right
+#   after one another within the same listening session.
+#
+#   The streaming history is sorted by time once, items are integer encoded,
+#   and every pair (X, then Y within `window` plays, same session)
+#   becomes one entry in a sparse co-occurrence matrix stored in CSR form
+#   (row = X, column = Y). Neighbour queries then read a single row or
+#   column and take the top N, without touching the event data again.
+#
+#   A session ends when the gap between two plays exceeds `session_gap_min`.
+#   Repeats of the same item back to back are not counted as pairs.
+#
+#   Tracks are identified by spotify_track_uri (artist + track name for
+#   basic exports, which have no URIs), so different songs sharing a title
+#   stay apart; the "Track — Artist" display labels are kept separately.
+#
+#   The matrix can be saved to / loaded from a .npz file for reuse.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import spotify_profile
+import spotify_scraper
+from spotify_columns import ARTIST_COL, TRACK_COL
+
+URI_COL = "spotify_track_uri"
+
+
+class CoListenMatrix:
+    """
+    Sparse directed co-occurrence counts between items (tracks or artists).
+    counts[X, Y] = number of times Y was played within `window` plays after X
+    in the same session.
+
+    Per item: `labels` (display name), `names` (track or artist name, for
+    lookups) and `plays`; all are arrays indexed by item.
+    """
+
+    def __init__(self, labels, names, plays, rows, cols, counts, by, window, session_gap_min):
+        self.labels          = np.asarray(labels, dtype=object)
+        self.names           = np.asarray(names, dtype=object)
+        self.plays           = plays
+        self.by              = by
+        self.window          = window
+        self.session_gap_min = session_gap_min
+
+        # Entries sorted by (row, col): CSR row pointers answer "after X".
+        n = len(self.labels)
+        self._rows   = rows
+        self._cols   = cols
+        self._counts = counts
+        self._row_ptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n))))
+
+        # Same entries ordered by column answer "before Y".
+        self._col_order = np.argsort(cols, kind="stable")
+        self._col_ptr   = np.concatenate(([0], np.cumsum(np.bincount(cols, minlength=n))))
+
+        self._index = None   # lowercased label / name → items, built on first find()
+
+    @classmethod
+    @spotify_profile.profiled("colisten_build")
+    def build(cls, sp_df, by="track", window=1, session_gap_min=30):
+        """
+        Build the matrix in one sorted pass over `sp_df`.
+        `by` is "track" or "artist"; `window` is how many following plays
+        count as "played together" (1 = only the very next play).
+        """
+        if by == "artist":
+            df = sp_df.loc[sp_df[ARTIST_COL].notna()]
+        else:
+            df = sp_df.loc[sp_df[TRACK_COL].notna() & sp_df[ARTIST_COL].notna()]
+
+        times = df["datetime"].to_numpy(dtype="datetime64[ns]").view("i8")
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        codes, labels, names = _item_codes(df, by, order)
+
+        gap_ns  = int(session_gap_min * 60 * 1e9)
+        session = np.concatenate(([0], np.cumsum(np.diff(times) > gap_ns)))
+
+        n = len(labels)
+        pair_keys = []
+        for lag in range(1, window + 1):
+            a, b = codes[:-lag], codes[lag:]
+            keep = (session[:-lag] == session[lag:]) & (a != b)
+            pair_keys.append(a[keep].astype(np.int64) * n + b[keep])
+
+        keys, counts = np.unique(np.concatenate(pair_keys) if pair_keys else np.empty(0, np.int64),
+                                 return_counts=True)
+        return cls(labels, names, np.bincount(codes, minlength=n), keys // n, keys % n,
+                   counts, by, window, session_gap_min)
+
+    @property
+    def nnz(self):
+        """Number of distinct (X, Y) pairs stored."""
+        return len(self._counts)
+
+    def find(self, name):
+        """
+        Index of the item matching `name` (case-insensitive): an exact label
+        or track / artist name first, then a partial match of a single label.
+        Several items with that name (e.g. an album and a single version of a
+        track) resolve to the most played one. None if not found or ambiguous.
+        """
+        if self._index is None:
+            self._index = {}
+            for i, (label, item_name) in enumerate(zip(self.labels, self.names)):
+                for key in {str(label).lower(), str(item_name).lower()}:
+                    self._index.setdefault(key, []).append(i)
+
+        name = str(name).strip().lower()
+        matches = self._index.get(name)
+        if matches is None:
+            partial = {label for label in map(str.lower, map(str, self.labels)) if name in label}
+            if len(partial) != 1:
+                return None
+            matches = self._index[partial.pop()]
+        return max(matches, key=lambda i: self.plays[i])
+
+    def neighbours(self, item, num=10, direction="after"):
+        """
+        Top `num` items played together with `item` (name or index).
+        direction: "after" (played right after it), "before", or "both".
+        Returns a DataFrame with columns [by, "count"], most frequent first.
+        """
+        i = item if isinstance(item, (int, np.integer)) else self.find(item)
+        if i is None:
+            return pd.DataFrame(columns=[self.by, "count"])
+
+        parts_idx, parts_cnt = [], []
+        if direction in ("after", "both"):
+            lo, hi = self._row_ptr[i], self._row_ptr[i + 1]
+            parts_idx.append(self._cols[lo:hi])
+            parts_cnt.append(self._counts[lo:hi])
+        if direction in ("before", "both"):
+            sel = self._col_order[self._col_ptr[i]:self._col_ptr[i + 1]]
+            parts_idx.append(self._rows[sel])
+            parts_cnt.append(self._counts[sel])
+
+        idx = np.concatenate(parts_idx)
+        cnt = np.concatenate(parts_cnt)
+        if direction == "both" and len(idx):
+            idx, inverse = np.unique(idx, return_inverse=True)
+            cnt = np.bincount(inverse, weights=cnt).astype(np.int64)
+
+        if len(cnt) > num:
+            top = np.argpartition(-cnt, num - 1)[:num]
+            idx, cnt = idx[top], cnt[top]
+        order = np.lexsort((idx, -cnt))
+        return pd.DataFrame({self.by: self.labels[idx[order]], "count": cnt[order]})
+
+    def save(self, path):
+        """Write the matrix to a compressed .npz file."""
+        np.savez_compressed(path, labels=self.labels.astype(str), names=self.names.astype(str),
+                            plays=self.plays, rows=self._rows, cols=self._cols,
+                            counts=self._counts, by=self.by, window=self.window,
+                            session_gap_min=self.session_gap_min)
+
+    @classmethod
+    def load(cls, path):
+        """Read a matrix written by save()."""
+        with np.load(path) as f:
+            return cls(f["labels"].astype(object), f["names"].astype(object), f["plays"],
+                       f["rows"], f["cols"], f["counts"], str(f["by"]),
+                       int(f["window"]), float(f["session_gap_min"]))
+
+
+def load_or_build(sp_df, cache_dir, by="track", window=1, session_gap_min=30):
+    """
+    Load the matrix for this dataset from `cache_dir`, or build and save it.
+    The cache file name includes the dataset fingerprint and the build
+    settings, so a changed export or setting gets a fresh matrix.
+    Pass an empty `cache_dir` to always build in memory.
+    """
+    if not cache_dir:
+        return CoListenMatrix.build(sp_df, by, window, session_gap_min)
+
+    cache_dir = os.path.expanduser(cache_dir)
+    path = os.path.join(cache_dir, f"colisten2_{by}_w{window}_g{session_gap_min:g}_"
+                                   f"{spotify_scraper.fingerprint(sp_df)}.npz")
+    if os.path.exists(path):
+        return CoListenMatrix.load(path)
+
+    matrix = CoListenMatrix.build(sp_df, by, window, session_gap_min)
+    os.makedirs(cache_dir, exist_ok=True)
+    matrix.save(path)
+    return matrix
+
+
+def played_after(matrix, name, num=20):
+    """Print the items most often played right after `name` (and right before it)."""
+    i = matrix.find(name)
+    if i is None:
+        print(f"  No single {matrix.by} matches '{name}'.")
+        return
+
+    label = matrix.labels[i]
+    for direction, heading in (("after", "played right after"),
+                               ("before", "played right before")):
+        top = matrix.neighbours(i, num, direction)
+        print(f"\n  {matrix.by.capitalize()}s most often {heading} '{label}':")
+        if top.empty:
+            print("    (none)")
+            continue
+        print(f"  {'#':<4} {matrix.by.capitalize():<50} Times")
+        print("  " + "─" * 62)
+        for rank, (other, count) in enumerate(zip(top[matrix.by], top["count"]), 1):
+            print(f"  {rank:<4} {str(other)[:48]:<50} {count:,}")
+    print()
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _item_codes(df, by, order):
+    """
+    Integer item code per play (rows of `df` taken in `order`), plus the
+    per-item display labels and names. Artists are keyed by name; tracks by
+    spotify_track_uri, falling back to (track, artist) where there is none.
+    """
+    if by == "artist":
+        codes, names = pd.factorize(df[ARTIST_COL])
+        names = np.asarray(names, dtype=object)
+        return codes[order], names, names
+
+    codes = (pd.factorize(df[URI_COL])[0] if URI_COL in df.columns
+             else np.full(len(df), -1, dtype=np.int64))
+    missing = codes < 0
+    if missing.any():
+        pairs = df.loc[missing, [TRACK_COL, ARTIST_COL]].groupby([TRACK_COL, ARTIST_COL], sort=False).ngroup()
+        codes[missing] = codes.max(initial=-1) + 1 + pairs.to_numpy()
+        codes = pd.factorize(codes)[0]
+
+    # Factorize numbers items by first occurrence: a row starts a new item
+    # exactly where the running maximum code goes up.
+    running = np.maximum.accumulate(codes)
+    first = np.flatnonzero(np.diff(running, prepend=-1) > 0)
+
+    names = df[TRACK_COL].iloc[first].to_numpy(dtype=object)
+    artists = df[ARTIST_COL].iloc[first].to_numpy(dtype=object)
+    labels = np.array([f"{t} — {a}" for t, a in zip(names, artists)], dtype=object)
+    return codes[order], labels, names
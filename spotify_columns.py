@@ -0,0 +1,10 @@
+# spotify_columns.py
+#   Column names and unit conversions shared by the analysis modules, so
+#   every module reads the same definitions.
+
+ARTIST_COL  = "master_metadata_album_artist_name"
+TRACK_COL   = "master_metadata_track_name"
+MS_TO_HOURS = 2.77e-7   # multiply ms_played by this to get hours
+
+# Values accepted by the `type` parameter of the top-N analyses.
+MEASURES = ("Count", "ms_played")
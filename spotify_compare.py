@@ -0,0 +1,231 @@
+# spotify_compare.py
+#   Period-over-period comparison: "2024 vs 2023", "this summer vs last
+#   summer", or "account A vs account B".
+#
+#   Every row gets a period key (year, date range, account ...) and all
+#   periods are aggregated together in one grouped pass:
+#     tracks   plays per (track, artist) × period
+#     hourly   plays per period × hour of day
+#     totals   plays, ms and skips per period
+#   Any pair of periods is then compared from those tables without touching
+#   the events again, so comparing 2 or 20 periods costs about one scan.
+#
+#   A comparison returns, for top songs and top artists, the union of both
+#   periods' top N with plays, ranks, rank change (positive = climbed),
+#   play delta and a status: new / dropped / up / down / same.
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+import spotify_localtime
+import spotify_profile
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
+
+
+def year_periods(sp_df):
+    """Period key: the (local) year of each play."""
+    return spotify_localtime.wall_clock(sp_df).dt.year.rename("period")
+
+
+def range_periods(sp_df, ranges):
+    """
+    Period key from named date ranges, e.g.
+    {"summer 23": ("2023-06-01", "2023-08-31"), "summer 24": (...)}.
+    Both dates are inclusive; ranges must not overlap. Rows outside every
+    range get no period (NaN). Dates are matched against the local wall
+    clock, like year_periods, so "2023" and "2023-01-01:2023-12-31" select
+    the same plays. Assigned with one searchsorted over the times.
+    """
+    bounds = sorted((pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1), label)
+                    for label, (start, end) in ranges.items())
+    for (_, end, a), (start, _, b) in zip(bounds, bounds[1:]):
+        if start < end:
+            raise ValueError(f"Periods '{a}' and '{b}' overlap.")
+
+    starts = np.array([b[0].value for b in bounds], dtype=np.int64)
+    ends   = np.array([b[1].value for b in bounds], dtype=np.int64)
+    labels = np.array([b[2] for b in bounds] + [None], dtype=object)
+
+    wall = spotify_localtime.wall_clock(sp_df)
+    if wall.dt.tz is not None:
+        wall = wall.dt.tz_localize(None)     # naive local times
+    times = wall.to_numpy(dtype="datetime64[ns]").view("i8")
+    idx = np.searchsorted(starts, times, side="right") - 1
+    inside = (idx >= 0) & (times < ends[np.clip(idx, 0, None)]) & wall.notna().to_numpy()
+    return pd.Series(labels[np.where(inside, idx, -1)], index=sp_df.index, name="period")
+
+
+def parse_periods(sp_df, specs):
+    """
+    Period key and labels for user-typed periods: each spec is a year
+    ("2024") or an inclusive date range ("2024-06-01:2024-08-31").
+    All years → year_periods (labels are ints); otherwise range_periods.
+    """
+    specs = [str(s).strip() for s in specs]
+    if all(s.isdigit() for s in specs):
+        return year_periods(sp_df), [int(s) for s in specs]
+
+    ranges = {}
+    for spec in specs:
+        start, sep, end = spec.partition(":")
+        if not sep:
+            start, end = f"{spec}-01-01", f"{spec}-12-31"
+        ranges[spec] = (start, end)
+    return range_periods(sp_df, ranges), specs
+
+
+class PeriodComparison:
+    """
+    Per-period aggregates over one streaming history (or account shards).
+    Build once, then compare() any two periods.
+    """
+
+    def __init__(self, labels, tracks, hourly, totals):
+        self.labels  = labels
+        self._tracks = tracks     # DataFrame (track, artist) × period → plays
+        self._hourly = hourly     # DataFrame period × hour → plays
+        self._totals = totals     # DataFrame period → plays, hours, skips, skip_rate, unique_tracks
+
+    @classmethod
+    @spotify_profile.profiled("compare_build")
+    def build(cls, sp_df, periods, skip_threshold_ms=30_000):
+        """Aggregate every period of `periods` (a per-row key, NaN = excluded) in one pass."""
+        codes, labels = pd.factorize(periods, sort=True)
+        labels = list(labels)
+        n = len(labels)
+        valid = codes >= 0
+        p = codes[valid]
+
+        with spotify_profile.stage("tracks"):
+            tracks = (pd.DataFrame({"period": p,
+                                    "track":  sp_df[TRACK_COL].to_numpy()[valid],
+                                    "artist": sp_df[ARTIST_COL].to_numpy()[valid],
+                                    "plays":  sp_df["Count"].to_numpy()[valid]})
+                        .groupby(["track", "artist", "period"])["plays"].sum()
+                        .unstack("period", fill_value=0)
+                        .reindex(columns=range(n), fill_value=0))
+            tracks.columns = labels
+
+        with spotify_profile.stage("hourly"):
+            hour = spotify_localtime.wall_clock(sp_df).dt.hour.to_numpy()[valid].astype(np.int64)
+            plays = sp_df["Count"].to_numpy()[valid]
+            hourly = np.bincount(p * 24 + hour, weights=plays, minlength=n * 24).reshape(n, 24)
+
+        with spotify_profile.stage("totals"):
+            ms = sp_df["ms_played"].to_numpy()[valid]
+            skipped = (ms < skip_threshold_ms).astype(np.float64)
+            totals = pd.DataFrame({"plays": np.bincount(p, weights=plays, minlength=n),
+                                   "hours": np.bincount(p, weights=ms, minlength=n) * MS_TO_HOURS,
+                                   "skips": np.bincount(p, weights=skipped, minlength=n)},
+                                  index=labels)
+
+        return cls(labels, tracks, _hourly_frame(hourly, labels), _finish_totals(totals, tracks))
+
+    @classmethod
+    def from_shards(cls, shards):
+        """Compare accounts from spotify_accounts shards (no skip data: skip_rate is NaN)."""
+        labels = list(shards)
+        tracks = (pd.concat({a: s.tracks["plays"] for a, s in shards.items()}, axis=1)
+                    .fillna(0).astype(np.int64))
+        hourly = np.stack([s.hourly.sum(axis=0) for s in shards.values()])
+        totals = pd.DataFrame({"plays": [s.totals["plays"] for s in shards.values()],
+                               "hours": [s.totals["ms_played"] * MS_TO_HOURS for s in shards.values()],
+                               "skips": np.nan},
+                              index=labels)
+        return cls(labels, tracks, _hourly_frame(hourly, labels), _finish_totals(totals, tracks))
+
+    def summary(self):
+        """DataFrame, one row per period: plays, hours, skips, skip_rate, unique_tracks."""
+        return self._totals
+
+    @spotify_profile.profiled("compare")
+    def compare(self, base, other, num=20):
+        """
+        Compare period `other` against `base`. Returns dict:
+          "top_songs", "top_artists" — rank / play changes (see module header)
+          "hourly"    — share of plays per hour in each period, delta in points
+          "totals"    — summary() rows of both periods plus their difference
+        """
+        for label in (base, other):
+            if label not in self.labels:
+                raise KeyError(f"No period '{label}'. Available: {', '.join(map(str, self.labels))}")
+
+        artists = self._tracks.groupby(level="artist").sum()
+        share = self._hourly.loc[[base, other]].div(self._hourly.loc[[base, other]].sum(axis=1), axis=0).T
+        share.columns = [f"share_{base}", f"share_{other}"]
+        share["delta"] = share.iloc[:, 1] - share.iloc[:, 0]
+
+        totals = self._totals.loc[[base, other]].copy()
+        totals.loc["change"] = totals.loc[other] - totals.loc[base]
+
+        return {"top_songs":   _rank_changes(self._tracks, base, other, num),
+                "top_artists": _rank_changes(artists, base, other, num),
+                "hourly":      share,
+                "totals":      totals}
+
+
+@spotify_profile.profiled()
+def compare_periods(engine, base, other, num=10):
+    """Print a comparison of `other` vs `base` and chart the hourly profiles."""
+    result = engine.compare(base, other, num)
+
+    print(f"\n  ── {other} vs {base} " + "─" * 40)
+    print(result["totals"].round(3).to_string())
+    w = max(10, len(str(base)), len(str(other)))
+    for key, title in (("top_artists", "Top artists"), ("top_songs", "Top songs")):
+        table = result[key]
+        print(f"\n  {title} (top {num} of either period):")
+        print(f"  {'Name':<40} {str(base):>{w}} {str(other):>{w}} {'Δ plays':>9} {'Rank':>12}  Status")
+        print("  " + "─" * (75 + 2 * w))
+        names = table.index.get_level_values(-1 if key == "top_artists" else 0)
+        for name, row in zip(names, table.itertuples(index=False)):
+            ranks = f"{_rank_text(row[2])} → {_rank_text(row[3])}"
+            print(f"  {str(name)[:38]:<40} {row[0]:>{w},} {row[1]:>{w},} {row[4]:>+9,} {ranks:>12}  {row[6]}")
+
+    with spotify_profile.stage("render"):
+        hourly = result["hourly"]
+        fig, ax = plt.subplots(figsize=(12, 5))
+        ax.plot(hourly.index, hourly.iloc[:, 0] * 100, color="darkseagreen", marker="o", label=str(base))
+        ax.plot(hourly.index, hourly.iloc[:, 1] * 100, color="seagreen", marker="o", label=str(other))
+        ax.set(title=f"Hourly Listening Profile: {other} vs {base}",
+               xlabel="Hour of Day (0–23)", ylabel="% of Plays", xticks=range(24))
+        ax.legend()
+        plt.tight_layout()
+    plt.show()
+    return result
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _hourly_frame(hourly, labels):
+    return pd.DataFrame(hourly, index=labels, columns=pd.RangeIndex(24, name="hour"))
+
+
+def _finish_totals(totals, tracks):
+    totals["skip_rate"]     = totals["skips"] / totals["plays"].where(totals["plays"] > 0)
+    totals["unique_tracks"] = (tracks > 0).sum().to_numpy()
+    return totals.astype({"plays": np.int64})
+
+
+def _rank_changes(table, base, other, num):
+    """Union of both periods' top `num` rows of `table`, with ranks and changes."""
+    a, b = table[base], table[other]
+    rank_a = a.where(a > 0).rank(ascending=False, method="min")
+    rank_b = b.where(b > 0).rank(ascending=False, method="min")
+
+    keep = a[a > 0].nlargest(num).index.union(b[b > 0].nlargest(num).index)
+    change = (rank_a - rank_b)[keep]
+    out = pd.DataFrame({f"plays_{base}":  a[keep],
+                        f"plays_{other}": b[keep],
+                        f"rank_{base}":   rank_a[keep].astype("Int64"),
+                        f"rank_{other}":  rank_b[keep].astype("Int64"),
+                        "delta":          b[keep] - a[keep],
+                        "rank_change":    change.astype("Int64")})
+    out["status"] = np.select([out.iloc[:, 0] == 0, out.iloc[:, 1] == 0, change > 0, change < 0],
+                              ["new", "dropped", "up", "down"], "same")
+    return out.sort_values([f"rank_{other}", f"rank_{base}"], na_position="last")
+
+
+def _rank_text(rank):
+    return "—" if pd.isna(rank) else f"#{rank}"
@@ -0,0 +1,276 @@
+# spotify_daily.py
+#   Dense daily time series of the streaming history, built once and reused
+#   for rolling windows, listening streaks and calendar views.
+#
+#   Every play is mapped to an integer day ordinal (local days since
+#   1970-01-01) with one vectorized floor division — no Python date objects.
+#   The series then stores, for every day from the first play to the last:
+#     plays, ms_played, unique_tracks        dense arrays
+#     per-artist plays                       sparse (artist, day, plays)
+#                                            triples sorted by artist, day
+#   Rolling sums come from cumulative sums, streaks from run-length encoding
+#   of active days, so none of the analyses rescan the events.
+#
+#   The series can be cached next to other derived data (.npz), keyed by the
+#   dataset fingerprint.
+
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import spotify_localtime
+import spotify_profile
+import spotify_scraper
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
+
+WINDOWS = (7, 30, 365)
+
+_WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def day_ordinals(times):
+    """Local calendar day of each timestamp as int64 days since 1970-01-01 (NaT → int64 min)."""
+    local = times.dt.tz_localize(None) if times.dt.tz is not None else times
+    days = local.to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return np.where(local.isna().to_numpy(), np.iinfo(np.int64).min, days)
+
+
+class DailySeries:
+    """Daily listening series; see module header."""
+
+    def __init__(self, start, plays, ms_played, unique_tracks,
+                 artists, artist_codes, artist_days, artist_plays):
+        self.start         = int(start)       # day ordinal of index 0
+        self.plays         = plays
+        self.ms_played     = ms_played
+        self.unique_tracks = unique_tracks
+        self.artists       = np.asarray(artists, dtype=str)
+        self._a_codes      = artist_codes      # sorted by (artist, day)
+        self._a_days       = artist_days       # index into the dense arrays
+        self._a_plays      = artist_plays
+        self._a_ptr        = np.concatenate(([0], np.cumsum(np.bincount(artist_codes,
+                                                                       minlength=len(self.artists)))))
+        self._a_index      = {a.lower(): i for i, a in enumerate(self.artists)}
+
+    @classmethod
+    @spotify_profile.profiled("daily_build")
+    def build(cls, sp_df):
+        """Build the series in one pass over `sp_df`."""
+        days = day_ordinals(spotify_localtime.wall_clock(sp_df))
+        valid = days != np.iinfo(np.int64).min
+        days = days[valid]
+        start = days.min() if len(days) else 0
+        n = int(days.max() - start + 1) if len(days) else 0
+        d = days - start
+
+        counts = sp_df["Count"].to_numpy()[valid]
+        plays = np.bincount(d, weights=counts, minlength=n).astype(np.int64)
+        ms = np.bincount(d, weights=sp_df["ms_played"].to_numpy()[valid], minlength=n).astype(np.int64)
+
+        with spotify_profile.stage("unique_tracks"):
+            t_codes, tracks = pd.factorize(sp_df[TRACK_COL].to_numpy()[valid])
+            has = t_codes >= 0
+            width = max(len(tracks), 1)
+            pairs = np.unique(d[has] * width + t_codes[has])
+            unique_tracks = np.bincount(pairs // width, minlength=n).astype(np.int64)
+
+        with spotify_profile.stage("artists"):
+            a_codes, artists = pd.factorize(sp_df[ARTIST_COL].to_numpy()[valid], sort=True)
+            has = a_codes >= 0
+            keys, a_plays = np.unique(a_codes[has].astype(np.int64) * max(n, 1) + d[has],
+                                      return_counts=True)
+            a_codes_sorted, a_days = np.divmod(keys, max(n, 1))
+
+        return cls(start, plays, ms, unique_tracks, artists,
+                   a_codes_sorted.astype(np.int64), a_days.astype(np.int64), a_plays.astype(np.int64))
+
+    @property
+    def dates(self):
+        """DatetimeIndex of every day in the series."""
+        return pd.to_datetime(np.arange(self.start, self.start + len(self.plays)).astype("datetime64[D]"))
+
+    def frame(self):
+        """DataFrame indexed by date: plays, hours, unique_tracks."""
+        return pd.DataFrame({"plays":         self.plays,
+                             "hours":         self.ms_played * MS_TO_HOURS,
+                             "unique_tracks": self.unique_tracks},
+                            index=self.dates.rename("date"))
+
+    def rolling(self, windows=WINDOWS):
+        """DataFrame indexed by date: plays and hours summed over each trailing window (days)."""
+        out = {}
+        for w in windows:
+            out[f"plays_{w}d"] = _trailing_sum(self.plays, w)
+            out[f"hours_{w}d"] = _trailing_sum(self.ms_played, w) * MS_TO_HOURS
+        return pd.DataFrame(out, index=self.dates.rename("date"))
+
+    def streaks(self, num=10, min_plays=1):
+        """Longest runs of consecutive days with at least `min_plays` plays."""
+        active_days = np.flatnonzero(self.plays >= min_plays)
+        return self._runs(active_days, np.zeros(len(active_days), dtype=np.int64), num, None)
+
+    def artist_streaks(self, num=20):
+        """
+        Each artist's longest run of consecutive days played; top `num`
+        artists by that run. Computed for all artists at once.
+        """
+        return self._runs(self._a_days, self._a_codes, num, self.artists)
+
+    def artist_daily(self, name):
+        """Dense Series of one artist's daily plays (name match is case-insensitive), or None."""
+        i = self._a_index.get(str(name).strip().lower())
+        if i is None:
+            return None
+        lo, hi = self._a_ptr[i], self._a_ptr[i + 1]
+        plays = np.zeros(len(self.plays), dtype=np.int64)
+        plays[self._a_days[lo:hi]] = self._a_plays[lo:hi]
+        return pd.Series(plays, index=self.dates.rename("date"), name=self.artists[i])
+
+    def years(self):
+        return sorted(set(self.dates.year)) if len(self.plays) else []
+
+    def calendar(self, year):
+        """DataFrame weekday (rows, Mon first) × week of year (columns): plays per day; NaN outside the year."""
+        first = pd.Timestamp(year=year, month=1, day=1)
+        days = pd.date_range(first, pd.Timestamp(year=year, month=12, day=31), freq="D")
+        ordinals = days.to_numpy(dtype="datetime64[D]").astype(np.int64) - self.start
+        inside = (ordinals >= 0) & (ordinals < len(self.plays))
+        plays = np.zeros(len(days))
+        plays[inside] = self.plays[ordinals[inside]]
+
+        week = (days.dayofyear.to_numpy() - 1 + first.dayofweek) // 7
+        grid = np.full((7, week.max() + 1), np.nan)
+        grid[days.dayofweek.to_numpy(), week] = plays
+        return pd.DataFrame(grid, index=_WEEKDAYS)
+
+    def save(self, path):
+        """Write the series to a compressed .npz file."""
+        np.savez_compressed(path, start=self.start, plays=self.plays, ms_played=self.ms_played,
+                            unique_tracks=self.unique_tracks, artists=self.artists,
+                            artist_codes=self._a_codes, artist_days=self._a_days,
+                            artist_plays=self._a_plays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a series written by save()."""
+        with np.load(path) as f:
+            return cls(int(f["start"]), f["plays"], f["ms_played"], f["unique_tracks"], f["artists"],
+                       f["artist_codes"], f["artist_days"], f["artist_plays"])
+
+    def _runs(self, days, groups, num, labels):
+        """
+        Run-length encode consecutive `days` within each group (both sorted by
+        group, then day) and return each group's longest run, top `num` first.
+        """
+        columns = (["artist"] if labels is not None else []) + ["start", "end", "days"]
+        if len(days) == 0:
+            return pd.DataFrame(columns=columns)
+
+        new_run = np.r_[True, (groups[1:] != groups[:-1]) | (days[1:] != days[:-1] + 1)]
+        run_id = np.cumsum(new_run) - 1
+        run_start = days[new_run]
+        run_group = groups[new_run]
+        run_len = np.bincount(run_id)
+
+        if labels is None:
+            best = np.argsort(-run_len, kind="stable")[:num]
+        else:
+            # longest run per group (earliest on ties), then top groups
+            order = np.lexsort((run_start, -run_len, run_group))
+            first = order[np.r_[True, run_group[order][1:] != run_group[order][:-1]]]
+            best = first[np.argsort(-run_len[first], kind="stable")[:num]]
+
+        start = pd.to_datetime((run_start[best] + self.start).astype("datetime64[D]"))
+        result = pd.DataFrame({"start": start,
+                               "end":   start + pd.to_timedelta(run_len[best] - 1, unit="D"),
+                               "days":  run_len[best]})
+        if labels is not None:
+            result.insert(0, "artist", labels[run_group[best]])
+        return result
+
+
+def load_or_build(sp_df, cache_dir):
+    """
+    Load the daily series for this dataset from `cache_dir`, or build and save it.
+    Pass an empty `cache_dir` to always build in memory.
+    """
+    if not cache_dir:
+        return DailySeries.build(sp_df)
+
+    cache_dir = os.path.expanduser(cache_dir)
+    tz = spotify_localtime.cache_tag(sp_df)
+    path = os.path.join(cache_dir, f"daily_{tz}_{spotify_scraper.fingerprint(sp_df)}.npz")
+    if os.path.exists(path):
+        return DailySeries.load(path)
+
+    series = DailySeries.build(sp_df)
+    os.makedirs(cache_dir, exist_ok=True)
+    series.save(path)
+    return series
+
+
+@spotify_profile.profiled()
+def rolling_chart(series, windows=WINDOWS):
+    """Line chart of hours listened per trailing 7 / 30 / 365-day window (as daily averages)."""
+    rolling = series.rolling(windows)
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(15, 6))
+        colors = ["darkseagreen", "mediumseagreen", "darkgreen"]
+        for w, color in zip(windows, colors * len(windows)):
+            ax.plot(rolling.index, rolling[f"hours_{w}d"] / w, color=color,
+                    linewidth=1 if w < 30 else 2, label=f"{w}-day average")
+        ax.set(title="Hours Listened per Day (Rolling Averages)", xlabel="Date", ylabel="Hours per Day")
+        ax.legend()
+        plt.tight_layout()
+    plt.show()
+    return rolling
+
+
+@spotify_profile.profiled()
+def streaks_report(series, num=10):
+    """Print the longest overall listening streaks and each top artist's longest streak."""
+    streaks = series.streaks(num)
+    print(f"\n  Longest listening streaks (consecutive days with at least one play):")
+    print(f"  {'#':<4} {'Days':>6}  From        To")
+    print("  " + "─" * 36)
+    for i, row in enumerate(streaks.itertuples(index=False), 1):
+        print(f"  {i:<4} {row.days:>6,}  {row.start:%Y-%m-%d}  {row.end:%Y-%m-%d}")
+
+    artists = series.artist_streaks(num)
+    print(f"\n  Longest daily streak per artist:")
+    print(f"  {'#':<4} {'Artist':<40} {'Days':>6}  From        To")
+    print("  " + "─" * 78)
+    for i, row in enumerate(artists.itertuples(index=False), 1):
+        print(f"  {i:<4} {str(row.artist)[:38]:<40} {row.days:>6,}  {row.start:%Y-%m-%d}  {row.end:%Y-%m-%d}")
+    print()
+    return streaks, artists
+
+
+@spotify_profile.profiled()
+def calendar_chart(series, year):
+    """GitHub-style calendar heatmap of plays per day for one year."""
+    grid = series.calendar(year)
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(18, 3.5))
+        sns.heatmap(grid, cmap="Greens", ax=ax, linewidths=0.5, linecolor="white", square=True,
+                    cbar_kws={"label": "Songs Played", "shrink": 0.6}, xticklabels=False)
+        month_starts = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="MS")
+        first_dow = pd.Timestamp(year=year, month=1, day=1).dayofweek
+        ax.set_xticks([(d.dayofyear - 1 + first_dow) // 7 + 0.5 for d in month_starts])
+        ax.set_xticklabels([d.strftime("%b") for d in month_starts])
+        ax.set(title=f"Listening Calendar {year}", xlabel="", ylabel="")
+        plt.tight_layout()
+    plt.show()
+    return grid
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _trailing_sum(values, window):
+    """Sum over the trailing `window` days ending on each day (shorter at the start)."""
+    csum = np.concatenate(([0], np.cumsum(values, dtype=np.float64)))
+    idx = np.arange(1, len(values) + 1)
+    return csum[idx] - csum[np.maximum(idx - window, 0)]
@@ -10,98 +10,111 @@
 #     ]
 #   }
 
-import json
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
 
+import spotify_profile
+import spotify_scraper
+import spotify_table
+from spotify_columns import TRACK_COL
 
-def load_library(file_path):
+
+@spotify_profile.profiled()
+def load_library(file_path, member_name="YourLibrary.json", log=print):
     """
     Load YourLibrary.json from a Spotify account data export.
+    `file_path` may also be the export's zip archive; `member_name` is then
+    read straight from the zip.
+    The "Loaded" message goes through `log`.
     Returns a DataFrame of liked tracks.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Library file not found: {file_path}")
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = spotify_scraper.read_export_json(file_path, member_name)
     tracks = data.get("tracks", [])
-    df = pd.DataFrame(tracks, columns=["artist", "album", "track", "uri"])
-    print(f"Loaded {len(df):,} liked tracks.")
+    with spotify_profile.stage("frame"):
+        df = pd.DataFrame(tracks, columns=["artist", "album", "track", "uri"])
+    log(f"Loaded {len(df):,} liked tracks.")
     return df
 
 
+@spotify_profile.profiled()
+def library_stats_data(library_df, num=10):
+    """Dict of library totals plus the `num` artists with most liked songs (Series)."""
+    return {"total":       len(library_df),
+            "artists":     int(library_df["artist"].nunique()),
+            "albums":      int(library_df["album"].nunique()),
+            "top_artists": (library_df.groupby("artist")["track"]
+                                      .count()
+                                      .sort_values(ascending=False)
+                                      .head(num))}
+
+
+@spotify_profile.profiled()
 def library_stats(library_df):
     """Print summary stats for the liked songs library."""
-    total    = len(library_df)
-    artists  = library_df["artist"].nunique()
-    albums   = library_df["album"].nunique()
+    stats    = library_stats_data(library_df)
+    total    = stats["total"]
+    artists  = stats["artists"]
+    albums   = stats["albums"]
 
     print(f"\n  ── Your Library Stats ──────────────────────────")
     print(f"  Total liked songs  : {total:,}")
     print(f"  Unique artists     : {artists:,}")
     print(f"  Unique albums      : {albums:,}")
 
-    top_artists = (library_df.groupby("artist")["track"]
-                              .count()
-                              .sort_values(ascending=False)
-                              .head(10))
+    top_artists = stats["top_artists"]
     print(f"\n  Top 10 artists by liked song count:")
     for artist, count in top_artists.items():
         bar = "█" * count
         print(f"    {artist:<35} {count:>3}  {bar}")
 
     # Quick bar chart
-    fig, ax = plt.subplots(figsize=(12, 5))
-    ax.barh(top_artists.index[::-1], top_artists.values[::-1],
-            color="mediumseagreen")
-    ax.set(title="Artists with Most Liked Songs",
-           xlabel="Liked Song Count", ylabel="")
-    plt.tight_layout()
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(12, 5))
+        ax.barh(top_artists.index[::-1], top_artists.values[::-1],
+                color="mediumseagreen")
+        ax.set(title="Artists with Most Liked Songs",
+               xlabel="Liked Song Count", ylabel="")
+        plt.tight_layout()
     plt.show()
 
 
-def browse_library(library_df, artist_filter=None):
+@spotify_profile.profiled()
+def browse_library(library_df, artist_filter=None, paged=True):
     """
-    Print liked tracks in a table.
+    Show liked tracks a page at a time (sortable / filterable).
     If `artist_filter` is provided, show only tracks by that artist
-    (case-insensitive, partial match).
+    (case-insensitive, partial match). With paged=False every row is
+    printed at once.
     """
-    df = library_df.copy()
-
+    df = library_df
     if artist_filter:
-        df = df[df["artist"].str.contains(artist_filter, case=False, na=False)]
+        df = df[df["artist"].str.contains(artist_filter, case=False, na=False, regex=False)]
         if df.empty:
             print(f"\n  No liked songs found matching artist '{artist_filter}'.")
             return
         print(f"\n  Liked songs matching '{artist_filter}'  ({len(df)} tracks)")
     else:
         print(f"\n  All liked songs  ({len(df):,} tracks)")
-
-    print(f"\n  {'#':<5} {'Track':<45} {'Artist':<30} Album")
-    print("  " + "─" * 95)
-
-    for i, (_, row) in enumerate(df.iterrows(), 1):
-        t_name = str(row["track"])[:43]
-        artist = str(row["artist"])[:28]
-        album  = str(row["album"])[:25]
-        print(f"  {i:<5} {t_name:<45} {artist:<30} {album}")
-
     print()
 
+    columns = [("track", "Track", 45), ("artist", "Artist", 30), ("album", "Album", 27)]
+    if paged:
+        spotify_table.browse(spotify_table.TableView(df, columns))
+    else:
+        spotify_table.print_table(df, columns)
+        print()
 
-def liked_vs_streamed(library_df, streaming_df, num=20):
-    """
-    Cross-reference liked songs against streaming history.
-    Shows which of your liked songs you actually stream the most,
-    and highlights liked songs you've never streamed.
 
+@spotify_profile.profiled()
+def liked_vs_streamed_data(library_df, streaming_df):
+    """
+    Liked songs with a `play_count` column from streaming history.
     Matching is done on track name (case-insensitive) since URIs differ
     between the two export types.
     """
-    TRACK_COL  = "master_metadata_track_name"
-    ARTIST_COL = "master_metadata_album_artist_name"
-
     # Build a play-count lookup from streaming history
     play_counts = (streaming_df.groupby(TRACK_COL)["Count"]
                                .sum()
@@ -115,6 +128,17 @@ def liked_vs_streamed(library_df, streaming_df, num=20):
 
     merged = liked.merge(play_counts, on="track_lower", how="left")
     merged["play_count"] = merged["play_count"].fillna(0).astype(int)
+    return merged
+
+
+@spotify_profile.profiled()
+def liked_vs_streamed(library_df, streaming_df, num=20):
+    """
+    Cross-reference liked songs against streaming history.
+    Shows which of your liked songs you actually stream the most,
+    and highlights liked songs you've never streamed.
+    """
+    merged = liked_vs_streamed_data(library_df, streaming_df)
 
     # Stats
     streamed     = (merged["play_count"] > 0).sum()
@@ -128,31 +152,29 @@ def liked_vs_streamed(library_df, streaming_df, num=20):
     # Most-streamed liked songs
     top = merged.sort_values("play_count", ascending=False).head(num)
     print(f"\n  Your most-streamed liked songs (top {num}):")
-    print(f"  {'#':<4} {'Track':<45} {'Artist':<28} Plays")
-    print("  " + "─" * 85)
-    for i, (_, row) in enumerate(top.iterrows(), 1):
-        t_name = str(row["track"])[:43]
-        artist = str(row["artist"])[:26]
-        print(f"  {i:<4} {t_name:<45} {artist:<28} {row['play_count']:,}")
+    spotify_table.print_table(top, [("track", "Track", 45), ("artist", "Artist", 28),
+                                    ("play_count", "Plays", 7)])
 
     # Chart: top liked songs by stream count
     top_chart = merged.sort_values("play_count", ascending=False).head(num)
-    fig, ax = plt.subplots(figsize=(13, 6))
-    ax.bar(top_chart["track"].str[:30], top_chart["play_count"],
-           color="mediumseagreen")
-    ax.set(title=f"Your Most-Streamed Liked Songs (Top {num})",
-           xlabel="Track", ylabel="Times Played")
-    ax.tick_params(axis="x", labelrotation=75)
-    plt.subplots_adjust(bottom=0.5)
-    plt.tight_layout()
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(13, 6))
+        ax.bar(top_chart["track"].str[:30], top_chart["play_count"],
+               color="mediumseagreen")
+        ax.set(title=f"Your Most-Streamed Liked Songs (Top {num})",
+               xlabel="Track", ylabel="Times Played")
+        ax.tick_params(axis="x", labelrotation=75)
+        plt.subplots_adjust(bottom=0.5)
+        plt.tight_layout()
     plt.show()
 
     # Pie: streamed vs never played
-    fig2, ax2 = plt.subplots(figsize=(7, 6))
-    ax2.pie([streamed, never_played],
-            labels=["Streamed at least once", "Never streamed"],
-            autopct="%1.1f%%",
-            colors=["mediumseagreen", "lightcoral"],
-            explode=[0.05, 0.05], startangle=90, shadow=True)
-    ax2.set_title("Liked Songs: Streamed vs. Never Played")
+    with spotify_profile.stage("render"):
+        fig2, ax2 = plt.subplots(figsize=(7, 6))
+        ax2.pie([streamed, never_played],
+                labels=["Streamed at least once", "Never streamed"],
+                autopct="%1.1f%%",
+                colors=["mediumseagreen", "lightcoral"],
+                explode=[0.05, 0.05], startangle=90, shadow=True)
+        ax2.set_title("Liked Songs: Streamed vs. Never Played")
     plt.show()
@@ -0,0 +1,254 @@
+# spotify_lifecycle.py
+#   Per-track lifecycle index: when each track was first and last played,
+#   its peak month, and how it was dropped and picked up again.
+#
+#   The index is built in one sorted pass: events are ordered by
+#   (track, time) once, and every per-track value is read off group
+#   boundaries and np.bincount / np.maximum.reduceat — no per-track filter
+#   of the event frame. Queries ("forgotten favourites", "discoveries per
+#   month", "all-time vs recent top") then run on one row per track.
+#
+#   Index columns (one row per track + artist):
+#     plays, ms_played        all-time totals
+#     plays_recent            plays in the last `recent_days` of the history
+#     first, last             first / last play
+#     peak_month, peak_plays  month with the most plays (earliest on ties)
+#     active_months           months with at least one play
+#     longest_gap_days        longest stretch between two consecutive plays
+#     rediscoveries           gaps of at least `gap_days` (dropped, then back)
+#
+#   The index can be cached next to other derived data (.npz), keyed by the
+#   dataset fingerprint.
+
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+import spotify_profile
+import spotify_scraper
+from spotify_columns import ARTIST_COL, TRACK_COL
+
+_NS_PER_DAY = 86_400 * 1_000_000_000
+
+_INT_COLUMNS = ["plays", "ms_played", "plays_recent", "peak_plays", "active_months", "rediscoveries"]
+_TIME_COLUMNS = ["first", "last", "peak_month"]
+
+
+class LifecycleIndex:
+    """One row per track with its listening lifecycle; see module header for columns."""
+
+    def __init__(self, table, end, gap_days, recent_days):
+        self.table       = table
+        self.end         = end          # last play in the history
+        self.gap_days    = gap_days
+        self.recent_days = recent_days
+
+    @classmethod
+    @spotify_profile.profiled("lifecycle_build")
+    def build(cls, sp_df, gap_days=365, recent_days=365):
+        """Build the index in one sorted pass over `sp_df`."""
+        df = sp_df.loc[sp_df[TRACK_COL].notna() & sp_df[ARTIST_COL].notna() & sp_df["datetime"].notna()]
+        tz = df["datetime"].dt.tz
+
+        with spotify_profile.stage("sort"):
+            codes, uniques = pd.MultiIndex.from_arrays([df[TRACK_COL], df[ARTIST_COL]]).factorize()
+            times = df["datetime"].to_numpy(dtype="datetime64[ns]").view("i8")
+            order = np.lexsort((times, codes))
+            codes, times = codes[order], times[order]
+            plays = df["Count"].to_numpy()[order]
+            ms    = df["ms_played"].to_numpy()[order]
+
+        n = len(uniques)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, np.int64)
+        ends   = np.r_[starts[1:], len(codes)] - 1
+        end    = times.max() if len(times) else 0
+
+        with spotify_profile.stage("gaps"):
+            gaps = np.diff(times, prepend=times[:1])
+            gaps[starts] = 0                                   # no gap across tracks
+            longest = np.maximum.reduceat(gaps, starts) if n else np.empty(0, np.int64)
+            rediscoveries = np.bincount(codes, weights=gaps >= gap_days * _NS_PER_DAY, minlength=n)
+
+        with spotify_profile.stage("peak_month"):
+            local = pd.DatetimeIndex(times.view("datetime64[ns]")).tz_localize("UTC").tz_convert(tz)
+            month = (local.year.to_numpy() * 12 + local.month.to_numpy() - 1).astype(np.int64)
+            month_min = month.min() if len(month) else 0
+            span = (month.max() - month_min + 1) if len(month) else 1
+            cells, counts = np.unique(codes.astype(np.int64) * span + (month - month_min), return_counts=True)
+            cell_code, cell_month = cells // span, cells % span + month_min
+            best = np.lexsort((cell_month, -counts, cell_code))   # per track: most plays, then earliest
+            first_cell = best[np.r_[True, cell_code[best][1:] != cell_code[best][:-1]]]
+            active = np.bincount(cell_code, minlength=n)
+
+        recent = times >= end - recent_days * _NS_PER_DAY
+        table = pd.DataFrame({
+            "track":            uniques.get_level_values(0),
+            "artist":           uniques.get_level_values(1),
+            "plays":            np.bincount(codes, weights=plays, minlength=n).astype(np.int64),
+            "ms_played":        np.bincount(codes, weights=ms, minlength=n).astype(np.int64),
+            "plays_recent":     np.bincount(codes, weights=plays * recent, minlength=n).astype(np.int64),
+            "first":            _to_times(times[starts], tz),
+            "last":             _to_times(times[ends], tz),
+            "peak_month":       _month_start(cell_month[first_cell], tz),
+            "peak_plays":       counts[first_cell].astype(np.int64),
+            "active_months":    active.astype(np.int64),
+            "longest_gap_days": longest / _NS_PER_DAY,
+            "rediscoveries":    rediscoveries.astype(np.int64),
+        })
+        return cls(table, _to_times(np.array([end]), tz)[0], gap_days, recent_days)
+
+    def forgotten_favourites(self, num=20, idle_days=365, min_plays=None):
+        """
+        Heavily played tracks not played for at least `idle_days` before the end
+        of the history. `min_plays` defaults to the top 5% of tracks by plays.
+        """
+        t = self.table
+        if min_plays is None:
+            min_plays = t["plays"].quantile(0.95) if len(t) else 0
+        idle = (self.end - t["last"]).dt.days
+        keep = (t["plays"] >= min_plays) & (idle >= idle_days)
+        found = t[keep].assign(idle_days=idle[keep])
+        return found.sort_values(["plays", "last"], ascending=[False, False]).head(num)
+
+    def rediscovered(self, num=20):
+        """Tracks that came back after at least one gap of `gap_days`; most rediscoveries first, then most plays."""
+        t = self.table
+        return (t[t["rediscoveries"] > 0]
+                  .sort_values(["rediscoveries", "plays"], ascending=False)
+                  .head(num))
+
+    def discoveries_per_month(self):
+        """Series: number of tracks first played in each month."""
+        months = self.table["first"].dt.tz_localize(None).dt.to_period("M")
+        counts = months.value_counts().sort_index()
+        return counts.reindex(pd.period_range(counts.index.min(), counts.index.max(), freq="M"),
+                              fill_value=0) if len(counts) else counts
+
+    def all_time_vs_recent(self, num=20):
+        """
+        Top `num` tracks all-time and in the last `recent_days`, side by side,
+        each with its rank in the other list (NaN = not played in that window).
+        """
+        t = self.table
+        rank_all = t["plays"].rank(ascending=False, method="min")
+        rank_recent = t["plays_recent"].where(t["plays_recent"] > 0).rank(ascending=False, method="min")
+        top_all = t.assign(recent_rank=rank_recent).nlargest(num, "plays")
+        top_recent = (t[t["plays_recent"] > 0].assign(all_time_rank=rank_all)
+                       .nlargest(num, "plays_recent"))
+        return (top_all[["track", "artist", "plays", "recent_rank"]].reset_index(drop=True),
+                top_recent[["track", "artist", "plays_recent", "all_time_rank"]].reset_index(drop=True))
+
+    def save(self, path):
+        """Write the index to a compressed .npz file."""
+        t = self.table
+        arrays = {c: t[c].to_numpy(np.int64) for c in _INT_COLUMNS}
+        arrays.update({c: t[c].dt.tz_convert("UTC").to_numpy(dtype="datetime64[ns]").view("i8")
+                       for c in _TIME_COLUMNS})
+        np.savez_compressed(path, track=t["track"].to_numpy(dtype=str),
+                            artist=t["artist"].to_numpy(dtype=str),
+                            longest_gap_days=t["longest_gap_days"].to_numpy(np.float64),
+                            end=self.end.value, tz=str(self.end.tz),
+                            gap_days=self.gap_days, recent_days=self.recent_days, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save()."""
+        with np.load(path) as f:
+            tz = str(f["tz"])
+            table = pd.DataFrame({"track": f["track"].astype(object), "artist": f["artist"].astype(object)})
+            for c in _INT_COLUMNS:
+                table[c] = f[c]
+            for c in _TIME_COLUMNS:
+                table[c] = _to_times(f[c], tz)
+            table["longest_gap_days"] = f["longest_gap_days"]
+            table = table[["track", "artist", "plays", "ms_played", "plays_recent", "first", "last",
+                           "peak_month", "peak_plays", "active_months", "longest_gap_days",
+                           "rediscoveries"]]
+            return cls(table, pd.Timestamp(int(f["end"]), tz="UTC").tz_convert(tz),
+                       int(f["gap_days"]), int(f["recent_days"]))
+
+
+def load_or_build(sp_df, cache_dir, gap_days=365, recent_days=365):
+    """
+    Load the index for this dataset from `cache_dir`, or build and save it.
+    Pass an empty `cache_dir` to always build in memory.
+    """
+    if not cache_dir:
+        return LifecycleIndex.build(sp_df, gap_days, recent_days)
+
+    cache_dir = os.path.expanduser(cache_dir)
+    tz = str(sp_df["datetime"].dt.tz).replace("/", "-")
+    path = os.path.join(cache_dir, f"lifecycle_g{gap_days}_r{recent_days}_{tz}_"
+                                   f"{spotify_scraper.fingerprint(sp_df)}.npz")
+    if os.path.exists(path):
+        return LifecycleIndex.load(path)
+
+    index = LifecycleIndex.build(sp_df, gap_days, recent_days)
+    os.makedirs(cache_dir, exist_ok=True)
+    index.save(path)
+    return index
+
+
+@spotify_profile.profiled()
+def lifecycle_report(index, num=15):
+    """Print forgotten favourites, rediscoveries and all-time vs recent top; chart discoveries per month."""
+    print(f"\n  {len(index.table):,} tracks indexed; history ends {index.end:%Y-%m-%d}.")
+
+    forgotten = index.forgotten_favourites(num)
+    print(f"\n  Forgotten favourites (not played for a year or more):")
+    print(f"  {'#':<4} {'Track':<40} {'Artist':<26} {'Plays':>6}  Last played")
+    print("  " + "─" * 92)
+    for i, row in enumerate(forgotten.itertuples(index=False), 1):
+        print(f"  {i:<4} {str(row.track)[:38]:<40} {str(row.artist)[:24]:<26} "
+              f"{row.plays:>6,}  {row.last:%Y-%m-%d}  ({row.idle_days:,} days ago)")
+    if forgotten.empty:
+        print("    (none)")
+
+    back = index.rediscovered(num)
+    print(f"\n  Rediscovered (came back after {index.gap_days}+ days away):")
+    print(f"  {'#':<4} {'Track':<40} {'Artist':<26} {'Plays':>6} {'Times':>6}  Longest gap")
+    print("  " + "─" * 92)
+    for i, row in enumerate(back.itertuples(index=False), 1):
+        print(f"  {i:<4} {str(row.track)[:38]:<40} {str(row.artist)[:24]:<26} "
+              f"{row.plays:>6,} {row.rediscoveries:>6,}  {row.longest_gap_days:,.0f} days")
+    if back.empty:
+        print("    (none)")
+
+    top_all, top_recent = index.all_time_vs_recent(num)
+    print(f"\n  {'#':<4} {'All-time top':<40} {'Recent rank':>11}   {'Last ' + str(index.recent_days) + ' days top':<40} "
+          f"{'All-time rank':>13}")
+    print("  " + "─" * 118)
+    for i in range(max(len(top_all), len(top_recent))):
+        left  = top_all.iloc[i] if i < len(top_all) else None
+        right = top_recent.iloc[i] if i < len(top_recent) else None
+        l_name = str(left["track"])[:38] if left is not None else ""
+        l_rank = _rank_text(left["recent_rank"]) if left is not None else ""
+        r_name = str(right["track"])[:38] if right is not None else ""
+        r_rank = _rank_text(right["all_time_rank"]) if right is not None else ""
+        print(f"  {i + 1:<4} {l_name:<40} {l_rank:>11}   {r_name:<40} {r_rank:>13}")
+
+    monthly = index.discoveries_per_month()
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(15, 5))
+        ax.bar(monthly.index.to_timestamp(), monthly.to_numpy(), width=25, color="mediumseagreen")
+        ax.set(title="New Tracks Discovered per Month", xlabel="Month", ylabel="Tracks First Played")
+        plt.tight_layout()
+    plt.show()
+    return index
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _to_times(ns, tz):
+    return pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view("datetime64[ns]")).tz_localize("UTC").tz_convert(tz)
+
+
+def _month_start(month_ordinal, tz):
+    years, months = np.divmod(month_ordinal, 12)
+    return pd.to_datetime(pd.DataFrame({"year": years, "month": months + 1, "day": 1})).dt.tz_localize(tz)
+
+
+def _rank_text(rank):
+    return "—" if pd.isna(rank) else f"#{int(rank)}"
@@ -0,0 +1,250 @@
+# spotify_localtime.py
+#   Travel-aware local time: each event's wall-clock time in the zone where
+#   it was played, instead of one fixed TIMEZONE for the whole history.
+#
+#   Policies (LocalTimePolicy):
+#     fixed      every event in one zone (same as a single tz_convert)
+#     country    the zone of the event's conn_country (ISO code → zone from
+#                the system zone.tab, with sensible defaults for countries
+#                spanning several zones; overridable per country)
+#     schedule   user-supplied date ranges → zone, e.g. a trip
+#                [("2024-06-01", "2024-06-14", "Asia/Tokyo")]; other dates
+#                use the fallback zone
+#
+#   The conversion is vectorized. For every zone in use, an offset-transition
+#   table (instant → UTC offset) covering the history's time range is computed
+#   once. The union of all zones' transition instants cuts time into segments
+#   with constant offsets, giving a small (zone × segment) offset grid. Each
+#   event finds its segment through a dense hour → segment index and reads
+#   grid[zone, segment]: two array gathers per event, whatever the number of
+#   zones.
+#
+#   localize() returns the wall-clock times as a tz-naive `local_time`
+#   column. `datetime` keeps the true instant; analyses that need hour,
+#   weekday, day, month or year read wall_clock(), which prefers local_time.
+
+import os
+import zoneinfo
+
+import numpy as np
+import pandas as pd
+
+import spotify_profile
+
+POLICIES = ("fixed", "country", "schedule")
+
+LOCAL_COL   = "local_time"
+COUNTRY_COL = "conn_country"
+
+# Countries whose first zone.tab entry is not the zone most people live in.
+_COUNTRY_DEFAULTS = {
+    "AU": "Australia/Sydney",
+    "BR": "America/Sao_Paulo",
+    "CA": "America/Toronto",
+    "GL": "America/Nuuk",
+    "RU": "Europe/Moscow",
+    "UA": "Europe/Kyiv",
+}
+
+_NS      = 1_000_000_000
+_HOUR_NS = 3600 * _NS
+
+
+class LocalTimePolicy:
+    """How each event's local time zone is chosen (see module header)."""
+
+    def __init__(self, mode="fixed", zone="UTC", countries=None, schedule=None):
+        if mode not in POLICIES:
+            raise ValueError(f"Unknown local time policy '{mode}'. Choose from: {', '.join(POLICIES)}")
+        self.mode      = mode
+        self.zone      = zone                    # fixed zone, and fallback for the others
+        self.countries = dict(countries or {})   # country code → zone overrides
+        self.schedule  = list(schedule or [])    # [(start date, end date, zone)], inclusive
+
+    def __repr__(self):
+        return f"LocalTimePolicy({self.mode!r}, zone={self.zone!r})"
+
+    def zones_for(self, sp_df):
+        """Per-row zone codes and the list of zone names they index."""
+        if self.mode == "fixed":
+            return np.zeros(len(sp_df), dtype=np.int64), [self.zone]
+        if self.mode == "country":
+            return self._country_zones(sp_df)
+        return self._scheduled_zones(sp_df)
+
+    def _country_zones(self, sp_df):
+        if COUNTRY_COL not in sp_df.columns:
+            return np.zeros(len(sp_df), dtype=np.int64), [self.zone]
+        codes, countries = pd.factorize(sp_df[COUNTRY_COL])
+        table = country_zones()
+        table.update({c.upper(): z for c, z in self.countries.items()})
+
+        zones = [self.zone]
+        country_zone = np.empty(len(countries) + 1, dtype=np.int64)
+        country_zone[-1] = 0                                    # missing country → fallback
+        for i, country in enumerate(countries):
+            zone = table.get(str(country).upper(), self.zone)
+            if zone not in zones:
+                zones.append(zone)
+            country_zone[i] = zones.index(zone)
+        return country_zone[codes], zones
+
+    def _scheduled_zones(self, sp_df):
+        tz = sp_df["datetime"].dt.tz
+        bounds = sorted((pd.Timestamp(start, tz=tz), pd.Timestamp(end, tz=tz) + pd.Timedelta(days=1), zone)
+                        for start, end, zone in self.schedule)
+        for (_, end, a), (start, _, b) in zip(bounds, bounds[1:]):
+            if start < end:
+                raise ValueError(f"Schedule entries for '{a}' and '{b}' overlap.")
+
+        zones = [self.zone] + sorted({zone for _, _, zone in bounds} - {self.zone})
+        starts = np.array([b[0].value for b in bounds], dtype=np.int64)
+        ends   = np.array([b[1].value for b in bounds], dtype=np.int64)
+        entry_zone = np.array([zones.index(b[2]) for b in bounds] + [0], dtype=np.int64)
+
+        times = _utc_ns(sp_df["datetime"])
+        idx = np.searchsorted(starts, times, side="right") - 1
+        inside = (idx >= 0) & (times < ends[np.clip(idx, 0, None)])
+        return entry_zone[np.where(inside, idx, -1)], zones
+
+
+def country_zones():
+    """Dict ISO country code → IANA zone (system zone.tab plus _COUNTRY_DEFAULTS)."""
+    table = {}
+    for base in zoneinfo.TZPATH:
+        path = os.path.join(base, "zone.tab")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("#") or not line.strip():
+                        continue
+                    country, _, zone = line.split("\t")[:3]
+                    table.setdefault(country, zone.strip())
+            break
+    table.update(_COUNTRY_DEFAULTS)
+    return table
+
+
+def transitions(zone, start_ns, end_ns):
+    """
+    Offset-transition table of `zone` over [start_ns, end_ns] (UTC ns):
+    (instants, offsets) int64 arrays. offsets[i] (ns) applies from
+    instants[i] on; instants[0] is the hour containing start_ns.
+
+    Offsets are sampled hourly and each change is then located to the
+    minute, which is exact for every zone in the tz database since 1970.
+    """
+    hours = np.arange(start_ns // _HOUR_NS, end_ns // _HOUR_NS + 2, dtype=np.int64) * _HOUR_NS
+    offsets = _offsets(zone, hours)
+    changes = np.flatnonzero(offsets[1:] != offsets[:-1])
+    if len(changes) == 0:
+        return hours[:1], offsets[:1]
+
+    # Refine every change to the minute: 60 samples per hour bracket, all at once.
+    minutes = (hours[changes][:, None] + np.arange(1, 61, dtype=np.int64) * 60 * _NS).ravel()
+    refined = _offsets(zone, minutes).reshape(len(changes), 60)
+    first = np.argmax(refined != offsets[changes][:, None], axis=1)
+    instants = hours[changes] + (first + 1) * 60 * _NS
+    return (np.concatenate((hours[:1], instants)),
+            np.concatenate((offsets[:1], refined[np.arange(len(changes)), first])))
+
+
+@spotify_profile.profiled()
+def localize(sp_df, policy):
+    """
+    Wall-clock time of every event under `policy`, as a tz-naive Series
+    named local_time (NaT where `datetime` is NaT).
+    """
+    utc = _utc_ns(sp_df["datetime"])
+    valid = utc != np.iinfo(np.int64).min
+    local = np.full(len(sp_df), np.iinfo(np.int64).min, dtype=np.int64)
+    if valid.any():
+        zone_codes, zones = policy.zones_for(sp_df)
+        with spotify_profile.stage("offsets"):
+            local[valid] = utc[valid] + _lookup_offsets(utc[valid], zone_codes[valid], zones)
+    return pd.Series(local.view("datetime64[ns]"), index=sp_df.index, name=LOCAL_COL)
+
+
+def apply(sp_df, policy):
+    """
+    Set up `sp_df` for `policy` in place: `datetime` is converted to the
+    policy's (fallback) zone, and for the country / schedule policies the
+    local_time column is added. Returns `sp_df`.
+    """
+    sp_df["datetime"] = sp_df["datetime"].dt.tz_convert(policy.zone)
+    if policy.mode != "fixed":
+        sp_df[LOCAL_COL] = localize(sp_df, policy)
+    return sp_df
+
+
+def wall_clock(sp_df):
+    """The column to read hour / weekday / day / month / year from: local_time if present, else datetime."""
+    return sp_df[LOCAL_COL] if LOCAL_COL in sp_df.columns else sp_df["datetime"]
+
+
+def cache_tag(sp_df):
+    """
+    Short string naming the local-time setup of `sp_df` for cache file names:
+    the zone, plus a checksum of the per-event offsets when local_time is set.
+    """
+    tag = str(sp_df["datetime"].dt.tz).replace("/", "-")
+    if LOCAL_COL not in sp_df.columns:
+        return tag
+    offsets = sp_df[LOCAL_COL].to_numpy(dtype="datetime64[ns]").view("i8") - _utc_ns(sp_df["datetime"])
+    valid = sp_df[LOCAL_COL].notna().to_numpy()
+    return f"{tag}_local{int(offsets[valid].sum() // _NS) & 0xFFFFFFFF:08x}"
+
+
+def parse_schedule(text):
+    """
+    Parse a schedule setting: entries "START:END=Zone" separated by commas or
+    newlines, e.g. "2024-06-01:2024-06-14=Asia/Tokyo". Returns [(start, end, zone)].
+    """
+    schedule = []
+    for entry in text.replace("\n", ",").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        dates, sep, zone = entry.partition("=")
+        start, sep2, end = dates.partition(":")
+        if not sep or not sep2:
+            raise ValueError(f"Bad schedule entry '{entry}' — expected START:END=Zone.")
+        schedule.append((start.strip(), end.strip(), zone.strip()))
+    return schedule
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _utc_ns(times):
+    """UTC instants as int64 ns (NaT → int64 min)."""
+    return times.to_numpy(dtype="datetime64[ns]").view("i8")
+
+
+def _offsets(zone, utc_ns):
+    """UTC offset (ns) of `zone` at each UTC instant — one vectorized tz_convert."""
+    index = pd.DatetimeIndex(utc_ns.view("datetime64[ns]")).tz_localize("UTC")
+    local = index.tz_convert(zone).tz_localize(None)
+    return local.to_numpy(dtype="datetime64[ns]").view("i8") - utc_ns
+
+
+def _lookup_offsets(utc, zone_codes, zones):
+    """Offset (ns) of each instant in its zone (see module header)."""
+    start, end = utc.min(), utc.max()
+    tables = [transitions(zone, start, end) for zone in zones]
+
+    bounds = np.unique(np.concatenate([instants for instants, _ in tables]))
+    grid = np.stack([offsets[np.searchsorted(instants, bounds, side="right") - 1]
+                     for instants, offsets in tables])
+
+    # Segment at the start of each hour, then step over boundaries inside the hour.
+    first_hour = bounds[0] // _HOUR_NS
+    hour_start = np.arange(first_hour, end // _HOUR_NS + 1, dtype=np.int64) * _HOUR_NS
+    hour_seg = np.searchsorted(bounds, hour_start, side="right") - 1
+    seg = hour_seg[utc // _HOUR_NS - first_hour]
+    next_bound = np.append(bounds[1:], np.iinfo(np.int64).max)
+    while True:
+        step = utc >= next_bound[seg]
+        if not step.any():
+            break
+        seg += step
+    return grid.ravel()[zone_codes * len(bounds) + seg]
@@ -0,0 +1,237 @@
+# spotify_pivot.py
+#   Generic "any dimension × any dimension → measure" pivots over the
+#   extended streaming history columns.
+#
+#   Every dimension is factorized once into integer codes (cached on the
+#   engine), and every pivot is computed with np.bincount over the occupied
+#   cells of row_code * n_cols + col_code — no per-call string groupby.
+#   A new breakdown such as "hours by platform by year" costs one bincount.
+#   Only occupied cells are reduced, and only the kept rows / columns are
+#   made dense, so high-cardinality pivots (track × artist) stay small.
+#
+#   Dimensions:
+#     time     — year, month, hour, weekday
+#     content  — track, artist
+#     context  — platform, platform_family, conn_country, shuffle, offline,
+#                reason_start, reason_end, incognito_mode
+#   (context dimensions only exist in the Extended Streaming History export)
+#
+#   Measures:
+#     plays          — number of streams
+#     hours          — total hours played
+#     skip_rate      — share of streams shorter than the skip threshold
+#     unique_tracks  — distinct tracks played
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import spotify_localtime
+import spotify_profile
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
+
+MEASURES = ("plays", "hours", "skip_rate", "unique_tracks")
+
+# Largest dense table pivot() builds; cut bigger ones with `top`.
+MAX_CELLS = 20_000_000
+
+_TIME_DIMENSIONS = ("year", "month", "hour", "weekday")
+_COLUMN_DIMENSIONS = {
+    "track":          TRACK_COL,
+    "artist":         ARTIST_COL,
+    "platform":       "platform",
+    "conn_country":   "conn_country",
+    "shuffle":        "shuffle",
+    "offline":        "offline",
+    "reason_start":   "reason_start",
+    "reason_end":     "reason_end",
+    "incognito_mode": "incognito_mode",
+}
+DIMENSIONS = _TIME_DIMENSIONS + tuple(_COLUMN_DIMENSIONS) + ("platform_family",)
+
+_WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday",
+             "Friday", "Saturday", "Sunday"]
+
+# Raw `platform` strings are very detailed ("Android OS 9 API 28 (samsung,
+# SM-G960F)"); platform_family groups them by the first keyword found.
+_PLATFORM_FAMILIES = [("android", "Android"), ("ios", "iOS"), ("iphone", "iOS"),
+                      ("ipad", "iOS"), ("windows", "Windows"), ("os x", "macOS"),
+                      ("osx", "macOS"), ("mac", "macOS"), ("linux", "Linux"),
+                      ("web", "Web"), ("cast", "Cast"), ("sonos", "Speaker"),
+                      ("alexa", "Speaker"), ("echo", "Speaker"), ("tv", "TV"),
+                      ("playstation", "Console"), ("xbox", "Console")]
+
+
+class PivotEngine:
+    """
+    Pivot engine over one streaming history frame.
+    Build once and reuse — dimension codes are computed on first use and cached.
+    """
+
+    def __init__(self, sp_df, skip_threshold_ms=30_000):
+        self._df      = sp_df
+        self._codes   = {}
+        self._ms      = sp_df["ms_played"].to_numpy(dtype=np.float64)
+        self._skipped = (sp_df["ms_played"] < skip_threshold_ms).to_numpy(dtype=np.float64)
+
+    def available(self):
+        """Dimensions present in this dataset."""
+        return [d for d in DIMENSIONS
+                if d in _TIME_DIMENSIONS
+                or _COLUMN_DIMENSIONS.get(d, "platform") in self._df.columns]
+
+    def codes(self, dim):
+        """(codes, labels) for `dim`; codes are -1 where the value is missing."""
+        if dim not in self._codes:
+            with spotify_profile.stage(f"encode_{dim}"):
+                self._codes[dim] = self._encode(dim)
+        return self._codes[dim]
+
+    @spotify_profile.profiled("pivot")
+    def pivot(self, rows, cols=None, measure="plays", top=None):
+        """
+        Pivot `measure` by `rows` (and optionally `cols`).
+        Returns a DataFrame indexed by the row labels, one column per col label
+        (or a single `measure` column when `cols` is None). Rows and columns
+        with no streams are dropped. With `top`, only the `top` rows / columns
+        with the most streams are kept (in their natural order).
+        Raises ValueError if the table would exceed MAX_CELLS.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{measure}'. Choose from: {', '.join(MEASURES)}")
+
+        r_codes, r_labels = self.codes(rows)
+        if cols is None:
+            c_codes, c_labels = np.zeros(len(r_codes), dtype=np.int64), [measure]
+        else:
+            c_codes, c_labels = self.codes(cols)
+
+        n_c = len(c_labels)
+        valid = (r_codes >= 0) & (c_codes >= 0)
+        cells, inverse = np.unique(r_codes[valid].astype(np.int64) * n_c + c_codes[valid],
+                                   return_inverse=True)
+        n = len(cells)
+
+        plays = np.bincount(inverse, minlength=n)
+        if measure == "plays":
+            values = plays.astype(np.float64)
+        elif measure == "hours":
+            values = np.bincount(inverse, weights=self._ms[valid], minlength=n) * MS_TO_HOURS
+        elif measure == "skip_rate":
+            values = np.bincount(inverse, weights=self._skipped[valid], minlength=n) / plays
+        else:
+            t_codes, t_labels = self.codes("track")
+            t = t_codes[valid]
+            has_track = t >= 0
+            pairs = np.unique(inverse[has_track].astype(np.int64) * len(t_labels) + t[has_track])
+            values = np.bincount(pairs // len(t_labels), minlength=n).astype(np.float64)
+
+        row, col = cells // n_c, cells % n_c
+        keep_rows = _top_codes(row, plays, top)
+        keep_cols = _top_codes(col, plays, top)
+        if len(keep_rows) * len(keep_cols) > MAX_CELLS:
+            raise ValueError(f"{rows} × {cols} has {len(keep_rows):,} × {len(keep_cols):,} cells; "
+                             f"pass top= to keep only the largest rows / columns.")
+
+        r_pos = np.full(len(r_labels), -1, dtype=np.int64)
+        r_pos[keep_rows] = np.arange(len(keep_rows))
+        c_pos = np.full(n_c, -1, dtype=np.int64)
+        c_pos[keep_cols] = np.arange(len(keep_cols))
+        inside = (r_pos[row] >= 0) & (c_pos[col] >= 0)
+
+        fill = np.nan if measure == "skip_rate" else 0
+        dense = np.full((len(keep_rows), len(keep_cols)), fill, dtype=np.float64)
+        dense[r_pos[row[inside]], c_pos[col[inside]]] = values[inside]
+
+        table = pd.DataFrame(dense,
+                             index=pd.Index([r_labels[i] for i in keep_rows], name=rows),
+                             columns=pd.Index([c_labels[i] for i in keep_cols], name=cols))
+        if measure in ("plays", "unique_tracks"):
+            table = table.astype(np.int64)
+        return table
+
+    # ── encoding ──────────────────────────────────────────────────────────────
+
+    def _encode(self, dim):
+        dt = spotify_localtime.wall_clock(self._df).dt
+        if dim == "year":
+            years = dt.year.to_numpy(dtype=np.float64, na_value=np.nan)
+            known = years[~np.isnan(years)]
+            first = int(known.min()) if len(known) else 0
+            labels = list(range(first, (int(known.max()) if len(known) else -1) + 1))
+            return _time_codes(years - first), labels
+        if dim == "month":
+            return _time_codes(dt.month.to_numpy(dtype=np.float64, na_value=np.nan) - 1), list(range(1, 13))
+        if dim == "hour":
+            return _time_codes(dt.hour.to_numpy(dtype=np.float64, na_value=np.nan)), list(range(24))
+        if dim == "weekday":
+            return _time_codes(dt.dayofweek.to_numpy(dtype=np.float64, na_value=np.nan)), _WEEKDAYS
+        if dim == "platform_family":
+            p_codes, p_labels = self.codes("platform")
+            families = [_platform_family(p) for p in p_labels]
+            f_codes, f_labels = pd.factorize(pd.Series(families, dtype=object), sort=True)
+            lookup = np.append(f_codes, -1)          # index -1 (missing) → -1
+            return lookup[p_codes], list(f_labels)
+
+        if dim not in _COLUMN_DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dim}'. Choose from: {', '.join(DIMENSIONS)}")
+        column = _COLUMN_DIMENSIONS[dim]
+        if column not in self._df.columns:
+            raise KeyError(f"Dimension '{dim}' needs the '{column}' column "
+                           f"(Extended Streaming History export only).")
+        codes, labels = pd.factorize(self._df[column], sort=True)
+        return codes.astype(np.int64), list(labels)
+
+
+def pivot_chart(engine, rows, cols=None, measure="plays", top=25):
+    """
+    Print and chart a pivot: heatmap for two dimensions, bar chart for one.
+    High-cardinality dimensions (track, artist, ...) are cut to the `top`
+    rows / columns with the most streams.
+    """
+    table = engine.pivot(rows, cols, measure, top=top)
+
+    title = f"{measure.replace('_', ' ').title()} by {rows}" + (f" × {cols}" if cols else "")
+    print(f"\n  {title}")
+    print(table.round(3).to_string())
+
+    with spotify_profile.stage("render"):
+        if cols is None:
+            fig, ax = plt.subplots(figsize=(max(10, len(table) // 2), 6))
+            ax.bar(table.index.astype(str), table[measure], color="mediumseagreen")
+            ax.set(title=title, xlabel=rows, ylabel=measure.replace("_", " "))
+            ax.tick_params(axis="x", labelrotation=75)
+        else:
+            fig, ax = plt.subplots(figsize=(max(10, table.shape[1] * 0.6), max(4, len(table) * 0.4)))
+            sns.heatmap(table, cmap="Greens", ax=ax, linewidths=0.3,
+                        cbar_kws={"label": measure.replace("_", " ")})
+            ax.set(title=title, xlabel=cols, ylabel=rows)
+        plt.tight_layout()
+    plt.show()
+    return table
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _time_codes(values):
+    """Float time-field values (NaN for NaT) → int64 codes, -1 where missing."""
+    return np.where(np.isnan(values), -1, np.nan_to_num(values)).astype(np.int64)
+
+
+def _top_codes(codes, plays, top):
+    """Distinct `codes` (sorted), cut to the `top` with the most plays when `top` is set."""
+    totals = np.bincount(codes, weights=plays)
+    present = np.flatnonzero(totals > 0)
+    if top is None or len(present) <= top:
+        return present
+    best = present[np.argsort(-totals[present], kind="stable")[:top]]
+    return np.sort(best)
+
+
+def _platform_family(platform):
+    lower = str(platform).lower()
+    for keyword, family in _PLATFORM_FAMILIES:
+        if keyword in lower:
+            return family
+    return "Other"
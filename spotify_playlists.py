@@ -23,25 +23,44 @@
 #     ]
 #   }
 
-import json
 import os
 import pandas as pd
 
+import spotify_profile
+import spotify_scraper
+import spotify_table
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
 
-def load_playlists(file_path):
+
+@spotify_profile.profiled()
+def load_playlists(file_path, member_name="Playlist1.json", log=print):
     """
     Load Playlist1.json from a Spotify account data export.
+    `file_path` may also be the export's zip archive; `member_name` is then
+    read straight from the zip.
+    The "Loaded" message goes through `log`.
     Returns the list of playlist dicts, or raises FileNotFoundError.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Playlist file not found: {file_path}")
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = spotify_scraper.read_export_json(file_path, member_name)
     playlists = data.get("playlists", [])
-    print(f"Loaded {len(playlists)} playlists.")
+    log(f"Loaded {len(playlists)} playlists.")
     return playlists
 
 
+@spotify_profile.profiled()
+def playlist_summary(playlists):
+    """DataFrame with one row per playlist: number, name, track count, last modified."""
+    return pd.DataFrame({
+        "#":             range(1, len(playlists) + 1),
+        "name":          [str(pl.get("name", "Unnamed")) for pl in playlists],
+        "tracks":        [len(pl.get("items", [])) for pl in playlists],
+        "last_modified": [pl.get("lastModifiedDate", "Unknown") for pl in playlists],
+    })
+
+
+@spotify_profile.profiled()
 def list_playlists(playlists):
     """Print a numbered table of all playlists with track counts."""
     print(f"\n  {'#':<5} {'Playlist Name':<42} {'Tracks':<8} Last Modified")
@@ -54,9 +73,11 @@ def list_playlists(playlists):
     print()
 
 
-def show_playlist(playlists, identifier):
+@spotify_profile.profiled()
+def show_playlist(playlists, identifier, paged=True):
     """
-    Print all tracks in a playlist.
+    Show all tracks in a playlist, a page at a time (sortable / filterable).
+    With paged=False every row is printed at once.
     `identifier` can be a playlist number (1-based) or a name (case-insensitive).
     """
     pl = _find_playlist(playlists, identifier)
@@ -64,45 +85,35 @@ def show_playlist(playlists, identifier):
         print(f"  Playlist '{identifier}' not found. Use list_playlists() to see available playlists.")
         return
 
-    items = pl.get("items", [])
+    tracks = playlist_tracks(playlists, identifier, include_local=True)
     print(f"\n  Playlist : {pl.get('name', 'Unnamed')}")
     desc = pl.get("description", "").strip()
     if desc:
         print(f"  Desc     : {desc}")
-    print(f"  Tracks   : {len(items)}")
+    print(f"  Tracks   : {len(tracks)}")
     print(f"  Modified : {pl.get('lastModifiedDate', 'Unknown')}")
     print()
-    print(f"  {'#':<5} {'Track':<45} {'Artist':<30} Added")
-    print("  " + "─" * 90)
-
-    for i, item in enumerate(items, 1):
-        track   = item.get("track") or {}
-        episode = item.get("episode") or {}
-        added   = item.get("addedDate", "")
 
-        if track:
-            t_name = str(track.get("trackName",  ""))[:43]
-            artist = str(track.get("artistName", ""))[:28]
-        elif episode:
-            t_name = str(episode.get("episodeName", ""))[:43]
-            artist = str(episode.get("showName",    ""))[:28]
-        else:
-            t_name = "(local / unknown)"
-            artist = ""
-
-        print(f"  {i:<5} {t_name:<45} {artist:<30} {added}")
-    print()
+    columns = [("name", "Track", 45), ("artist", "Artist", 30), ("added_date", "Added", 12)]
+    if paged:
+        spotify_table.browse(spotify_table.TableView(tracks, columns))
+    else:
+        spotify_table.print_table(tracks, columns)
+        print()
 
 
-def export_playlist(playlists, identifier, output_path="playlist_export.csv"):
+@spotify_profile.profiled()
+def playlist_tracks(playlists, identifier, include_local=False):
     """
-    Export a playlist's tracks to a CSV file.
+    DataFrame of a playlist's tracks and episodes
+    (type, name, artist, album, uri, added_date), or None if not found.
     `identifier` can be a playlist number (1-based) or a name (case-insensitive).
+    With include_local=True, local files / unknown items are kept as
+    "(local / unknown)" rows.
     """
     pl = _find_playlist(playlists, identifier)
     if pl is None:
-        print(f"  Playlist '{identifier}' not found.")
-        return
+        return None
 
     rows = []
     for item in pl.get("items", []):
@@ -127,26 +138,59 @@ def export_playlist(playlists, identifier, output_path="playlist_export.csv"):
                 "uri":        episode.get("episodeUri",  ""),
                 "added_date": item.get("addedDate",      ""),
             })
+        elif include_local:
+            rows.append({
+                "type":       "local",
+                "name":       "(local / unknown)",
+                "artist":     "",
+                "album":      "",
+                "uri":        "",
+                "added_date": item.get("addedDate", ""),
+            })
+
+    return pd.DataFrame(rows, columns=["type", "name", "artist", "album", "uri", "added_date"])
+
+
+@spotify_profile.profiled()
+def export_playlist(playlists, identifier, output_path="playlist_export.csv"):
+    """
+    Export a playlist's tracks to a CSV file.
+    `identifier` can be a playlist number (1-based) or a name (case-insensitive).
+    """
+    df = playlist_tracks(playlists, identifier)
+    if df is None:
+        print(f"  Playlist '{identifier}' not found.")
+        return
 
-    df = pd.DataFrame(rows, columns=["type", "name", "artist", "album", "uri", "added_date"])
     df.to_csv(output_path, index=False)
-    print(f"  Exported {len(rows)} tracks to '{output_path}'")
+    print(f"  Exported {len(df)} tracks to '{output_path}'")
+
+
+@spotify_profile.profiled()
+def playlist_stats_data(playlists, num=5):
+    """Dict with total playlists, total tracks and the `num` longest playlists."""
+    summary = playlist_summary(playlists)
+    return {"total_playlists": len(playlists),
+            "total_tracks":    int(summary["tracks"].sum()),
+            "longest":         summary.sort_values("tracks", ascending=False,
+                                                   kind="stable").head(num)}
 
 
+@spotify_profile.profiled()
 def playlist_stats(playlists):
     """Print a summary: total playlists, total tracks, and top contributors."""
-    total_tracks = sum(len(pl.get("items", [])) for pl in playlists)
-    print(f"\n  Total playlists : {len(playlists)}")
-    print(f"  Total tracks    : {total_tracks:,}")
+    stats = playlist_stats_data(playlists)
+    print(f"\n  Total playlists : {stats['total_playlists']}")
+    print(f"  Total tracks    : {stats['total_tracks']:,}")
 
     # Longest playlists
-    sorted_pl = sorted(playlists, key=lambda p: len(p.get("items", [])), reverse=True)
     print(f"\n  Longest playlists:")
-    for pl in sorted_pl[:5]:
-        print(f"    {len(pl.get('items', [])):>4} tracks — {pl.get('name', 'Unnamed')}")
+    for name, tracks in zip(stats["longest"]["name"], stats["longest"]["tracks"]):
+        print(f"    {tracks:>4} tracks — {name}")
     print()
 
 
+@spotify_profile.profiled()
 def playlist_diff(old_playlists, new_playlists, identifier):
     """
     Compare a playlist between two exports and print what was added and dropped.
@@ -208,6 +252,84 @@ def playlist_diff(old_playlists, new_playlists, identifier):
     print()
 
 
+@spotify_profile.profiled()
+def playlist_items_table(playlists):
+    """
+    Flattened table of every track in every playlist, one row per item:
+    playlist_no (1-based), playlist, track, artist, uri, added_date.
+    Episodes and local files are skipped.
+    """
+    rows = [(no, pl.get("name", "Unnamed"), t.get("trackName", ""),
+             t.get("artistName", ""), t.get("trackUri", ""), item.get("addedDate", ""))
+            for no, pl in enumerate(playlists, 1)
+            for item in pl.get("items", [])
+            for t in (item.get("track"),) if t]
+    return pd.DataFrame(rows, columns=["playlist_no", "playlist", "track",
+                                       "artist", "uri", "added_date"])
+
+
+@spotify_profile.profiled()
+def playlist_play_stats_data(playlists, streaming_df):
+    """
+    Streaming stats for every playlist at once: tracks, total plays, hours,
+    last played date and share of tracks never played.
+
+    Streaming history is aggregated to one row per track first, then joined
+    to the flattened playlist items on track URI (Extended export) or on
+    artist + track name (basic export, which has no URIs).
+    """
+    items = playlist_items_table(playlists)
+    if "spotify_track_uri" in streaming_df.columns:
+        items["key"] = items["uri"]
+        stream_key = streaming_df["spotify_track_uri"]
+    else:
+        items["key"] = items["artist"].str.lower() + "||" + items["track"].str.lower()
+        stream_key = (streaming_df[ARTIST_COL].str.lower() + "||"
+                      + streaming_df[TRACK_COL].str.lower())
+
+    per_track = (streaming_df.groupby(stream_key.rename("key"))
+                             .agg(plays=("Count", "sum"),
+                                  ms_played=("ms_played", "sum"),
+                                  last_played=("datetime", "max")))
+
+    merged = items.merge(per_track, left_on="key", right_index=True, how="left")
+    merged["plays"]     = merged["plays"].fillna(0).astype(int)
+    merged["ms_played"] = merged["ms_played"].fillna(0)
+    merged["never"]     = merged["plays"] == 0
+
+    stats = (merged.groupby("playlist_no")
+                   .agg(tracks=("key", "size"),
+                        plays=("plays", "sum"),
+                        ms_played=("ms_played", "sum"),
+                        last_played=("last_played", "max"),
+                        never_played_pct=("never", "mean")))
+
+    summary = playlist_summary(playlists).set_index("#")[["name"]]
+    stats = summary.join(stats, how="left")
+    stats["tracks"] = stats["tracks"].fillna(0).astype(int)
+    stats["plays"]  = stats["plays"].fillna(0).astype(int)
+    stats["hours"]  = stats.pop("ms_played").fillna(0) * MS_TO_HOURS
+    stats["never_played_pct"] = stats["never_played_pct"].fillna(0) * 100
+    return stats.rename_axis("#").reset_index()
+
+
+@spotify_profile.profiled()
+def playlist_play_stats(playlists, streaming_df, sort_by="plays"):
+    """Print streaming stats for all playlists, sorted by `sort_by` (descending)."""
+    stats = playlist_play_stats_data(playlists, streaming_df)
+    stats = stats.sort_values(sort_by, ascending=False, kind="stable")
+
+    print(f"\n  {'#':<5} {'Playlist Name':<38} {'Tracks':>6} {'Plays':>8} "
+          f"{'Hours':>8} {'Never %':>8}  Last Played")
+    print("  " + "─" * 94)
+    for row in stats.itertuples(index=False):
+        last = row.last_played.date() if pd.notna(row.last_played) else "never"
+        print(f"  {row[0]:<5} {str(row.name)[:36]:<38} {row.tracks:>6} {row.plays:>8,} "
+              f"{row.hours:>8.1f} {row.never_played_pct:>7.1f}%  {last}")
+    print()
+    return stats
+
+
 # ── Internal helpers ──────────────────────────────────────────────────────────
 
 def _find_playlist(playlists, identifier):
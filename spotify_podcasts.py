@@ -0,0 +1,88 @@
+# spotify_podcasts.py
+#   Podcast analyses over the episode table from spotify_scraper.split_episodes().
+#
+#   The episode table is usually a small fraction of the history, so these
+#   functions never touch the music rows.
+#
+#   Completion rate = share of plays that ended because the episode finished
+#   (reason_end "trackdone"). Exports without reason_end give NaN.
+
+import pandas as pd
+import matplotlib.pyplot as plt
+
+import spotify_profile
+from spotify_columns import MS_TO_HOURS
+
+SHOW_COL    = "episode_show_name"
+EPISODE_COL = "episode_name"
+
+
+@spotify_profile.profiled()
+def top_shows_data(ep_df, num=20, type="ms_played"):
+    """
+    Top `num` shows by total listening time ("ms_played") or plays ("Count").
+    DataFrame indexed by show: plays, hours, episodes, completion_rate.
+    """
+    shows = ep_df.groupby(SHOW_COL, observed=True)
+    table = pd.DataFrame({"plays":           shows["Count"].sum(),
+                          "hours":           shows["ms_played"].sum() * MS_TO_HOURS,
+                          "episodes":        shows[EPISODE_COL].nunique(),
+                          "completion_rate": _finished(ep_df).groupby(ep_df[SHOW_COL], observed=True).mean()})
+    by = "hours" if type == "ms_played" else "plays"
+    return table.sort_values(by=by, ascending=False, kind="stable").head(num)
+
+
+@spotify_profile.profiled()
+def podcast_summary_data(ep_df):
+    """Dict of headline podcast stats: plays, hours, shows, episodes, completion_rate, first / last play."""
+    return {"plays":           int(ep_df["Count"].sum()),
+            "hours":           float(ep_df["ms_played"].sum() * MS_TO_HOURS),
+            "shows":           int(ep_df[SHOW_COL].nunique()),
+            "episodes":        int(ep_df[EPISODE_COL].nunique()),
+            "completion_rate": float(_finished(ep_df).mean()),
+            "first_date":      ep_df["datetime"].min(),
+            "last_date":       ep_df["datetime"].max()}
+
+
+@spotify_profile.profiled()
+def podcast_report(ep_df, num=15):
+    """Print podcast totals and the top shows; bar chart of hours per show."""
+    if ep_df is None or ep_df.empty:
+        print("\n  No podcast episodes in the loaded history.")
+        return None
+
+    stats = podcast_summary_data(ep_df)
+    print(f"\n  Podcasts: {stats['plays']:,} plays, {stats['hours']:,.1f} hours, "
+          f"{stats['shows']:,} shows, {stats['episodes']:,} episodes "
+          f"({stats['first_date']:%Y-%m-%d} → {stats['last_date']:%Y-%m-%d})")
+    print(f"  Completion rate: {_percent(stats['completion_rate'])}")
+
+    shows = top_shows_data(ep_df, num, "ms_played")
+    print(f"\n  {'#':<4} {'Show':<40} {'Hours':>8} {'Plays':>7} {'Episodes':>9} {'Completed':>10}")
+    print("  " + "─" * 82)
+    for i, (show, row) in enumerate(shows.iterrows(), 1):
+        print(f"  {i:<4} {str(show)[:38]:<40} {row['hours']:>8,.1f} {int(row['plays']):>7,} "
+              f"{int(row['episodes']):>9,} {_percent(row['completion_rate']):>10}")
+
+    with spotify_profile.stage("render"):
+        fig, ax = plt.subplots(figsize=(12, max(4, len(shows) * 0.4)))
+        ax.barh(shows.index.astype(str)[::-1], shows["hours"][::-1], color="mediumseagreen")
+        for y, (hours, rate) in enumerate(zip(shows["hours"][::-1], shows["completion_rate"][::-1])):
+            ax.text(hours, y, f"  {_percent(rate)} completed", va="center", fontsize=8, color="darkgreen")
+        ax.set(title=f"Top {len(shows)} Podcasts by Listening Time", xlabel="Hours Played", ylabel="")
+        plt.tight_layout()
+    plt.show()
+    return shows
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _finished(ep_df):
+    """Float Series: 1.0 where the play reached the end of the episode (NaN without reason_end)."""
+    if "reason_end" not in ep_df.columns:
+        return pd.Series(float("nan"), index=ep_df.index)
+    return (ep_df["reason_end"] == "trackdone").astype(float)
+
+
+def _percent(rate):
+    return "—" if pd.isna(rate) else f"{rate:.0%}"
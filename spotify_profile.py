@@ -0,0 +1,196 @@
+# spotify_profile.py
+#   Optional timing instrumentation for loaders and analyses.
+#
+#   Enabled with `python main.py --profile`. Each instrumented stage records
+#     wall time  — time.perf_counter()
+#     CPU time   — time.thread_time() (the calling thread only, so threads
+#                  and worker processes started by a stage are not included)
+#     peak memory — highest traced Python/numpy allocation above the memory in
+#                   use when the stage started (tracemalloc). tracemalloc
+#                   counts the whole process, so when stages run on several
+#                   threads at once (e.g. the background loaders) their peaks
+#                   include each other's allocations; such rows are marked
+#                   with '*' in the summary and should not be trusted.
+#   Stages nest: a stage opened inside another is recorded as "outer/inner",
+#   e.g. "listening_heatmap/listening_heatmap_data/groupby".
+#
+#   When profiling is off, stage() and @profiled cost a single flag check.
+#
+#   At exit, print_summary() prints one row per stage path and write_trace()
+#   writes a Chrome trace-event file (open in chrome://tracing or Perfetto).
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_TRACE_FILE = "spotify_profile_trace.json"
+
+_enabled = False
+_records = []
+_records_lock = threading.Lock()
+_local = threading.local()
+_open = {}   # thread id → that thread's open stage entries (guarded by _records_lock)
+
+
+def enable():
+    """Start recording stages (and tracing memory allocations)."""
+    global _enabled
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextmanager
+def stage(name):
+    """Context manager recording one stage; does nothing unless enabled."""
+    if not _enabled:
+        yield
+        return
+
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    path = f"{parent['path']}/{name}" if parent else name
+
+    # tracemalloc keeps one global peak, so each open stage remembers the
+    # highest peak seen so far and the global peak is reset per stage.
+    current, peak = tracemalloc.get_traced_memory()
+    if parent:
+        parent["peak"] = max(parent["peak"], peak)
+    tracemalloc.reset_peak()
+
+    entry = {"path": path, "peak": current, "start_mem": current, "concurrent": False,
+             "wall": time.perf_counter(), "cpu": time.thread_time()}
+    stack.append(entry)
+    _track_open(stack)
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - entry["wall"]
+        cpu  = time.thread_time() - entry["cpu"]
+        stack.pop()
+
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(entry["peak"], peak)
+        if parent:
+            parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+
+        with _records_lock:
+            if not stack:
+                _open.pop(threading.get_ident(), None)
+            _records.append({"path":       path,
+                             "start":      entry["wall"],
+                             "wall":       wall,
+                             "cpu":        cpu,
+                             "peak":       peak - entry["start_mem"],
+                             "concurrent": entry["concurrent"],
+                             "thread":     threading.get_ident()})
+
+
+def profiled(name=None):
+    """Decorator: record every call of the function as a stage (default: its name)."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    List of dicts, one per stage path in first-seen order:
+    path, calls, wall, cpu (seconds, summed over calls), peak (bytes, max),
+    concurrent (True if any call overlapped a stage on another thread, making
+    its peak unreliable).
+    """
+    with _records_lock:
+        records = sorted(_records, key=lambda r: r["start"])
+
+    rows = {}
+    for r in records:
+        row = rows.setdefault(r["path"], {"path": r["path"], "calls": 0,
+                                          "wall": 0.0, "cpu": 0.0, "peak": 0,
+                                          "concurrent": False})
+        row["calls"] += 1
+        row["wall"]  += r["wall"]
+        row["cpu"]   += r["cpu"]
+        row["peak"]   = max(row["peak"], r["peak"])
+        row["concurrent"] |= r["concurrent"]
+    return list(rows.values())
+
+
+def print_summary():
+    """Print the per-stage summary table."""
+    rows = summary()
+    if not rows:
+        print("\n  No profiled stages recorded.\n")
+        return
+
+    print(f"\n  {'Stage':<58} {'Calls':>6} {'Wall s':>9} {'CPU s':>9} {'Peak MB':>9}")
+    print("  " + "─" * 96)
+    for row in rows:
+        depth = row["path"].count("/")
+        label = ("  " * depth + row["path"].rsplit("/", 1)[-1])[:56]
+        mark = "*" if row["concurrent"] else " "
+        print(f"  {label:<58} {row['calls']:>6} {row['wall']:>9.3f} "
+              f"{row['cpu']:>9.3f} {row['peak'] / 1e6:>9.1f}{mark}")
+    if any(row["concurrent"] for row in rows):
+        print("\n  * ran alongside stages on other threads; peak memory is process-wide"
+              " and unreliable here.")
+    print()
+
+
+def write_trace(path=DEFAULT_TRACE_FILE):
+    """Write all recorded stages as a Chrome trace-event JSON file."""
+    with _records_lock:
+        records = list(_records)
+    origin = min((r["start"] for r in records), default=0.0)
+
+    events = [{"name": r["path"].rsplit("/", 1)[-1],
+               "cat":  "stage",
+               "ph":   "X",
+               "ts":   (r["start"] - origin) * 1e6,
+               "dur":  r["wall"] * 1e6,
+               "pid":  os.getpid(),
+               "tid":  r["thread"],
+               "args": {"path":    r["path"],
+                        "cpu_ms":  round(r["cpu"] * 1e3, 3),
+                        "peak_mb": round(r["peak"] / 1e6, 3),
+                        "peak_concurrent": r["concurrent"]}}
+              for r in records]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"  Profile trace written to '{path}'")
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _track_open(stack):
+    """Register this thread's open stages; if another thread has stages open, mark both sides concurrent."""
+    with _records_lock:
+        _open[threading.get_ident()] = stack
+        others = [e for tid, s in _open.items() if tid != threading.get_ident() for e in s]
+        if others:
+            for e in others + stack:
+                e["concurrent"] = True
@@ -0,0 +1,218 @@
+# spotify_quality.py
+#   Data-quality checks for a loaded streaming history, run once at load
+#   time by spotify_scraper.clean_data().
+#
+#   Every row-level check is a vectorized mask over the whole frame; the
+#   results are packed into one small bit-flag array (one byte per row), so
+#   the report and any drop / repair step work from the same single pass.
+#
+#   Row checks:
+#     duplicate       same stream present more than once (overlapping exports)
+#     bad_timestamp   `ts` could not be parsed
+#     out_of_range    timestamp before Spotify launched or in the future
+#     zero_ms         ms_played == 0
+#     negative_ms     ms_played < 0
+#     too_long        a single play longer than `max_play_ms`
+#     podcast         episode row — no track / artist by design
+#     no_metadata     neither track / artist nor episode metadata
+#   Dataset checks:
+#     gaps            stretches longer than `gap_days` with no plays at all
+#     files           per-file time ranges; files overlapping earlier files
+#                     point at clock skew or overlapping exports
+
+import numpy as np
+import pandas as pd
+
+import spotify_profile
+from spotify_columns import ARTIST_COL, TRACK_COL
+
+# Columns that identify one stream (used for duplicate detection).
+STREAM_KEY = ["ts", "ms_played", "master_metadata_track_name",
+              "spotify_track_uri", "spotify_episode_uri"]
+
+MAX_PLAY_MS = 3 * 60 * 60 * 1000          # 3 hours
+GAP_DAYS    = 30
+EARLIEST    = pd.Timestamp("2008-10-07", tz="UTC")   # Spotify public launch
+
+FIX_MODES = ("drop", "repair")
+
+# (flag, description) in bit order
+ISSUES = [
+    ("duplicate",     "Duplicate streams"),
+    ("bad_timestamp", "Unparseable timestamp"),
+    ("out_of_range",  "Timestamp before 2008 / in the future"),
+    ("zero_ms",       "Zero ms_played"),
+    ("negative_ms",   "Negative ms_played"),
+    ("too_long",      "Single play longer than limit"),
+    ("podcast",       "Podcast episode (no track / artist)"),
+    ("no_metadata",   "No track / artist / episode metadata"),
+]
+_BIT = {name: np.uint8(1 << i) for i, (name, _) in enumerate(ISSUES)}
+
+# Flags removed by fix="drop"; podcast rows are valid data and are kept.
+_DROP = ("duplicate", "bad_timestamp", "out_of_range", "zero_ms",
+         "negative_ms", "too_long", "no_metadata")
+# Flags that can't be repaired, so fix="repair" removes them too.
+_UNREPAIRABLE = ("duplicate", "bad_timestamp", "out_of_range")
+
+
+@spotify_profile.profiled("quality_check")
+def check(sp_df, max_play_ms=MAX_PLAY_MS, gap_days=GAP_DAYS):
+    """
+    Run every check over `sp_df` (after clean_data has parsed `datetime`).
+    Returns dict:
+      "flags"   — uint8 array, one bit per issue (see ISSUES) for each row
+      "summary" — DataFrame: issue, description, rows, share
+      "gaps"    — DataFrame: start, end, days (longest first)
+      "files"   — DataFrame: file, rows, first, last, overlap (or empty)
+    """
+    flags = np.zeros(len(sp_df), dtype=np.uint8)
+    times = sp_df["datetime"]
+    ms    = sp_df["ms_played"]
+
+    with spotify_profile.stage("rows"):
+        key = [c for c in STREAM_KEY if c in sp_df.columns]
+        if "ts" not in sp_df.columns:
+            key.append("datetime")      # e.g. events read back from the SQLite store
+        _set(flags, "duplicate",     sp_df.duplicated(subset=key))
+        _set(flags, "bad_timestamp", times.isna())
+        _set(flags, "out_of_range",  (times < EARLIEST) | (times > pd.Timestamp.now(tz="UTC")))
+        _set(flags, "zero_ms",       ms == 0)
+        _set(flags, "negative_ms",   ms < 0)
+        _set(flags, "too_long",      ms > max_play_ms)
+
+        no_music = sp_df[TRACK_COL].isna() | sp_df[ARTIST_COL].isna()
+        episode  = is_episode(sp_df)
+        _set(flags, "podcast",     episode)
+        _set(flags, "no_metadata", no_music & ~episode)
+
+    with spotify_profile.stage("gaps"):
+        gaps = _gaps(times, gap_days)
+    with spotify_profile.stage("files"):
+        files = _files(sp_df)
+
+    counts = [int(np.count_nonzero(flags & _BIT[name])) for name, _ in ISSUES]
+    summary = pd.DataFrame({"issue":       [name for name, _ in ISSUES],
+                            "description": [desc for _, desc in ISSUES],
+                            "rows":        counts})
+    summary["share"] = summary["rows"] / max(len(sp_df), 1)
+    return {"flags": flags, "summary": summary, "gaps": gaps, "files": files}
+
+
+def is_episode(sp_df):
+    """Boolean Series: podcast episode rows (episode metadata, no track / artist)."""
+    if "episode_name" not in sp_df.columns:
+        return pd.Series(False, index=sp_df.index)
+    no_music = sp_df[TRACK_COL].isna() | sp_df[ARTIST_COL].isna()
+    return no_music & sp_df["episode_name"].notna()
+
+
+def mask(report, *issues):
+    """Boolean array: rows flagged with any of `issues`."""
+    bits = np.uint8(0)
+    for name in issues:
+        bits |= _BIT[name]
+    return (report["flags"] & bits) != 0
+
+
+def apply_fix(sp_df, report, mode, max_play_ms=MAX_PLAY_MS):
+    """
+    Return `sp_df` with flagged rows handled:
+      "drop"   — remove every flagged row except podcast episodes
+      "repair" — remove duplicates and bad / out-of-range timestamps, clip
+                 ms_played into [0, max_play_ms], keep everything else
+    """
+    if mode not in FIX_MODES:
+        raise ValueError(f"Unknown fix mode '{mode}'. Choose from: {', '.join(FIX_MODES)}")
+
+    if mode == "drop":
+        bad = mask(report, *_DROP)
+        return sp_df.loc[~bad].reset_index(drop=True)
+
+    bad = mask(report, *_UNREPAIRABLE)
+    fixed = sp_df.loc[~bad].reset_index(drop=True)
+    fixed["ms_played"] = fixed["ms_played"].clip(lower=0, upper=max_play_ms)
+    return fixed
+
+
+def print_report(report, num=5, log=print):
+    """
+    Print the compact quality report (only issues that occur, plus top gaps /
+    overlaps). Each line goes through `log` (default print).
+    """
+    summary = report["summary"]
+    found = summary[summary["rows"] > 0]
+
+    log("\n  ── Data Quality ──────────────────────────────────")
+    if found.empty:
+        log("  No row-level issues found.")
+    for row in found.itertuples(index=False):
+        log(f"  {row.description:<40} {row.rows:>10,}  ({row.share:.2%})")
+
+    gaps = report["gaps"]
+    if not gaps.empty:
+        log(f"\n  {len(gaps):,} gap(s) with no plays; longest:")
+        for g in gaps.head(num).itertuples(index=False):
+            log(f"    {g.start:%Y-%m-%d} → {g.end:%Y-%m-%d}  ({g.days:,.0f} days)")
+
+    files = report["files"]
+    overlapping = files[files["overlap"] > pd.Timedelta(0)] if not files.empty else files
+    if not overlapping.empty:
+        log(f"\n  {len(overlapping):,} file(s) overlap earlier files in time "
+            f"(clock skew or overlapping exports):")
+        for f in overlapping.sort_values("overlap", ascending=False).head(num).itertuples(index=False):
+            log(f"    {f.file:<50} overlaps by {f.overlap.round('min')}")
+    log("")
+
+
+@spotify_profile.profiled()
+def quality_report(sp_df):
+    """Check the loaded history and print the report."""
+    report = check(sp_df)
+    print(f"\n  {len(sp_df):,} streaming events checked.")
+    print_report(report)
+    return report
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _set(flags, name, condition):
+    flags[np.asarray(condition, dtype=bool)] |= _BIT[name]
+
+
+def _gaps(times, gap_days):
+    """Gaps between consecutive plays longer than `gap_days`, longest first."""
+    valid = times.dropna()
+    if len(valid) < 2:
+        return pd.DataFrame(columns=["start", "end", "days"])
+
+    ns = np.sort(valid.to_numpy(dtype="datetime64[ns]").view("i8"))
+    diff = np.diff(ns)
+    idx = np.flatnonzero(diff > gap_days * 86_400 * 1_000_000_000)
+    gaps = pd.DataFrame({"start": pd.to_datetime(ns[idx], utc=True).tz_convert(times.dt.tz),
+                         "end":   pd.to_datetime(ns[idx + 1], utc=True).tz_convert(times.dt.tz),
+                         "days":  diff[idx] / (86_400 * 1e9)})
+    return gaps.sort_values("days", ascending=False, ignore_index=True)
+
+
+def _files(sp_df):
+    """
+    Per source file time range and how far it reaches back into earlier files.
+    Ranges use the 1st / 99th percentile, so a handful of stray rows (e.g. a
+    duplicated stream) doesn't make a whole file look skewed.
+    """
+    if "source_file" not in sp_df.columns:
+        return pd.DataFrame(columns=["file", "rows", "first", "last", "overlap"])
+
+    grouped = sp_df.groupby("source_file", observed=True)["datetime"]
+    files = pd.DataFrame({"rows":   grouped.size(),
+                          "first":  grouped.quantile(0.01),
+                          "middle": grouped.quantile(0.5),
+                          "last":   grouped.quantile(0.99)})
+    files = (files.rename_axis("file")
+                  .reset_index()
+                  .sort_values("middle", ignore_index=True)
+                  .drop(columns="middle"))
+    latest_before = files["last"].cummax().shift(1)
+    files["overlap"] = (latest_before - files["first"]).fillna(pd.Timedelta(0))
+    return files
@@ -10,9 +10,28 @@
 #     Basic Account Data history  — files named StreamingHistory*.json
 #       columns: endTime, msPlayed, trackName, artistName
 #       (these get renamed to the extended format names on load)
+#
+#   Data can be read from an extracted export directory or straight from the
+#   my_spotify_data.zip archive Spotify delivers (no temp files are written).
+#
+#   After cleaning, split_episodes() separates podcast episode events into a
+#   compact table of their own (analysed by spotify_podcasts.py), so music
+#   analyses only see music.
 
-import pandas as pd
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import spotify_profile
+import spotify_quality
 
 # Column mapping: basic Account Data export → extended history names
 _BASIC_COLUMNS = {
@@ -22,39 +41,291 @@ _BASIC_COLUMNS = {
     "msPlayed":   "ms_played",
 }
 
+# Streaming history files inside a zip archive start with one of these names.
+# Other JSON members (Userdata.json, Playlist1.json, ...) are ignored.
+_HISTORY_PREFIXES = ("endsong", "Streaming_History", "StreamingHistory")
+
+# Columns that only describe a track / only describe a podcast episode.
+# split_episodes() drops each kind from the other kind's table.
+_TRACK_COLUMNS   = ("master_metadata_track_name", "master_metadata_album_artist_name",
+                    "master_metadata_album_album_name", "spotify_track_uri")
+_EPISODE_COLUMNS = ("episode_name", "episode_show_name", "spotify_episode_uri")
+
+# Low-cardinality text columns stored as categoricals in the episode table.
+_EPISODE_CATEGORIES = ("episode_show_name", "platform", "conn_country", "reason_start", "reason_end")
+
+# Columns that identify one stream when the same events appear in several
+# (overlapping) dated exports.
+_DEDUP_COLUMNS = spotify_quality.STREAM_KEY
+
+
+@spotify_profile.profiled()
+def extract_data(file_dir, workers=None, progress=None, log=print):
+    """
+    Load streaming history from an export directory, a my_spotify_data.zip
+    archive, or a list of either (e.g. several dated zips).
+
+    Zip members are decoded in parallel across `workers` processes
+    (default: one per CPU, capped at the number of members). When more than
+    one source is given, events present in several exports are kept once.
+
+    `progress`, if given, is called as progress(files_done, files_found)
+    after each file is read; per-file messages go through `log`.
+
+    Each row's originating file is kept in a categorical `source_file`
+    column (used by the data-quality checks).
+    """
+    sources = [file_dir] if isinstance(file_dir, (str, os.PathLike)) else list(file_dir)
+    tracker = _Progress(progress, log)
+
+    loaded = []
+    for source in sources:
+        source = os.path.expanduser(source)
+        label = os.path.basename(os.path.normpath(source))
+        with spotify_profile.stage("read"):
+            if str(source).lower().endswith(".zip"):
+                files = _read_zip_history(source, workers, tracker)
+            else:
+                files = _read_dir_history(source, tracker)
+        loaded.extend((f"{label}/{name}", df) for name, df in files)
+
+    with spotify_profile.stage("concat"):
+        spotify_df = pd.concat([df for _, df in loaded], ignore_index=True)
+        codes, names = pd.factorize(pd.Index([name for name, _ in loaded]))
+        spotify_df["source_file"] = pd.Categorical.from_codes(
+            np.repeat(codes, [len(df) for _, df in loaded]), categories=names)
+
+    if len(sources) > 1:
+        subset = [c for c in _DEDUP_COLUMNS if c in spotify_df.columns]
+        before = len(spotify_df)
+        with spotify_profile.stage("dedup"):
+            spotify_df = spotify_df.drop_duplicates(subset=subset, ignore_index=True)
+        log(f"Merged {len(sources)} exports — dropped {before - len(spotify_df):,} overlapping rows.")
+
+    return spotify_df
+
+
+@spotify_profile.profiled()
+def clean_data(sp_data, fix=None, log=print):
+    """
+    Add the Count and (UTC) datetime columns, run the data-quality checks
+    and print their report through `log` (default print). Timestamps that
+    can't be parsed become NaT.
+
+    `fix` handles the flagged rows before analysis:
+      None     — report only
+      "drop"   — remove flagged rows (podcast episodes are kept)
+      "repair" — remove duplicates / bad timestamps, clip ms_played
+    """
+    sp_data["Count"] = 1
+    with spotify_profile.stage("timestamp_parse"):
+        # ISO8601 instead of format inference: a combined basic + extended load
+        # mixes "2023-01-01 12:34" and "2023-01-01T12:34:56Z" in one column.
+        sp_data["datetime"] = pd.to_datetime(sp_data["ts"], utc=True, format="ISO8601", errors="coerce")
+
+    log(f"INFO: {sp_data.shape[0]:,} rows, {sp_data.shape[1]} columns")
+    report = spotify_quality.check(sp_data)
+    spotify_quality.print_report(report, log=log)
+
+    if fix:
+        before = len(sp_data)
+        sp_data = spotify_quality.apply_fix(sp_data, report, fix)
+        log(f"INFO: fix='{fix}' — {before - len(sp_data):,} rows removed, {len(sp_data):,} kept")
+
+    return sp_data
+
+
+@spotify_profile.profiled()
+def split_episodes(sp_df, log=print):
+    """
+    Split a cleaned history into (music, episodes).
+
+    Podcast episode rows (see spotify_quality.is_episode) move to a separate,
+    compact table without the track columns; show names and other repeated
+    text are categorical. The music table keeps every other row (so Count,
+    ms_played and stream totals only cover music) and drops the episode
+    columns. spotify_analysis works on the music table, spotify_podcasts
+    on the episode table. The row counts are printed through `log`.
+    """
+    episode = spotify_quality.is_episode(sp_df).to_numpy()
+
+    music = (sp_df.loc[~episode]
+                  .drop(columns=[c for c in _EPISODE_COLUMNS if c in sp_df.columns])
+                  .reset_index(drop=True))
+
+    episodes = (sp_df.loc[episode]
+                     .drop(columns=[c for c in _TRACK_COLUMNS if c in sp_df.columns])
+                     .reset_index(drop=True))
+    for col in _EPISODE_COLUMNS:
+        if col not in episodes.columns:
+            episodes[col] = pd.Series(dtype=object)
+    for col in _EPISODE_CATEGORIES:
+        if col in episodes.columns:
+            episodes[col] = episodes[col].astype("category")
+
+    log(f"INFO: {len(music):,} music events, {len(episodes):,} podcast episode events")
+    return music, episodes
+
+
+def join_episodes(music, episodes):
+    """
+    Inverse of split_episodes: one frame with the music rows followed by the
+    episode rows, for checks that cover the whole history (quality report).
+    """
+    return pd.concat([music, episodes], ignore_index=True)
+
+
+@spotify_profile.profiled("read")
+def read_export_json(file_path, member_name):
+    """
+    Parse a JSON file from a Spotify account export.
+    `file_path` is either the JSON file itself or a zip archive, in which case
+    the member whose file name is `member_name` is read directly from the zip.
+    """
+    file_path = os.path.expanduser(file_path)
+    if not str(file_path).lower().endswith(".zip"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    with zipfile.ZipFile(file_path) as zf:
+        matches = [m for m in zf.namelist() if os.path.basename(m) == member_name]
+        if not matches:
+            raise FileNotFoundError(f"{member_name} not found in archive: {file_path}")
+        # Prefer the shallowest match if the archive nests several exports.
+        member = min(matches, key=lambda m: m.count("/"))
+        return json.loads(zf.read(member).decode("utf-8"))
+
+
+def fingerprint(sp_df):
+    """
+    Short string identifying the loaded history (row count, time range, total
+    ms played). Used to name cache files so they are rebuilt when data changes.
+    """
+    times = sp_df["datetime"]
+    raw = f"{len(sp_df)}|{times.min().value}|{times.max().value}|{int(sp_df['ms_played'].sum())}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
 
-def extract_data(file_dir):
-    file_dir = os.path.expanduser(file_dir)
+# ── Internal helpers ──────────────────────────────────────────────────────────
 
+def _read_dir_history(file_dir, tracker):
+    """Read every .json file in an extracted export directory; returns [(file name, df)]."""
     all_json = [f for f in os.listdir(file_dir) if f.endswith(".json")]
-    print(f"JSON files in directory: {all_json}")
+    tracker.log(f"JSON files in directory: {all_json}")
+    tracker.found(len(all_json))
 
     dfs = []
     for file in all_json:
         try:
-            df = pd.read_json(os.path.join(file_dir, file))
+            df = _normalize(pd.read_json(os.path.join(file_dir, file)), tracker.log)
             if isinstance(df, pd.DataFrame) and not df.empty:
-                dfs.append(df)
-                print(f"  Loaded: {file}  ({len(df):,} rows)")
+                dfs.append((file, df))
+                tracker.log(f"  Loaded: {file}  ({len(df):,} rows)")
         except (ValueError, Exception) as e:
-            print(f"  Skipped: {file}  ({e})")
+            tracker.log(f"  Skipped: {file}  ({e})")
+        tracker.done()
+    return dfs
 
-    spotify_df = pd.concat(dfs, ignore_index=True)
 
-    # Normalize basic-format column names so all analysis functions work
-    # regardless of which export type was used.
-    if "endTime" in spotify_df.columns:
-        print("Detected basic Account Data format — normalizing column names.")
-        spotify_df = spotify_df.rename(columns=_BASIC_COLUMNS)
+def _read_zip_history(zip_path, workers, tracker):
+    """Decode the streaming history members of a zip archive, in parallel; returns [(name, df)]."""
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [m for m in zf.namelist()
+                   if m.endswith(".json")
+                   and os.path.basename(m).startswith(_HISTORY_PREFIXES)]
+    tracker.log(f"JSON history files in {os.path.basename(zip_path)}: "
+                f"{[os.path.basename(m) for m in members]}")
+    if not members:
+        return []
+    tracker.found(len(members))
 
-    return spotify_df
+    workers = workers or min(len(members), os.cpu_count() or 1)
+    results = {}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = {pool.submit(_read_zip_member, zip_path, m): m for m in members}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                tracker.done()
+    else:
+        for m in members:
+            results[m] = _read_zip_member(zip_path, m)
+            tracker.done()
 
+    dfs = []
+    for member in members:
+        df, error, notes = results[member]
+        name = os.path.basename(member)
+        for note in notes:
+            tracker.log(note)
+        if error is not None:
+            tracker.log(f"  Skipped: {name}  ({error})")
+        elif isinstance(df, pd.DataFrame) and not df.empty:
+            dfs.append((name, df))
+            tracker.log(f"  Loaded: {name}  ({len(df):,} rows)")
+    return dfs
 
-def clean_data(sp_data):
-    sp_data["Count"] = 1
-    sp_data["datetime"] = pd.to_datetime(sp_data["ts"], utc=True)
 
-    print(f"INFO: {sp_data.shape[0]:,} rows, {sp_data.shape[1]} columns")
-    print(f"INFO: unique counts:\n{sp_data.nunique()}")
+def _pool_context():
+    """
+    Start method for the decoding processes. Forking a process that runs
+    other threads (the menu's background loader) can deadlock the child, so
+    off the main thread workers are started by forkserver / spawn instead.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return None
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
 
-    return sp_data
+
+def _read_zip_member(zip_path, member):
+    """
+    Worker: read one archive member into a normalized DataFrame.
+    Returns (df, None, notes) on success or (None, error message, notes) so
+    a bad member doesn't abort the whole load; `notes` are messages for the
+    parent to log (workers don't print).
+    """
+    notes = []
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            raw = zf.read(member)
+        return _normalize(pd.read_json(io.BytesIO(raw)), notes.append), None, notes
+    except (ValueError, Exception) as e:
+        return None, str(e), notes
+
+
+class _Progress:
+    """
+    Counts files found / read across all sources and reports to a callback;
+    `log` carries the per-file messages.
+    """
+
+    def __init__(self, callback, log=print):
+        self._callback = callback
+        self.log = log
+        self._found = 0
+        self._done = 0
+
+    def found(self, n):
+        self._found += n
+        self._report()
+
+    def done(self):
+        self._done += 1
+        self._report()
+
+    def _report(self):
+        if self._callback:
+            self._callback(self._done, self._found)
+
+
+def _normalize(df, log=print):
+    """
+    Rename basic-format columns to the extended history names so all analysis
+    functions work regardless of which export type was used. Done per file so
+    basic and extended exports can be combined in one load.
+    """
+    if isinstance(df, pd.DataFrame) and "endTime" in df.columns:
+        log("Detected basic Account Data format — normalizing column names.")
+        df = df.rename(columns=_BASIC_COLUMNS)
+    return df
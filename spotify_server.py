@@ -0,0 +1,248 @@
+# spotify_server.py
+#   Local HTTP/JSON query server that keeps the loaded dataset warm in memory.
+#
+#   Streaming history, playlists and library are loaded once (see
+#   main.load_data); every request then runs against the in-memory frames.
+#   Results are cached per (endpoint, parameters), keeping the CACHE_SIZE
+#   most recently used, and requests are served concurrently, one thread each.
+#   Bad parameters answer 400; an error inside a query answers 500.
+#
+#   Start with:   python main.py --serve [--port 8765]
+#
+#   Endpoints (GET, all return JSON; parameters go in the query string):
+#     /                                   list of endpoints
+#     /analysis/top_songs                 ?num=20&type=Count|ms_played
+#     /analysis/top_artists               ?num=20&type=Count|ms_played
+#     /analysis/uniq_song_from_artist     ?num=20
+#     /analysis/uniq_artist
+#     /analysis/uniq_song
+#     /analysis/year_usage
+#     /analysis/daytime_usage
+#     /analysis/listening_heatmap
+#     /analysis/day_of_week
+#     /analysis/weekday_vs_weekend
+#     /analysis/max_song_day              ?num=20
+#     /analysis/yearly_comparison
+#     /analysis/skip_analysis             ?skip_threshold_ms=30000&num=15
+#     /analysis/listening_summary
+#     /playlists                          all playlists
+#     /playlists/stats
+#     /playlists/tracks                   ?playlist=<number or name>
+#     /library/stats
+#     /library/tracks                     ?artist=<partial name>
+#     /library/liked_vs_streamed          ?num=20
+
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import spotify_analysis
+import spotify_library
+import spotify_playlists
+from spotify_columns import MEASURES
+
+DEFAULT_PORT = 8765
+CACHE_SIZE   = 256   # cached query results kept (least recently used dropped first)
+
+
+class QueryService:
+    """
+    Holds the loaded data and answers named queries with JSON-ready results.
+    Results are cached by (endpoint, parameters) in an LRU of CACHE_SIZE
+    entries; the data never changes while the server runs, so cached entries
+    never go stale.
+    """
+
+    def __init__(self, sp_dt, playlists=None, library=None):
+        self.sp_dt     = sp_dt
+        self.playlists = playlists
+        self.library   = library
+        self._cache    = OrderedDict()
+        self._lock     = threading.Lock()
+
+        # endpoint → (handler, {param: (type, default)}, required dataset)
+        self.routes = {
+            "/analysis/top_songs":
+                (lambda p: spotify_analysis.top_songs_data(self.sp_dt, p["num"], p["type"]),
+                 {"num": (int, 20), "type": (_measure, "Count")}, "history"),
+            "/analysis/top_artists":
+                (lambda p: spotify_analysis.top_artists_data(self.sp_dt, p["num"], p["type"]),
+                 {"num": (int, 20), "type": (_measure, "Count")}, "history"),
+            "/analysis/uniq_song_from_artist":
+                (lambda p: spotify_analysis.uniq_song_from_artist_data(self.sp_dt, p["num"]),
+                 {"num": (int, 20)}, "history"),
+            "/analysis/uniq_artist":
+                (lambda p: spotify_analysis.uniq_artist_data(self.sp_dt), {}, "history"),
+            "/analysis/uniq_song":
+                (lambda p: spotify_analysis.uniq_song_data(self.sp_dt), {}, "history"),
+            "/analysis/year_usage":
+                (lambda p: spotify_analysis.year_usage_data(self.sp_dt), {}, "history"),
+            "/analysis/daytime_usage":
+                (lambda p: spotify_analysis.daytime_usage_data(self.sp_dt), {}, "history"),
+            "/analysis/listening_heatmap":
+                (lambda p: spotify_analysis.listening_heatmap_data(self.sp_dt), {}, "history"),
+            "/analysis/day_of_week":
+                (lambda p: spotify_analysis.day_of_week_data(self.sp_dt), {}, "history"),
+            "/analysis/weekday_vs_weekend":
+                (lambda p: spotify_analysis.weekday_vs_weekend_data(self.sp_dt), {}, "history"),
+            "/analysis/max_song_day":
+                (lambda p: spotify_analysis.max_song_day_data(self.sp_dt).head(p["num"]),
+                 {"num": (int, 20)}, "history"),
+            "/analysis/yearly_comparison":
+                (lambda p: spotify_analysis.yearly_comparison_data(self.sp_dt), {}, "history"),
+            "/analysis/skip_analysis":
+                (lambda p: spotify_analysis.skip_analysis_data(self.sp_dt, p["skip_threshold_ms"], p["num"]),
+                 {"skip_threshold_ms": (int, 30_000), "num": (int, 15)}, "history"),
+            "/analysis/listening_summary":
+                (lambda p: spotify_analysis.listening_summary_data(self.sp_dt), {}, "history"),
+            "/playlists":
+                (lambda p: spotify_playlists.playlist_summary(self.playlists), {}, "playlists"),
+            "/playlists/stats":
+                (lambda p: spotify_playlists.playlist_stats_data(self.playlists), {}, "playlists"),
+            "/playlists/tracks":
+                (lambda p: spotify_playlists.playlist_tracks(self.playlists, p["playlist"]),
+                 {"playlist": (str, None)}, "playlists"),
+            "/library/stats":
+                (lambda p: spotify_library.library_stats_data(self.library), {}, "library"),
+            "/library/tracks":
+                (self._library_tracks, {"artist": (str, "")}, "library"),
+            "/library/liked_vs_streamed":
+                (lambda p: (spotify_library.liked_vs_streamed_data(self.library, self.sp_dt)
+                                           .sort_values("play_count", ascending=False)
+                                           .head(p["num"])),
+                 {"num": (int, 20)}, "library"),
+        }
+
+    def query(self, path, raw_params):
+        """
+        Run the query for `path` with string parameters `raw_params`.
+        Returns (HTTP status, JSON-ready body).
+        """
+        if path in ("", "/"):
+            return 200, {"endpoints": {route: {name: default for name, (_, default) in spec.items()}
+                                       for route, (_, spec, _) in self.routes.items()}}
+        if path not in self.routes:
+            return 404, {"error": f"Unknown endpoint: {path}"}
+
+        handler, spec, needs = self.routes[path]
+        if not self._available(needs):
+            return 503, {"error": f"{needs} data not loaded"}
+
+        params = {}
+        for name, (cast, default) in spec.items():
+            raw = raw_params.get(name)
+            if raw is None or raw == "":
+                if default is None:
+                    return 400, {"error": f"Missing parameter: {name}"}
+                params[name] = default
+                continue
+            try:
+                params[name] = cast(raw)
+            except ValueError:
+                return 400, {"error": f"Invalid value for {name}: {raw!r}"}
+
+        key = (path, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return 200, self._cache[key]
+
+        try:
+            result = handler(params)
+            if result is None:
+                return 404, {"error": "Not found"}
+            body = _to_jsonable(result)
+        except (KeyError, ValueError) as e:
+            return 400, {"error": f"Bad request: {e}"}
+        except Exception as e:
+            return 500, {"error": f"Internal error: {type(e).__name__}: {e}"}
+
+        with self._lock:
+            self._cache[key] = body
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return 200, body
+
+    def _available(self, needs):
+        return {"history":   self.sp_dt is not None,
+                "playlists": self.playlists is not None,
+                "library":   self.library is not None}[needs]
+
+    def _library_tracks(self, p):
+        lib = self.library
+        if p["artist"]:
+            lib = lib[lib["artist"].str.contains(p["artist"], case=False, na=False, regex=False)]
+        return lib[["track", "artist", "album", "uri"]]
+
+
+def serve(sp_dt, playlists=None, library=None, host="127.0.0.1", port=DEFAULT_PORT):
+    """Serve `QueryService` over HTTP until interrupted (Ctrl+C)."""
+    service = QueryService(sp_dt, playlists, library)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, body = service.query(url.path.rstrip("/"), dict(parse_qsl(url.query)))
+            try:
+                payload = json.dumps(body).encode("utf-8")
+            except (TypeError, ValueError) as e:
+                status, payload = 500, json.dumps({"error": f"Internal error: {e}"}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"\n  Serving on http://{host}:{port}/  (Ctrl+C to stop)\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n  Server stopped.\n")
+    finally:
+        server.server_close()
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _measure(raw):
+    """Parse the `type` parameter; only the measures the analyses aggregate are allowed."""
+    if raw not in MEASURES:
+        raise ValueError(raw)
+    return raw
+
+
+def _to_jsonable(obj):
+    """Convert analysis results (frames, series, dicts, numpy values) to plain JSON types."""
+    if obj is pd.NA or obj is pd.NaT or obj is None:
+        return None
+    if isinstance(obj, pd.DataFrame):
+        # Named indexes (track, hour, date, ...) become leading columns;
+        # anonymous row numbers are dropped.
+        df = obj.reset_index() if any(n is not None for n in obj.index.names) else obj
+        return {"columns": [str(c) for c in df.columns],
+                "rows":    [[_to_jsonable(v) for v in row]
+                            for row in df.itertuples(index=False, name=None)]}
+    if isinstance(obj, pd.Series):
+        return _to_jsonable(obj.to_frame(name=obj.name if obj.name is not None else "value"))
+    if isinstance(obj, dict):
+        return {str(k): _to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_jsonable(v) for v in obj]
+    if isinstance(obj, (pd.Timestamp, pd.Timedelta)) or hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and np.isnan(obj):
+        return None
+    return obj
@@ -0,0 +1,284 @@
+# spotify_shared.py
+#   Shared-memory copy of the cleaned streaming history for running analyses
+#   in several worker processes at once.
+#
+#   Passing sp_df to a multiprocessing pool pickles the whole DataFrame into
+#   every worker. SharedDataset instead stores each column once, in
+#   multiprocessing.shared_memory blocks:
+#     numeric / bool columns  — raw numpy buffer
+#     datetime columns        — UTC int64 buffer (+ timezone name)
+#     string columns          — dictionary-encoded: integer codes, plus the
+#                               distinct values as one UTF-8 buffer and
+#                               their offsets
+#   The handle passed to workers only names the blocks, so nothing scales
+#   with the data when a worker starts. Workers attach by block name and
+#   rebuild a read-only DataFrame on top of the shared buffers: numeric,
+#   datetime and code arrays are used in place; only the distinct strings
+#   are decoded once per worker (string columns come back as categoricals).
+#
+#   analysis_report() is the main user: it runs every spotify_analysis
+#   *_data function in a process pool over one shared copy and writes the
+#   results as CSV files (python main.py --report DIR).
+#
+#   Usage from code:
+#       with spotify_shared.SharedDataset.create(sp_dt) as shared:
+#           results = spotify_shared.run_parallel(shared, [
+#               (my_analysis, {"num": 20}),
+#               (other_analysis, {}),
+#           ])
+#
+#   Task functions must be defined at module level (so they can be pickled)
+#   and should return data rather than draw charts.
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import spotify_analysis
+import spotify_profile
+
+# (name, *_data function, kwargs) run by analysis_report(). `num` is filled
+# in for the functions that take it.
+REPORT_ANALYSES = [
+    ("summary",                 spotify_analysis.listening_summary_data,       {}),
+    ("top_songs_plays",         spotify_analysis.top_songs_data,               {"type": "Count"}),
+    ("top_songs_hours",         spotify_analysis.top_songs_data,               {"type": "ms_played"}),
+    ("top_artists_plays",       spotify_analysis.top_artists_data,             {"type": "Count"}),
+    ("top_artists_hours",       spotify_analysis.top_artists_data,             {"type": "ms_played"}),
+    ("unique_songs_per_artist", spotify_analysis.uniq_song_from_artist_data,   {}),
+    ("unique_artists",          spotify_analysis.uniq_artist_data,             {}),
+    ("unique_songs",            spotify_analysis.uniq_song_data,               {}),
+    ("monthly",                 spotify_analysis.year_usage_data,              {}),
+    ("hourly",                  spotify_analysis.daytime_usage_data,           {}),
+    ("heatmap",                 spotify_analysis.listening_heatmap_data,       {}),
+    ("day_of_week",             spotify_analysis.day_of_week_data,             {}),
+    ("weekday_vs_weekend",      spotify_analysis.weekday_vs_weekend_data,      {}),
+    ("songs_per_day",           spotify_analysis.max_song_day_data,            {}),
+    ("yearly",                  spotify_analysis.yearly_comparison_data,       {}),
+    ("cumulative",              spotify_analysis.cumulative_listening_data,    {}),
+    ("skips",                   spotify_analysis.skip_analysis_data,           {}),
+]
+_TAKES_NUM = {"top_songs_data", "top_artists_data", "uniq_song_from_artist_data", "skip_analysis_data"}
+
+# Raw columns the analyses never read (ts is parsed into datetime at load).
+_REPORT_SKIP = ("ts",)
+
+
+class SharedDataset:
+    """
+    Columnar streaming history held in shared memory.
+    Create it once in the parent with `create()`, hand `handle` to workers,
+    and call `attach(handle)` there. The creating process owns the blocks and
+    frees them on `close()` (or when used as a context manager).
+    """
+
+    def __init__(self, handle, blocks, owner):
+        self.handle = handle
+        self._blocks = blocks
+        self._owner = owner
+        self._frame = None
+
+    @classmethod
+    def create(cls, sp_df, columns=None):
+        """Copy `sp_df` (or just `columns` of it) into shared memory. Returns the owning SharedDataset."""
+        meta_columns = []
+        blocks = {}
+        try:
+            for name in (sp_df.columns if columns is None else columns):
+                parts, meta = _encode_column(sp_df[name])
+                meta.update(name=name, parts={})
+                for part, array in parts.items():
+                    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                    blocks[block.name] = block
+                    meta["parts"][part] = {"block": block.name, "dtype": array.dtype.str,
+                                           "length": len(array)}
+                meta_columns.append(meta)
+        except Exception:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+            raise
+
+        handle = {"columns": meta_columns, "rows": len(sp_df)}
+        return cls(handle, blocks, owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        """Attach to blocks created by another process (no data is copied)."""
+        blocks = {part["block"]: _attach_block(part["block"])
+                  for col in handle["columns"] for part in col["parts"].values()}
+        return cls(handle, blocks, owner=False)
+
+    @property
+    def nbytes(self):
+        """Total size of the shared buffers."""
+        return sum(block.size for block in self._blocks.values())
+
+    def to_frame(self):
+        """
+        Return a DataFrame backed directly by the shared buffers.
+        The underlying arrays are read-only; derive new columns on a copy.
+        """
+        if self._frame is None:
+            data = {}
+            for col in self.handle["columns"]:
+                parts = {}
+                for part, info in col["parts"].items():
+                    array = np.ndarray((info["length"],), dtype=np.dtype(info["dtype"]),
+                                       buffer=self._blocks[info["block"]].buf)
+                    array.flags.writeable = False
+                    parts[part] = array
+                data[col["name"]] = _decode_column(parts, col)
+            self._frame = pd.DataFrame(data, copy=False)
+        return self._frame
+
+    def close(self):
+        """Detach from the blocks; the owner also frees them."""
+        self._frame = None
+        for block in self._blocks.values():
+            if self._owner:
+                block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                pass   # a frame from to_frame() is still in use; the mapping goes with it
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_parallel(dataset, tasks, workers=None):
+    """
+    Run `tasks` — a list of (func, kwargs) pairs — in a process pool where
+    every worker attaches to `dataset` once and calls func(sp_df, **kwargs).
+    Returns the results in task order.
+    """
+    workers = workers or min(len(tasks), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(dataset.handle,)) as pool:
+        futures = [pool.submit(_run_task, func, kwargs) for func, kwargs in tasks]
+        return [f.result() for f in futures]
+
+
+@spotify_profile.profiled()
+def analysis_report(sp_df, output_dir="analysis_report", num=20, workers=None):
+    """
+    Run every analysis in REPORT_ANALYSES in parallel over one shared copy of
+    `sp_df` and write each result to `output_dir`/<name>.csv. Dict results
+    are split into one row of scalars (<name>.csv) and one file per table
+    (<name>_<key>.csv). Returns {name: result}.
+    """
+    tasks = [(func, {**kwargs, **({"num": num} if func.__name__ in _TAKES_NUM else {})})
+             for _, func, kwargs in REPORT_ANALYSES]
+    columns = [c for c in sp_df.columns if c not in _REPORT_SKIP]
+    with SharedDataset.create(sp_df, columns) as shared:
+        results = run_parallel(shared, tasks, workers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    report = {}
+    for (name, _, _), result in zip(REPORT_ANALYSES, results):
+        _write_result(output_dir, name, result)
+        report[name] = result
+    print(f"  {len(report)} analyses written to '{output_dir}/'")
+    return report
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+_worker_dataset = None
+
+
+def _init_worker(handle):
+    global _worker_dataset
+    _worker_dataset = SharedDataset.attach(handle)
+
+
+def _run_task(func, kwargs):
+    return func(_worker_dataset.to_frame(), **kwargs)
+
+
+def _attach_block(name):
+    """
+    Open an existing block. On Python 3.13+ the block is not registered with
+    this process's resource tracker, so a worker exiting never unlinks blocks
+    the parent still owns. (Older versions share the parent's tracker when
+    the worker comes from our own pool, which is equally safe.)
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _encode_column(series):
+    """Return ({part: numpy array to share}, metadata needed to rebuild the column)."""
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        utc = series.to_numpy(dtype=f"datetime64[{series.dtype.unit}]")
+        return {"values": utc.view("i8")}, {"kind": "datetime", "unit": series.dtype.unit,
+                                            "tz": str(series.dt.tz)}
+
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        return {"values": series.to_numpy()}, {"kind": "numeric"}
+
+    if (pd.api.types.is_numeric_dtype(series.dtype)
+            and not pd.api.types.is_extension_array_dtype(series.dtype)):
+        return {"values": series.to_numpy()}, {"kind": "numeric"}
+
+    # Everything else (strings, mixed objects, nullable bools) is
+    # dictionary-encoded. Codes use the same width pandas picks for a
+    # Categorical of this size so from_codes() doesn't have to re-cast.
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    codes = codes.astype(_code_dtype(len(uniques)), copy=False)
+    if all(isinstance(u, str) for u in uniques):
+        encoded = [u.encode("utf-8") for u in uniques]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        chars = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return {"codes": codes, "chars": chars, "offsets": offsets}, {"kind": "strings"}
+    # A handful of non-string values (e.g. nullable booleans) travel in the handle.
+    return {"codes": codes}, {"kind": "codes", "categories": list(uniques)}
+
+
+def _decode_column(parts, col):
+    if col["kind"] == "datetime":
+        dtype = pd.DatetimeTZDtype(col["unit"], col["tz"])
+        # int64 → tz-aware reads the values as UTC instants and keeps the buffer.
+        return pd.array(parts["values"], dtype=dtype, copy=False)
+    if col["kind"] == "strings":
+        chars, offsets = parts["chars"].tobytes(), parts["offsets"]
+        categories = [chars[offsets[i]:offsets[i + 1]].decode("utf-8")
+                      for i in range(len(offsets) - 1)]
+        return pd.Categorical.from_codes(parts["codes"], categories=categories, validate=False)
+    if col["kind"] == "codes":
+        return pd.Categorical.from_codes(parts["codes"], categories=col["categories"],
+                                         validate=False)
+    return parts["values"]
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _write_result(output_dir, name, result):
+    """Write one analysis result (DataFrame, Series or dict of scalars / tables) as CSV."""
+    if isinstance(result, dict):
+        tables = {k: v for k, v in result.items() if isinstance(v, (pd.DataFrame, pd.Series))}
+        scalars = {k: v for k, v in result.items() if k not in tables}
+        if scalars:
+            pd.DataFrame([scalars]).to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+        for key, table in tables.items():
+            _write_result(output_dir, f"{name}_{key}", table)
+        return
+    result.to_csv(os.path.join(output_dir, f"{name}.csv"))
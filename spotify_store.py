@@ -0,0 +1,405 @@
+# spotify_store.py
+#   Optional SQLite store for the streaming history, playlists and library.
+#
+#   build_store() writes everything into one local database file:
+#     streams          one row per music event (UTC and local epoch seconds,
+#                      ms, track / artist / URIs, context columns)
+#     episodes         one row per podcast episode event (same layout with
+#                      episode / show / URI instead of the track columns)
+#     playlist_items   one row per playlist track
+#     library          one row per liked track
+#     agg_track, agg_artist, agg_track_artist, agg_daily, agg_hour_dow
+#                      aggregate tables materialized at build time
+#     meta             timezone, fingerprint, row count, build time
+#   with indexes on streams(ts), streams(track, artist), streams(artist),
+#   streams(track_uri), episodes(show_name), playlist_items(uri) and library(uri).
+#
+#   SQLiteStore can be passed to the spotify_analysis functions in place of
+#   the DataFrame: every *_data() function is decorated with @pushdown and
+#   runs its grouping / filtering as SQL against the store instead, mostly
+#   on the small aggregate tables. Opening a store is instant and memory
+#   stays bounded by the query results. Analyses that need the raw events
+#   (co-listening, pivots, ...) can still get them via SQLiteStore.frame(),
+#   and podcast analyses via SQLiteStore.episodes().
+#
+#   Local time (hour of day, weekday, day) is fixed at build time to the
+#   timezone the history was converted to, or to each event's local_time
+#   (spotify_localtime) when set; rebuild after changing either.
+
+import functools
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import spotify_localtime
+import spotify_playlists
+import spotify_profile
+import spotify_scraper
+from spotify_columns import ARTIST_COL, TRACK_COL, MEASURES, MS_TO_HOURS
+
+SCHEMA_VERSION = 2
+
+# store column → streaming history column
+_TRACK_COLUMNS = {
+    "track":          TRACK_COL,
+    "artist":         ARTIST_COL,
+    "album":          "master_metadata_album_album_name",
+    "track_uri":      "spotify_track_uri",
+}
+_EPISODE_COLUMNS = {
+    "episode_name":   "episode_name",
+    "show_name":      "episode_show_name",
+    "episode_uri":    "spotify_episode_uri",
+}
+_CONTEXT_COLUMNS = {
+    "platform":       "platform",
+    "conn_country":   "conn_country",
+    "reason_start":   "reason_start",
+    "reason_end":     "reason_end",
+    "shuffle":        "shuffle",
+    "skipped":        "skipped",
+    "offline":        "offline",
+    "incognito_mode": "incognito_mode",
+}
+_STREAM_COLUMNS      = {**_TRACK_COLUMNS, **_CONTEXT_COLUMNS}
+_EPISODE_ROW_COLUMNS = {**_EPISODE_COLUMNS, **_CONTEXT_COLUMNS}
+_FLAG_COLUMNS = ("shuffle", "skipped", "offline", "incognito_mode")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE streams (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER,                 -- UTC, epoch seconds
+    local_ts INTEGER,           -- local wall time, epoch seconds
+    ms_played INTEGER,
+    track TEXT, artist TEXT, album TEXT, track_uri TEXT,
+    platform TEXT, conn_country TEXT, reason_start TEXT, reason_end TEXT,
+    shuffle INTEGER, skipped INTEGER, offline INTEGER, incognito_mode INTEGER
+);
+CREATE TABLE episodes (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER,
+    local_ts INTEGER,
+    ms_played INTEGER,
+    episode_name TEXT, show_name TEXT, episode_uri TEXT,
+    platform TEXT, conn_country TEXT, reason_start TEXT, reason_end TEXT,
+    shuffle INTEGER, skipped INTEGER, offline INTEGER, incognito_mode INTEGER
+);
+CREATE TABLE playlist_items (
+    playlist_no INTEGER, playlist TEXT, track TEXT, artist TEXT, uri TEXT, added_date TEXT
+);
+CREATE TABLE library (track TEXT, artist TEXT, album TEXT, uri TEXT);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_streams_ts           ON streams (ts);
+CREATE INDEX idx_streams_track        ON streams (track, artist);
+CREATE INDEX idx_streams_artist       ON streams (artist);
+CREATE INDEX idx_streams_track_uri    ON streams (track_uri);
+CREATE INDEX idx_episodes_show        ON episodes (show_name);
+CREATE INDEX idx_playlist_items_uri   ON playlist_items (uri);
+CREATE INDEX idx_library_uri          ON library (uri);
+"""
+
+_AGGREGATES = """
+CREATE TABLE agg_track AS
+    SELECT track, COUNT(*) AS plays, SUM(ms_played) AS ms_played
+    FROM streams WHERE track IS NOT NULL GROUP BY track;
+CREATE TABLE agg_artist AS
+    SELECT artist, COUNT(*) AS plays, SUM(ms_played) AS ms_played
+    FROM streams WHERE artist IS NOT NULL GROUP BY artist;
+CREATE TABLE agg_track_artist AS
+    SELECT artist, track, COUNT(*) AS plays, SUM(ms_played) AS ms_played
+    FROM streams WHERE artist IS NOT NULL AND track IS NOT NULL GROUP BY artist, track;
+CREATE TABLE agg_daily AS
+    SELECT date(local_ts, 'unixepoch') AS day, COUNT(*) AS plays, SUM(ms_played) AS ms_played
+    FROM streams WHERE local_ts IS NOT NULL GROUP BY day;
+CREATE TABLE agg_hour_dow AS
+    SELECT CAST(strftime('%w', local_ts, 'unixepoch') AS INTEGER) AS dow,
+           CAST(strftime('%H', local_ts, 'unixepoch') AS INTEGER) AS hour,
+           COUNT(*) AS plays
+    FROM streams WHERE local_ts IS NOT NULL GROUP BY dow, hour;
+CREATE INDEX idx_agg_track_plays  ON agg_track (plays);
+CREATE INDEX idx_agg_artist_plays ON agg_artist (plays);
+"""
+
+_DAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday",
+              "Friday", "Saturday", "Sunday"]
+_SQLITE_DOW = ["Sunday", "Monday", "Tuesday", "Wednesday",        # strftime('%w')
+               "Thursday", "Friday", "Saturday"]
+
+
+@spotify_profile.profiled()
+def build_store(path, sp_df, playlists=None, library=None, episodes=None):
+    """
+    Write the cleaned music history (plus optional playlists / library
+    DataFrame and podcast episode table from spotify_scraper.split_episodes())
+    to a new SQLite database at `path`, replacing any existing file.
+    The file is written under a temporary name and moved into place at the end.
+    """
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(_SCHEMA)
+        with spotify_profile.stage("streams"):
+            _event_rows(sp_df, _STREAM_COLUMNS).to_sql("streams", conn, if_exists="append",
+                                                       index=False, chunksize=100_000)
+        if episodes is not None:
+            _event_rows(episodes, _EPISODE_ROW_COLUMNS).to_sql("episodes", conn, if_exists="append",
+                                                               index=False, chunksize=100_000)
+        if playlists is not None:
+            spotify_playlists.playlist_items_table(playlists).to_sql(
+                "playlist_items", conn, if_exists="append", index=False)
+        if library is not None:
+            library[["track", "artist", "album", "uri"]].to_sql(
+                "library", conn, if_exists="append", index=False)
+
+        with spotify_profile.stage("indexes"):
+            conn.executescript(_INDEXES)
+        with spotify_profile.stage("aggregates"):
+            conn.executescript(_AGGREGATES)
+
+        meta = {"schema_version": SCHEMA_VERSION,
+                "timezone":       str(sp_df["datetime"].dt.tz),
+                "local_time":     "per-event" if spotify_localtime.LOCAL_COL in sp_df.columns else "fixed",
+                "fingerprint":    spotify_scraper.fingerprint(sp_df),
+                "rows":           len(sp_df),
+                "episodes":       0 if episodes is None else len(episodes),
+                "ms_played":      int(sp_df["ms_played"].sum()),
+                "built_at":       time.strftime("%Y-%m-%d %H:%M:%S")}
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, path)
+    print(f"  SQLite store written to '{path}' ({len(sp_df):,} streams)")
+
+
+def pushdown(func):
+    """
+    Decorator for spotify_analysis *_data functions: when called with a
+    SQLiteStore instead of a DataFrame, run the store's method of the same
+    name (the SQL version) instead.
+    """
+    @functools.wraps(func)
+    def wrapper(sp_df, *args, **kwargs):
+        if isinstance(sp_df, SQLiteStore):
+            return getattr(sp_df, func.__name__)(*args, **kwargs)
+        return func(sp_df, *args, **kwargs)
+    return wrapper
+
+
+class SQLiteStore:
+    """
+    Read-only view of a database written by build_store(). Methods mirror
+    the spotify_analysis *_data functions and return the same shapes.
+    """
+
+    def __init__(self, path):
+        path = os.path.expanduser(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"SQLite store not found: {path}")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if int(self.meta.get("schema_version", 0)) != SCHEMA_VERSION:
+            raise ValueError(f"{path} was written by a different version; rebuild it.")
+        self.timezone = self.meta["timezone"]
+        self._frame = None
+        self._episodes = None
+
+    def __len__(self):
+        return int(self.meta["rows"])
+
+    def query(self, sql, params=()):
+        """Run any SELECT against the store; returns a DataFrame."""
+        return pd.read_sql_query(sql, self._conn, params=params)
+
+    def close(self):
+        self._conn.close()
+
+    @spotify_profile.profiled("store_frame")
+    def frame(self):
+        """
+        The streaming history as a cleaned DataFrame (same columns as
+        clean_data() output, minus `ts`), loaded once and cached.
+        """
+        if self._frame is None:
+            self._frame = self._events("streams", _STREAM_COLUMNS)
+        return self._frame
+
+    @spotify_profile.profiled("store_episodes")
+    def episodes(self):
+        """The podcast episode table (as from spotify_scraper.split_episodes()), loaded once and cached."""
+        if self._episodes is None:
+            episodes = self._events("episodes", _EPISODE_ROW_COLUMNS)
+            for col in ("episode_show_name", "platform", "conn_country", "reason_start", "reason_end"):
+                episodes[col] = episodes[col].astype("category")
+            self._episodes = episodes
+        return self._episodes
+
+    def _events(self, table, columns):
+        df = self.query(f"SELECT ts, local_ts, ms_played, {', '.join(columns)} FROM {table} ORDER BY id")
+        for col in _FLAG_COLUMNS:
+            df[col] = df[col].map({1: True, 0: False})
+        df = df.rename(columns=columns)
+        df["datetime"] = pd.to_datetime(df.pop("ts"), unit="s", utc=True).dt.tz_convert(self.timezone)
+        local = pd.to_datetime(df.pop("local_ts"), unit="s")
+        if self.meta.get("local_time") == "per-event":
+            df[spotify_localtime.LOCAL_COL] = local
+        df["Count"] = 1
+        return df
+
+    # ── spotify_analysis *_data equivalents ───────────────────────────────────
+
+    def top_songs_data(self, num=20, type="Count"):
+        return self._top("agg_track", "track", TRACK_COL, num, type)
+
+    def top_artists_data(self, num=20, type="Count"):
+        return self._top("agg_artist", "artist", ARTIST_COL, num, type)
+
+    def uniq_artist_data(self):
+        unique, total = self._conn.execute("SELECT COUNT(*), SUM(plays) FROM agg_artist").fetchone()
+        return {"unique": int(unique), "total": int(total or 0)}
+
+    def uniq_song_data(self):
+        unique, total = self._conn.execute("SELECT COUNT(*), SUM(plays) FROM agg_track").fetchone()
+        return {"unique": int(unique), "total": int(total or 0)}
+
+    def uniq_song_from_artist_data(self, num=20, type="Count"):
+        top = self.top_artists_data(num, type).index
+        counts = self.query(f"SELECT artist, COUNT(*) AS unique_songs FROM agg_track_artist "
+                            f"WHERE artist IN ({', '.join('?' * len(top))}) GROUP BY artist",
+                            tuple(top))
+        return (counts.set_index("artist")["unique_songs"]
+                      .rename_axis(ARTIST_COL)
+                      .reindex(top))
+
+    def daytime_usage_data(self):
+        hourly = self.query("SELECT hour, SUM(plays) AS Count FROM agg_hour_dow GROUP BY hour")
+        return (hourly.set_index("hour")["Count"]
+                      .reindex(range(24), fill_value=0))
+
+    def listening_heatmap_data(self):
+        cells = self.query("SELECT dow, hour, plays FROM agg_hour_dow")
+        cells["day_of_week"] = np.array(_SQLITE_DOW)[cells["dow"]]
+        cells["hour"] = cells["hour"].astype(np.int32)       # as .dt.hour
+        return (cells.set_index(["day_of_week", "hour"])["plays"]
+                     .rename("Count")
+                     .unstack(fill_value=0)
+                     .reindex(_DAY_ORDER))
+
+    def year_usage_data(self):
+        monthly = self.query("SELECT CAST(substr(day, 6, 2) AS INTEGER) AS month, SUM(plays) AS Count "
+                             "FROM agg_daily GROUP BY month")
+        return (monthly.set_index("month")["Count"]
+                       .reindex(range(1, 13), fill_value=0))
+
+    def yearly_comparison_data(self):
+        yearly = self.query("SELECT CAST(substr(day, 1, 4) AS INTEGER) AS year, "
+                            "SUM(plays) AS plays, SUM(ms_played) AS hours "
+                            "FROM agg_daily GROUP BY year ORDER BY year")
+        yearly["year"]  = yearly["year"].astype(np.int32)    # as .dt.year
+        yearly["hours"] = yearly["hours"] * MS_TO_HOURS
+        return yearly
+
+    def max_song_day_data(self):
+        daily = self.query("SELECT day, plays AS Count FROM agg_daily ORDER BY plays DESC, day")
+        daily["date"] = pd.to_datetime(daily.pop("day")).dt.date
+        return daily.set_index("date")
+
+    def cumulative_listening_data(self):
+        # One row per event like the pandas version; equal times keep load order (id).
+        events = self.query("SELECT ts, SUM(ms_played) OVER (ORDER BY ts IS NULL, ts, id) AS total "
+                            "FROM streams ORDER BY ts IS NULL, ts, id")
+        return pd.DataFrame({"datetime": pd.to_datetime(events["ts"], unit="s", utc=True)
+                                           .dt.tz_convert(self.timezone),
+                             "cumulative_hours": events["total"] * MS_TO_HOURS})
+
+    def skip_analysis_data(self, skip_threshold_ms=30_000, num=15):
+        skipped, total = self._conn.execute(
+            "SELECT SUM(ms_played < ?), COUNT(*) FROM streams", (skip_threshold_ms,)).fetchone()
+        top = self.query("SELECT track, COUNT(*) AS Count FROM streams "
+                         "WHERE ms_played < ? AND track IS NOT NULL "
+                         "GROUP BY track ORDER BY Count DESC, track LIMIT ?", (skip_threshold_ms, num))
+        return {"played":      int(total - (skipped or 0)),
+                "skipped":     int(skipped or 0),
+                "top_skipped": top.set_index("track")["Count"].rename_axis(TRACK_COL)}
+
+    def listening_summary_data(self):
+        first, last = self._conn.execute("SELECT MIN(ts), MAX(ts) FROM streams").fetchone()
+        first_date = pd.Timestamp(first, unit="s", tz="UTC").tz_convert(self.timezone)
+        last_date  = pd.Timestamp(last, unit="s", tz="UTC").tz_convert(self.timezone)
+        days_span  = max((last_date - first_date).days, 1)
+        rows = len(self)
+        return {"first_date":     first_date,
+                "last_date":      last_date,
+                "days_span":      days_span,
+                "total_streams":  rows,
+                "total_hours":    float(int(self.meta["ms_played"]) * MS_TO_HOURS),
+                "avg_per_day":    rows / days_span,
+                "unique_artists": self._scalar("SELECT COUNT(*) FROM agg_artist"),
+                "unique_tracks":  self._scalar("SELECT COUNT(*) FROM agg_track")}
+
+    def day_of_week_data(self):
+        daily = self.query("SELECT dow, SUM(plays) AS Count FROM agg_hour_dow GROUP BY dow")
+        daily["day_name"] = np.array(_SQLITE_DOW)[daily["dow"]]
+        return (daily.set_index("day_name")["Count"]
+                     .reindex(_DAY_ORDER, fill_value=0))
+
+    def weekday_vs_weekend_data(self):
+        summary = self.query("SELECT dow IN (0, 6) AS is_weekend, SUM(plays) AS Count "
+                             "FROM agg_hour_dow GROUP BY is_weekend ORDER BY is_weekend")
+        summary["is_weekend"] = summary["is_weekend"].astype(bool)
+        summary["label"] = summary["is_weekend"].map({False: "Weekday", True: "Weekend"})
+        summary["pct"]   = summary["Count"] / summary["Count"].sum() * 100
+        return summary
+
+    # ── helpers ───────────────────────────────────────────────────────────────
+
+    def _top(self, table, key, index_name, num, type):
+        # `type` becomes a column alias in the SQL, so only known measures pass.
+        if type not in MEASURES:
+            raise ValueError(f"Unknown type '{type}'. Choose from: {', '.join(MEASURES)}")
+        column = "plays" if type == "Count" else "ms_played"
+        top = self.query(f"SELECT {key}, {column} AS {type} FROM {table} "
+                         f"ORDER BY {column} DESC, {key} LIMIT ?", (num,))
+        return top.set_index(key).rename_axis(index_name)
+
+    def _scalar(self, sql, params=()):
+        return int(self._conn.execute(sql, params).fetchone()[0])
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _event_rows(sp_df, columns):
+    """The `streams` / `episodes` table rows for a cleaned history / episode frame."""
+    times = sp_df["datetime"]
+    utc = times.dt.tz_convert("UTC").dt.tz_localize(None)
+    wall = spotify_localtime.wall_clock(sp_df)
+    local = wall.dt.tz_localize(None) if wall.dt.tz is not None else wall
+    rows = pd.DataFrame({"ts":        _epoch_seconds(utc),
+                         "local_ts":  _epoch_seconds(local),
+                         "ms_played": sp_df["ms_played"]})
+    for column, source in columns.items():
+        if source not in sp_df.columns:
+            continue
+        rows[column] = sp_df[source]
+        if column in _FLAG_COLUMNS:
+            rows[column] = rows[column].astype("boolean").astype("Int64")
+    return rows
+
+
+def _epoch_seconds(naive_times):
+    seconds = pd.array(naive_times.to_numpy(dtype="datetime64[s]").astype(np.int64), dtype="Int64")
+    seconds[naive_times.isna().to_numpy()] = pd.NA
+    return seconds
@@ -0,0 +1,169 @@
+# spotify_table.py
+#   Paged table output for large libraries and playlists.
+#
+#   TableView keeps a reference to the source DataFrame (no copy) plus an
+#   integer array of the row positions currently in view. Filtering and
+#   sorting only rebuild that position array; showing a page formats just
+#   the rows on that page, one column at a time with vectorized string ops.
+#   Opening a 50k-row table and paging through it therefore costs the same
+#   as a 25-row one.
+#
+#   Columns are given as (column, header, width) tuples; numeric columns are
+#   right-aligned with thousands separators, everything else is left-aligned
+#   and cut to the column width.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZE = 25
+
+_PAGER_HELP = ("  [Enter/n] next  [p] prev  [g N] go to page  [s col] sort  [s col desc]  "
+               "[f text] filter  [c] clear  [q] quit")
+
+
+class TableView:
+    """Sorted / filtered / paged view over columns of a DataFrame."""
+
+    def __init__(self, df, columns, page_size=PAGE_SIZE, filter_columns=None):
+        """
+        `columns`        — list of (column, header, width) to display.
+        `filter_columns` — columns searched by filter(); defaults to all
+                           displayed text columns.
+        """
+        self._df        = df
+        self.columns    = columns
+        self.page_size  = page_size
+        self._filter_columns = filter_columns or [c for c, _, _ in columns
+                                                 if not pd.api.types.is_numeric_dtype(df[c])]
+        self._positions = np.arange(len(df))
+        self._filter    = None
+        self._sort      = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(len(self) / self.page_size))
+
+    def filter(self, text):
+        """Keep rows where any filter column contains `text` (case-insensitive). Empty clears."""
+        self._filter = text or None
+        self._refresh()
+
+    def sort(self, column, descending=False):
+        """Order rows by `column` (text compares case-insensitively). None restores source order."""
+        if column is not None and column not in self._df.columns:
+            raise KeyError(column)
+        self._sort = (column, descending) if column else None
+        self._refresh()
+
+    def page_lines(self, page):
+        """Formatted lines (header, rule, rows) for 1-based `page`."""
+        page  = min(max(page, 1), self.pages)
+        start = (page - 1) * self.page_size
+        pos   = self._positions[start:start + self.page_size]
+        rows  = self._df.iloc[pos]
+
+        numbers = pd.Series(np.arange(start + 1, start + len(pos) + 1), index=rows.index)
+        line = "  " + numbers.astype(str).str.pad(5, side="right") + " "
+        header = f"  {'#':<5} "
+        for column, title, width in self.columns:
+            line = line + _format_column(rows[column], width) + " "
+            header += f"{title:<{width}} " if not _is_numeric(rows[column]) else f"{title:>{width}} "
+
+        rule = "  " + "─" * (len(header) - 2)
+        return [header.rstrip(), rule] + [l.rstrip() for l in line.tolist()]
+
+    def show(self, page=1):
+        """Print one page followed by a position footer."""
+        for l in self.page_lines(page):
+            print(l)
+        page = min(max(page, 1), self.pages)
+        shown = f"filter '{self._filter}' — " if self._filter else ""
+        print(f"\n  Page {page}/{self.pages}  ({shown}{len(self):,} rows)")
+
+    def _refresh(self):
+        positions = np.arange(len(self._df))
+        if self._filter:
+            mask = np.zeros(len(self._df), dtype=bool)
+            for column in self._filter_columns:
+                mask |= (self._df[column].astype(str)
+                                         .str.contains(self._filter, case=False, regex=False)
+                                         .to_numpy(dtype=bool, na_value=False))
+            positions = np.flatnonzero(mask)
+
+        if self._sort:
+            column, descending = self._sort
+            values = self._df[column].iloc[positions].reset_index(drop=True)
+            key = (lambda s: s.str.lower()) if not _is_numeric(values) else None
+            order = values.sort_values(ascending=not descending, kind="stable",
+                                       na_position="last", key=key).index.to_numpy()
+            positions = positions[order]
+
+        self._positions = positions
+
+
+def print_table(df, columns):
+    """Print every row of `df` at once (vectorized); for short tables such as top-N lists."""
+    view = TableView(df, columns, page_size=max(len(df), 1))
+    for l in view.page_lines(1):
+        print(l)
+
+
+def browse(view):
+    """Interactive pager over a TableView."""
+    page = 1
+    sortable = {title.lower(): column for column, title, _ in view.columns}
+    while True:
+        view.show(page)
+        print(_PAGER_HELP)
+        cmd = input("  > ").strip()
+        action, _, arg = cmd.partition(" ")
+        action = action.lower()
+
+        if action in ("", "n"):
+            if page >= view.pages:
+                break
+            page += 1
+        elif action == "p":
+            page = max(1, page - 1)
+        elif action == "g" and arg.strip().isdigit():
+            page = min(max(1, int(arg)), view.pages)
+        elif action == "s":
+            name, _, order = arg.strip().lower().partition(" ")
+            if name not in sortable:
+                print(f"  Sort by one of: {', '.join(sortable)}")
+                continue
+            view.sort(sortable[name], descending=order.strip() == "desc")
+            page = 1
+        elif action == "f":
+            view.filter(arg.strip())
+            page = 1
+        elif action == "c":
+            view.filter("")
+            view.sort(None)
+            page = 1
+        elif action == "q":
+            break
+    print()
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _format_column(values, width):
+    """Format one page of a column as fixed-width strings, vectorized."""
+    if _is_numeric(values):
+        if pd.api.types.is_integer_dtype(values):
+            text = values.map("{:,}".format)
+        else:
+            text = values.map("{:,.1f}".format)
+        return text.str.pad(width, side="left")
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    return text.str.slice(0, width - 2).str.pad(width, side="right")
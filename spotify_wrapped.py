@@ -0,0 +1,157 @@
+# spotify_wrapped.py
+#   Year-in-review ("Wrapped") report for every year in the streaming history.
+#
+#   Instead of slicing the frame per year and running top_songs / top_artists
+#   / max_song_day on each slice, every metric is computed for all years
+#   together: one groupby on (year, key) per dimension, then a per-year rank.
+#   Runtime is therefore roughly that of a single year's report, however
+#   many years the history covers.
+#
+#   Report bundle written by write_wrapped():
+#     summary.csv      one row per year: plays, hours, unique tracks/artists,
+#                      new artists discovered, busiest day
+#     top_songs.csv    year, rank, track, plays, hours
+#     top_artists.csv  year, rank, artist, plays, hours
+#     new_artists.csv  year, rank, artist, plays  (artists first heard that year)
+#     wrapped.md       the same, as a readable per-year report
+
+import os
+
+import pandas as pd
+
+import spotify_localtime
+import spotify_profile
+from spotify_columns import ARTIST_COL, TRACK_COL, MS_TO_HOURS
+
+
+@spotify_profile.profiled()
+def wrapped_data(sp_df, num=10):
+    """
+    Compute every year's Wrapped at once.
+    Returns dict of DataFrames: "summary", "top_songs", "top_artists", "new_artists".
+    """
+    times = spotify_localtime.wall_clock(sp_df)
+    df = pd.DataFrame({"year":      times.dt.year,
+                       "day":       times.dt.normalize(),
+                       "track":     sp_df[TRACK_COL],
+                       "artist":    sp_df[ARTIST_COL],
+                       "Count":     sp_df["Count"],
+                       "ms_played": sp_df["ms_played"]})
+
+    tracks  = _per_year(df, "track")
+    artists = _per_year(df, "artist")
+
+    # New artists: first year an artist appears anywhere in the history.
+    first_year = artists.groupby("artist")["year"].transform("min")
+    new = artists[artists["year"] == first_year]
+
+    days = (df.groupby(["year", "day"])["Count"].sum()
+              .reset_index()
+              .sort_values(["year", "Count", "day"], ascending=[True, False, True])
+              .drop_duplicates("year")
+              .set_index("year"))
+
+    summary = pd.DataFrame({
+        "plays":          df.groupby("year")["Count"].sum(),
+        "hours":          df.groupby("year")["ms_played"].sum() * MS_TO_HOURS,
+        "unique_tracks":  tracks.groupby("year").size(),
+        "unique_artists": artists.groupby("year").size(),
+        "new_artists":    new.groupby("year").size(),
+        "busiest_day":    days["day"].dt.date,
+        "busiest_day_plays": days["Count"],
+    })
+    summary = summary.fillna({"unique_tracks": 0, "unique_artists": 0, "new_artists": 0})
+    summary = summary.astype({"unique_tracks": int, "unique_artists": int, "new_artists": int})
+
+    return {"summary":     summary.rename_axis("year").reset_index(),
+            "top_songs":   _top_per_year(tracks, "track", num),
+            "top_artists": _top_per_year(artists, "artist", num),
+            "new_artists": _top_per_year(new, "artist", num)[["year", "rank", "artist", "plays"]]}
+
+
+def wrapped_report(sp_df, num=10):
+    """Print a compact Wrapped for every year and return the computed tables."""
+    result = wrapped_data(sp_df, num)
+    top_songs   = result["top_songs"].groupby("year")
+    top_artists = result["top_artists"].groupby("year")
+
+    for row in result["summary"].itertuples(index=False):
+        print(f"\n  ══ {row.year} Wrapped " + "═" * 40)
+        print(f"  Plays {row.plays:,}   Hours {row.hours:,.1f}   "
+              f"Tracks {row.unique_tracks:,}   Artists {row.unique_artists:,}   "
+              f"New artists {row.new_artists:,}")
+        print(f"  Busiest day: {row.busiest_day}  ({row.busiest_day_plays:,} plays)")
+
+        songs   = top_songs.get_group(row.year)   if row.year in top_songs.groups   else None
+        artists = top_artists.get_group(row.year) if row.year in top_artists.groups else None
+        print(f"\n  {'#':<4} {'Top Songs':<40} {'Top Artists':<30}")
+        print("  " + "─" * 74)
+        for rank in range(1, min(num, 5) + 1):
+            song   = _name_at(songs, "track", rank)
+            artist = _name_at(artists, "artist", rank)
+            if not song and not artist:
+                break
+            print(f"  {rank:<4} {song[:38]:<40} {artist[:28]:<30}")
+    print()
+    return result
+
+
+def write_wrapped(result, output_dir="wrapped_report"):
+    """Write the tables from wrapped_data() as CSV files plus wrapped.md."""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, table in result.items():
+        table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+
+    top_songs   = result["top_songs"].groupby("year")
+    top_artists = result["top_artists"].groupby("year")
+    new_artists = result["new_artists"].groupby("year")
+
+    lines = ["# Spotify Wrapped — all years", ""]
+    for row in result["summary"].itertuples(index=False):
+        lines += [f"## {row.year}", "",
+                  f"- Plays: {row.plays:,}",
+                  f"- Hours listened: {row.hours:,.1f}",
+                  f"- Unique tracks: {row.unique_tracks:,}",
+                  f"- Unique artists: {row.unique_artists:,}",
+                  f"- New artists discovered: {row.new_artists:,}",
+                  f"- Busiest day: {row.busiest_day} ({row.busiest_day_plays:,} plays)",
+                  ""]
+        for title, groups, key in (("Top songs", top_songs, "track"),
+                                   ("Top artists", top_artists, "artist"),
+                                   ("Top new artists", new_artists, "artist")):
+            if row.year not in groups.groups:
+                continue
+            lines += [f"### {title}", ""]
+            lines += [f"{r.rank}. {getattr(r, key)} — {r.plays:,} plays"
+                      for r in groups.get_group(row.year).itertuples(index=False)]
+            lines.append("")
+
+    with open(os.path.join(output_dir, "wrapped.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    print(f"  Wrapped report written to '{output_dir}/'")
+
+
+# ── Internal helpers ──────────────────────────────────────────────────────────
+
+def _per_year(df, key):
+    """One row per (year, key) with plays and ms_played; rows with no key dropped."""
+    return (df.groupby(["year", key])
+              .agg(plays=("Count", "sum"), ms_played=("ms_played", "sum"))
+              .reset_index())
+
+
+def _top_per_year(table, key, num):
+    """Top `num` rows of `table` per year by plays, with a 1-based rank column."""
+    top = (table.sort_values(["year", "plays", key], ascending=[True, False, True])
+                .groupby("year")
+                .head(num)
+                .copy())
+    top["rank"]  = top.groupby("year").cumcount() + 1
+    top["hours"] = top["ms_played"] * MS_TO_HOURS
+    return top[["year", "rank", key, "plays", "hours"]].reset_index(drop=True)
+
+
+def _name_at(group, key, rank):
+    if group is None or rank > len(group):
+        return ""
+    return str(group[key].iloc[rank - 1])